@@ -1,3 +1,99 @@
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
 
-# Register your models here.
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Changelist paginator for very large tables. Unfiltered counts come from
+    the planner statistics in ``pg_class`` on PostgreSQL; other counts stop
+    at ``max_count`` rows.
+    """
+
+    max_count = 10_000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = self.estimate_count(queryset)
+            if estimate is not None and estimate > self.max_count:
+                return estimate
+        return queryset[: self.max_count].count()
+
+    def estimate_count(self, queryset):
+        connection = connections[queryset.db]
+        if connection.vendor != "postgresql":
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples FROM pg_class WHERE oid = %s::regclass",
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        # -1 until the table has been vacuumed or analyzed
+        if row is None or row[0] < 0:
+            return None
+        return int(row[0])
+
+
+class AutocompleteFilter(admin.SimpleListFilter):
+    """
+    List filter on a foreign key, rendered as the admin's autocomplete
+    widget so related rows are searched instead of listed in full. The
+    related model's admin needs ``search_fields``, and the changelist's
+    ``media`` must include ``get_media()``.
+    """
+
+    template = "admin/autocomplete_filter.html"
+    field_name = None
+
+    def __init__(self, request, params, model, model_admin):
+        self.field = model._meta.get_field(self.field_name)
+        self.parameter_name = self.field_name
+        self.title = self.title or self.field.verbose_name
+        self.admin_site = model_admin.admin_site
+        super().__init__(request, params, model, model_admin)
+
+    @classmethod
+    def get_media(cls, model_admin):
+        field = model_admin.model._meta.get_field(cls.field_name)
+        return AutocompleteSelect(field, model_admin.admin_site).media + forms.Media(
+            js=["common/admin/autocomplete_filter.js"]
+        )
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def queryset(self, request, queryset):
+        if not self.value():
+            return queryset
+        try:
+            return queryset.filter(**{self.field_name: self.value()})
+        except (ValueError, ValidationError) as e:
+            raise IncorrectLookupParameters(e)
+
+    def widget(self):
+        form_field = forms.ModelChoiceField(
+            queryset=self.field.remote_field.model._default_manager.all(),
+            widget=AutocompleteSelect(
+                self.field,
+                self.admin_site,
+                attrs={
+                    "class": "autocomplete-filter",
+                    "data-filter-parameter": self.parameter_name,
+                },
+            ),
+            required=False,
+        )
+        return form_field.widget.render(
+            f"{self.parameter_name}-autocomplete-filter", self.value()
+        )
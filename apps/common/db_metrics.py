@@ -0,0 +1,124 @@
+"""
+Database connection metrics: a counter of newly opened connections (to spot
+churn when connections are not reused), per-request query recording and a
+collector reporting psycopg pool statistics at scrape time.
+"""
+
+import time
+from contextvars import ContextVar
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from .metrics import DB_CONNECTIONS_OPENED
+
+# Set for the duration of a request by RequestMetricsMiddleware. Context
+# variables follow the request into sync_to_async threads, whose database
+# connections are not the ones of the thread that set it.
+current_query_recorder = ContextVar("current_query_recorder", default=None)
+
+
+class QueryRecorder:
+    """
+    Counts queries and the time spent in them.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    ``execute_wrapper`` installed on every connection, handing each query to
+    the recorder of the current request, if any.
+    """
+    recorder = current_query_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def record_connection_opened(sender, connection, **kwargs):
+    DB_CONNECTIONS_OPENED.labels(alias=connection.alias).inc()
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    # Prepended: execute_wrapper() blocks pop the last wrapper on exit, and a
+    # connection may be opened inside one.
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+connection_created.connect(record_connection_opened)
+connection_created.connect(install_query_recorder)
+
+
+def pooled_connections():
+    for connection in connections.all(initialized_only=True):
+        if connection.settings_dict.get("OPTIONS", {}).get("pool"):
+            yield connection
+
+
+class DatabasePoolCollector:
+    """
+    Reports this process's psycopg pool statistics. Under gunicorn with
+    several workers a scrape sees the pool of whichever worker served it.
+    """
+
+    def collect(self):
+        size = GaugeMetricFamily(
+            "churchpad_db_pool_size",
+            "Connections currently managed by the pool.",
+            labels=["alias"],
+        )
+        available = GaugeMetricFamily(
+            "churchpad_db_pool_available",
+            "Idle connections in the pool.",
+            labels=["alias"],
+        )
+        waiting = GaugeMetricFamily(
+            "churchpad_db_pool_requests_waiting",
+            "Requests currently waiting for a pooled connection.",
+            labels=["alias"],
+        )
+        requests = CounterMetricFamily(
+            "churchpad_db_pool_requests",
+            "Connections requested from the pool.",
+            labels=["alias"],
+        )
+        queued = CounterMetricFamily(
+            "churchpad_db_pool_requests_queued",
+            "Requests that had to wait for a connection.",
+            labels=["alias"],
+        )
+        wait = CounterMetricFamily(
+            "churchpad_db_pool_wait_seconds",
+            "Time spent waiting for a pooled connection.",
+            labels=["alias"],
+        )
+        errors = CounterMetricFamily(
+            "churchpad_db_pool_request_errors",
+            "Requests that timed out or failed waiting for a connection.",
+            labels=["alias"],
+        )
+        for connection in pooled_connections():
+            stats = connection.pool.get_stats()
+            labels = [connection.alias]
+            size.add_metric(labels, stats.get("pool_size", 0))
+            available.add_metric(labels, stats.get("pool_available", 0))
+            waiting.add_metric(labels, stats.get("requests_waiting", 0))
+            requests.add_metric(labels, stats.get("requests_num", 0))
+            queued.add_metric(labels, stats.get("requests_queued", 0))
+            wait.add_metric(labels, stats.get("requests_wait_ms", 0) / 1000)
+            errors.add_metric(labels, stats.get("requests_errors", 0))
+        yield from (size, available, waiting, requests, queued, wait, errors)
@@ -0,0 +1,52 @@
+"""
+Primary/replica routing. Everything goes to the primary unless a read opts
+in with ``read_db_for(request)``; writes mark the request so
+``ReplicaPinningMiddleware`` can keep the client on the primary for
+``REPLICA_PIN_SECONDS`` and it reads its own writes despite replica lag.
+"""
+
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PIN_COOKIE = "churchpad_read_primary"
+
+wrote_to_primary = ContextVar("wrote_to_primary", default=False)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Also covers instances loaded from a replica.
+        wrote_to_primary.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+def is_pinned_to_primary(request):
+    return wrote_to_primary.get() or PIN_COOKIE in request.COOKIES
+
+
+def read_db_for(request):
+    """
+    Database alias for the read-only queries of ``request``: a random
+    replica, or the primary when none is configured or the client wrote
+    recently.
+    """
+    if not settings.DATABASE_REPLICAS or is_pinned_to_primary(request):
+        return DEFAULT_DB_ALIAS
+    return random.choice(settings.DATABASE_REPLICAS)
@@ -0,0 +1,52 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.common.outbox import relay_outbox
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Publish outbox messages to Celery until interrupted."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=None,
+            help="Seconds to sleep when the outbox is drained",
+        )
+        parser.add_argument(
+            "--once", action="store_true", help="Drain the outbox once and exit"
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"] or settings.OUTBOX_BATCH_SIZE
+        interval = options["interval"] or settings.OUTBOX_POLL_INTERVAL
+
+        if options["once"]:
+            total = 0
+            while relayed := relay_outbox(batch_size):
+                total += relayed
+            self.stdout.write(f"Relayed {total} outbox messages")
+            return
+
+        try:
+            while True:
+                close_old_connections()
+                try:
+                    relayed = relay_outbox(batch_size)
+                except Exception as e:
+                    # Broker or database unavailable: the batch stays in the
+                    # outbox and is retried.
+                    logger.error(f"Outbox relay failed: {str(e)}")
+                    relayed = 0
+                if relayed < batch_size:
+                    time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,76 @@
+import os
+
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Histogram, multiprocess
+
+REQUEST_LATENCY = Histogram(
+    "churchpad_http_request_duration_seconds",
+    "Time spent handling a request, by URL name.",
+    ["view", "method", "status"],
+)
+REQUEST_QUERIES = Histogram(
+    "churchpad_http_request_db_queries",
+    "Database queries issued per request, by URL name.",
+    ["view"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100, float("inf")),
+)
+REQUEST_DB_TIME = Histogram(
+    "churchpad_http_request_db_duration_seconds",
+    "Time spent in database queries per request, by URL name.",
+    ["view"],
+)
+RESPONSE_SIZE = Histogram(
+    "churchpad_http_response_size_bytes",
+    "Response body size, by URL name. Streaming responses are not counted.",
+    ["view"],
+    buckets=(100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000, float("inf")),
+)
+REQUEST_EXCEPTIONS = Counter(
+    "churchpad_http_request_exceptions_total",
+    "Requests that raised an unhandled exception, by URL name.",
+    ["view"],
+)
+
+TASK_QUEUE_LAG = Histogram(
+    "churchpad_celery_task_queue_lag_seconds",
+    "Time between publishing a task and a worker starting it, by task name.",
+    ["task"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 300, float("inf")),
+)
+TASK_RUNTIME = Histogram(
+    "churchpad_celery_task_runtime_seconds",
+    "Task execution time, by task name and final state.",
+    ["task", "state"],
+)
+TASK_FAILURES = Counter(
+    "churchpad_celery_task_failures_total",
+    "Tasks that raised, by task name.",
+    ["task"],
+)
+TASK_RETRIES = Counter(
+    "churchpad_celery_task_retries_total",
+    "Task retries scheduled, by task name.",
+    ["task"],
+)
+DB_CONNECTIONS_OPENED = Counter(
+    "churchpad_db_connections_opened_total",
+    "New database connections opened, by alias.",
+    ["alias"],
+)
+OUTBOX_RELAYED = Counter(
+    "churchpad_outbox_relayed_total",
+    "Outbox messages published to Celery by the relay.",
+)
+
+
+def collector_registry():
+    """
+    Registry to expose from this process. When ``PROMETHEUS_MULTIPROC_DIR``
+    is set (several gunicorn or Celery pool processes), it aggregates the
+    samples every process wrote there.
+    """
+    registry = CollectorRegistry()
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry.register(REGISTRY)
+    return registry
@@ -0,0 +1,122 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .db_metrics import QueryRecorder, current_query_recorder
+from .db_router import PIN_COOKIE, wrote_to_primary
+from .metrics import (
+    REQUEST_DB_TIME,
+    REQUEST_EXCEPTIONS,
+    REQUEST_LATENCY,
+    REQUEST_QUERIES,
+    RESPONSE_SIZE,
+)
+
+
+def get_view_name(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None or not match.url_name:
+        return "<unresolved>"
+    return ":".join([*match.app_names, match.url_name])
+
+
+class RequestMetricsMiddleware:
+    """
+    Record latency, database queries and time, and response size for every
+    request, labelled by URL name (e.g. ``subscriptions:plan_list``).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        recorder = QueryRecorder()
+        token = current_query_recorder.set(recorder)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        except Exception:
+            REQUEST_EXCEPTIONS.labels(view=get_view_name(request)).inc()
+            raise
+        finally:
+            current_query_recorder.reset(token)
+        self.observe(request, response, recorder, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        recorder = QueryRecorder()
+        token = current_query_recorder.set(recorder)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        except Exception:
+            REQUEST_EXCEPTIONS.labels(view=get_view_name(request)).inc()
+            raise
+        finally:
+            current_query_recorder.reset(token)
+        self.observe(request, response, recorder, time.perf_counter() - start)
+        return response
+
+    def observe(self, request, response, recorder, duration):
+        view = get_view_name(request)
+        REQUEST_LATENCY.labels(
+            view=view, method=request.method, status=response.status_code
+        ).observe(duration)
+        REQUEST_QUERIES.labels(view=view).observe(recorder.count)
+        REQUEST_DB_TIME.labels(view=view).observe(recorder.duration)
+        if not response.streaming:
+            RESPONSE_SIZE.labels(view=view).observe(len(response.content))
+
+
+class ReplicaPinningMiddleware:
+    """
+    After a request that wrote to the primary, set a cookie that sends the
+    client's replica-eligible reads to the primary for
+    ``REPLICA_PIN_SECONDS``, so it sees its own writes.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = wrote_to_primary.set(False)
+        try:
+            response = self.get_response(request)
+            self.pin(response)
+        finally:
+            wrote_to_primary.reset(token)
+        return response
+
+    async def __acall__(self, request):
+        token = wrote_to_primary.set(False)
+        try:
+            response = await self.get_response(request)
+            self.pin(response)
+        finally:
+            wrote_to_primary.reset(token)
+        return response
+
+    def pin(self, response):
+        if settings.DATABASE_REPLICAS and wrote_to_primary.get():
+            response.set_cookie(
+                PIN_COOKIE,
+                "1",
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
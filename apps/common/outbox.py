@@ -0,0 +1,71 @@
+"""
+Transactional outbox. ``enqueue`` records a task call in the caller's
+transaction, so it is stored if and only if the surrounding change commits
+and the request never talks to the broker. ``relay_outbox``, run in a loop
+by ``manage.py relay_outbox``, publishes stored calls to Celery in batches.
+
+Delivery is at least once: a relay that dies between publishing and
+committing the delete republishes the batch, so tasks must tolerate
+duplicates. The outbox row's UUID is used as the Celery task id.
+"""
+
+import logging
+
+from django.conf import settings
+from django.db import transaction
+
+from churchpad.celery import app
+
+from .metrics import OUTBOX_RELAYED
+from .models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(task, *args, **kwargs):
+    """
+    Record a call of Celery ``task``; call it inside the transaction that
+    makes the change the task reacts to.
+    """
+    return OutboxMessage.objects.create(task_name=task.name, args=args, kwargs=kwargs)
+
+
+def enqueue_many(task, calls):
+    """
+    Record one call of ``task`` per positional-argument tuple in ``calls``
+    with a single INSERT.
+    """
+    return OutboxMessage.objects.bulk_create(
+        [OutboxMessage(task_name=task.name, args=args) for args in calls]
+    )
+
+
+def relay_outbox(batch_size=None):
+    """
+    Publish and delete up to ``batch_size`` stored calls, oldest first, and
+    return how many were relayed. Rows are claimed with ``SKIP LOCKED`` so
+    several relays can run side by side; if the broker fails the
+    transaction rolls back and the batch is retried on the next pass.
+    """
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    with transaction.atomic():
+        messages = list(
+            OutboxMessage.objects.select_for_update(skip_locked=True).order_by("pkid")[
+                :batch_size
+            ]
+        )
+        if not messages:
+            return 0
+        with app.producer_or_acquire() as producer:
+            for message in messages:
+                app.send_task(
+                    message.task_name,
+                    args=message.args,
+                    kwargs=message.kwargs,
+                    task_id=str(message.id),
+                    producer=producer,
+                )
+        OutboxMessage.objects.filter(pkid__in=[message.pkid for message in messages]).delete()
+    OUTBOX_RELAYED.inc(len(messages))
+    logger.info(f"Relayed {len(messages)} outbox messages")
+    return len(messages)
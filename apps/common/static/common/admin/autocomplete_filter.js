@@ -0,0 +1,17 @@
+'use strict';
+{
+    const $ = django.jQuery;
+
+    // Reload the changelist filtered on the chosen object (see AutocompleteFilter).
+    $(document).on('change', 'select.autocomplete-filter', function() {
+        const params = new URLSearchParams(window.location.search);
+        const name = this.dataset.filterParameter;
+        if (this.value) {
+            params.set(name, this.value);
+        } else {
+            params.delete(name);
+        }
+        params.delete('p');
+        window.location.search = params.toString();
+    });
+}
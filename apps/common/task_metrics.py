@@ -0,0 +1,138 @@
+"""
+Celery signal hooks exporting queue lag, runtime, failure and retry metrics,
+and a collector reporting broker queue lengths at scrape time.
+
+Task metrics are recorded in the worker processes, so each worker serves
+them itself on ``WORKER_METRICS_PORT``, together with everything
+else its tasks record (e.g. outbound HTTP client metrics). With the prefork
+pool, set ``PROMETHEUS_MULTIPROC_DIR`` to an empty directory so the exporter
+in the main process aggregates the pool processes' samples.
+"""
+
+import logging
+import os
+import time
+
+from celery.signals import (
+    before_task_publish,
+    task_failure,
+    task_postrun,
+    task_prerun,
+    task_retry,
+    worker_init,
+    worker_process_shutdown,
+)
+from celery.utils.time import maybe_iso8601, maybe_make_aware
+from django.conf import settings
+from prometheus_client import multiprocess, start_http_server
+from prometheus_client.core import GaugeMetricFamily
+
+from .metrics import (
+    TASK_FAILURES,
+    TASK_QUEUE_LAG,
+    TASK_RETRIES,
+    TASK_RUNTIME,
+    collector_registry,
+)
+
+logger = logging.getLogger(__name__)
+
+ENQUEUED_AT_HEADER = "churchpad_enqueued_at"
+
+_started = {}
+
+
+@before_task_publish.connect
+def stamp_enqueued_at(headers=None, **kwargs):
+    if headers is not None:
+        headers[ENQUEUED_AT_HEADER] = time.time()
+
+
+def ready_at(request):
+    """
+    When a task became runnable: its publish time, or its ETA when it was
+    scheduled for later (countdowns, retries with backoff).
+    """
+    enqueued_at = request.get(ENQUEUED_AT_HEADER)
+    eta = maybe_iso8601(request.eta) if request.eta else None
+    if eta is not None:
+        eta = maybe_make_aware(eta).timestamp()
+        return max(eta, enqueued_at or eta)
+    return enqueued_at
+
+
+@task_prerun.connect
+def record_task_start(task_id=None, task=None, **kwargs):
+    _started[task_id] = time.perf_counter()
+    ready = ready_at(task.request)
+    if ready:
+        TASK_QUEUE_LAG.labels(task=task.name).observe(max(time.time() - ready, 0))
+
+
+@task_postrun.connect
+def record_task_runtime(task_id=None, task=None, state=None, **kwargs):
+    started = _started.pop(task_id, None)
+    if started is not None:
+        TASK_RUNTIME.labels(task=task.name, state=state or "UNKNOWN").observe(
+            time.perf_counter() - started
+        )
+
+
+@task_failure.connect
+def record_task_failure(sender=None, **kwargs):
+    TASK_FAILURES.labels(task=sender.name).inc()
+
+
+@task_retry.connect
+def record_task_retry(sender=None, **kwargs):
+    TASK_RETRIES.labels(task=sender.name).inc()
+
+
+@worker_init.connect
+def start_worker_metrics_exporter(**kwargs):
+    port = settings.WORKER_METRICS_PORT
+    if port:
+        server, _ = start_http_server(port, registry=collector_registry())
+        logger.info(f"Serving worker metrics on port {port}")
+        return server
+
+
+@worker_process_shutdown.connect
+def mark_pool_process_dead(pid=None, **kwargs):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid)
+
+
+class QueueLengthCollector:
+    """
+    Reports the number of messages waiting in each Celery queue. Only the
+    Redis broker, where a queue is a list, is supported.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    def queue_names(self):
+        queues = self.app.conf.task_queues
+        if queues:
+            return [queue.name for queue in queues]
+        return [self.app.conf.task_default_queue]
+
+    def collect(self):
+        gauge = GaugeMetricFamily(
+            "churchpad_celery_queue_length",
+            "Messages waiting in a Celery queue.",
+            labels=["queue"],
+        )
+        try:
+            with self.app.connection_for_read(connect_timeout=1) as connection:
+                # Fail the scrape fast instead of retrying for the full
+                # broker connection policy.
+                connection.ensure_connection(max_retries=0)
+                client = connection.default_channel.client
+                for name in self.queue_names():
+                    gauge.add_metric([name], client.llen(name))
+        except Exception as e:
+            logger.warning(f"Could not read Celery queue lengths: {str(e)}")
+            return
+        yield gauge
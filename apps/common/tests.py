@@ -1,3 +1,225 @@
-from django.test import TestCase
+import asyncio
+import socket
+import time
+import uuid
+from datetime import datetime, timezone as dt_timezone
+from io import StringIO
+from urllib.request import urlopen
+from unittest.mock import MagicMock, patch
 
-# Create your tests here.
+import pytest
+from django.core.management import call_command
+from django.db import connections
+from django.test import AsyncClient
+from django.urls import reverse
+from prometheus_client import REGISTRY, CollectorRegistry
+
+from celery.app.task import Context
+from kombu.exceptions import OperationalError
+
+from apps.common.db_metrics import DatabasePoolCollector
+from apps.common.task_metrics import (
+    ENQUEUED_AT_HEADER,
+    ready_at,
+    start_worker_metrics_exporter,
+)
+from apps.common.models import OutboxMessage
+from apps.common.outbox import enqueue, enqueue_many, relay_outbox
+from apps.subscriptions.tasks import send_email_task, send_welcome_sms
+from churchpad.celery import app
+from apps.subscriptions.models import Plan
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+@pytest.mark.django_db
+def test_request_metrics_are_recorded_per_url_name(client):
+    Plan.objects.create(
+        name="Basic Plan",
+        stripe_price_id="price_12345",
+        price=10.00,
+        billing_period="month",
+    )
+    view = "subscriptions:plan_list"
+    requests_before = sample(
+        "churchpad_http_request_duration_seconds_count",
+        view=view,
+        method="GET",
+        status="200",
+    )
+    queries_before = sample("churchpad_http_request_db_queries_sum", view=view)
+
+    response = client.get(reverse(view))
+
+    assert response.status_code == 200
+    assert (
+        sample(
+            "churchpad_http_request_duration_seconds_count",
+            view=view,
+            method="GET",
+            status="200",
+        )
+        == requests_before + 1
+    )
+    assert sample("churchpad_http_request_db_queries_sum", view=view) == queries_before + 1
+    assert sample("churchpad_http_response_size_bytes_sum", view=view) > 0
+
+
+@pytest.mark.django_db(transaction=True)
+def test_request_metrics_count_queries_of_async_views():
+    view = "subscriptions:subscription_confirm_async"
+    queries_before = sample("churchpad_http_request_db_queries_sum", view=view)
+
+    with patch(
+        "apps.subscriptions.services.StripeService.get_customer_snapshot_async",
+        return_value={"id": "cus_12345"},
+    ):
+        # The plan lookup runs in a sync_to_async thread, on its own connection.
+        response = asyncio.run(
+            AsyncClient().post(
+                reverse(view),
+                {"customer_id": "cus_12345", "plan_id": str(uuid.uuid4())},
+                content_type="application/json",
+            )
+        )
+
+    assert response.status_code == 400
+    assert sample("churchpad_http_request_db_queries_sum", view=view) == queries_before + 1
+
+
+@pytest.mark.django_db
+def test_metrics_endpoint_exports_prometheus_text(client):
+    client.get(reverse("subscriptions:plan_list"))
+
+    response = client.get(reverse("metrics"))
+
+    assert response.status_code == 200
+    assert response["Content-Type"].startswith("text/plain")
+    assert b'churchpad_http_request_duration_seconds_bucket{' in response.content
+
+
+def test_metrics_endpoint_rejects_clients_outside_allowed_networks(client, settings):
+    settings.METRICS_ALLOWED_NETWORKS = ["10.0.0.0/8"]
+    settings.METRICS_TOKEN = "s3cret"
+
+    assert client.get(reverse("metrics"), REMOTE_ADDR="10.1.2.3").status_code == 200
+    assert client.get(reverse("metrics"), REMOTE_ADDR="203.0.113.7").status_code == 403
+    assert client.get(
+        reverse("metrics"), REMOTE_ADDR="203.0.113.7", HTTP_AUTHORIZATION="Bearer wrong"
+    ).status_code == 403
+    assert client.get(
+        reverse("metrics"), REMOTE_ADDR="203.0.113.7", HTTP_AUTHORIZATION="Bearer s3cret"
+    ).status_code == 200
+
+
+@pytest.mark.django_db
+def test_new_database_connections_are_counted():
+    opened_before = sample("churchpad_db_connections_opened_total", alias="default")
+
+    connection = connections.create_connection("default")
+    connection.ensure_connection()
+    connection.close()
+
+    assert sample("churchpad_db_connections_opened_total", alias="default") == opened_before + 1
+
+
+def test_database_pool_collector_reports_wait_time():
+    pooled = MagicMock(alias="default")
+    pooled.pool.get_stats.return_value = {
+        "pool_size": 4,
+        "pool_available": 1,
+        "requests_num": 10,
+        "requests_queued": 3,
+        "requests_wait_ms": 1500,
+    }
+    registry = CollectorRegistry()
+    registry.register(DatabasePoolCollector())
+
+    with patch("apps.common.db_metrics.pooled_connections", return_value=[pooled]):
+        assert registry.get_sample_value(
+            "churchpad_db_pool_wait_seconds_total", {"alias": "default"}
+        ) == 1.5
+        assert registry.get_sample_value(
+            "churchpad_db_pool_requests_queued_total", {"alias": "default"}
+        ) == 3
+        assert registry.get_sample_value(
+            "churchpad_db_pool_request_errors_total", {"alias": "default"}
+        ) == 0
+
+
+@pytest.fixture
+def broker():
+    with patch.object(app, "producer_or_acquire"), patch.object(app, "send_task") as send_task:
+        yield send_task
+
+
+@pytest.mark.django_db
+def test_relay_outbox_publishes_and_deletes_in_batches(broker):
+    first = enqueue(send_welcome_sms, "subscriber-1")
+    enqueue_many(send_email_task, [("Hi", "Body", ["a@example.com"]), ("Hi", "Body", ["b@example.com"])])
+
+    assert relay_outbox(batch_size=2) == 2
+    assert relay_outbox(batch_size=2) == 1
+    assert relay_outbox(batch_size=2) == 0
+
+    assert not OutboxMessage.objects.exists()
+    assert [call.args[0] for call in broker.call_args_list] == [
+        send_welcome_sms.name,
+        send_email_task.name,
+        send_email_task.name,
+    ]
+    assert broker.call_args_list[0].kwargs["args"] == ["subscriber-1"]
+    assert broker.call_args_list[0].kwargs["task_id"] == str(first.id)
+
+
+@pytest.mark.django_db
+def test_relay_outbox_keeps_messages_when_broker_fails(broker):
+    enqueue(send_welcome_sms, "subscriber-1")
+    broker.side_effect = OperationalError("broker down")
+
+    with pytest.raises(OperationalError):
+        relay_outbox()
+
+    assert OutboxMessage.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_relay_outbox_command_drains_once(broker):
+    enqueue_many(send_welcome_sms, [("subscriber-1",), ("subscriber-2",), ("subscriber-3",)])
+    out = StringIO()
+
+    call_command("relay_outbox", "--once", "--batch-size", "2", stdout=out)
+
+    assert "Relayed 3 outbox messages" in out.getvalue()
+    assert broker.call_count == 3
+
+
+def test_queue_lag_is_measured_from_eta():
+    enqueued_at = time.time() - 60
+    eta = datetime.fromtimestamp(enqueued_at + 30, tz=dt_timezone.utc)
+
+    assert ready_at(Context({ENQUEUED_AT_HEADER: enqueued_at})) == enqueued_at
+    # Retries and countdowns are not lagging until their ETA has passed.
+    assert ready_at(
+        Context({ENQUEUED_AT_HEADER: enqueued_at, "eta": eta.isoformat()})
+    ) == pytest.approx(enqueued_at + 30)
+
+
+def test_worker_exporter_serves_task_metrics(settings):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        settings.WORKER_METRICS_PORT = sock.getsockname()[1]
+    settings.CELERY_EMAIL_BACKEND = "django.core.mail.backends.locmem.EmailBackend"
+    send_email_task.apply(args=["Hi", "Hello", ["john@example.com"]])
+
+    server = start_worker_metrics_exporter()
+    try:
+        with urlopen(f"http://127.0.0.1:{settings.WORKER_METRICS_PORT}/") as response:
+            body = response.read()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert b"churchpad_celery_task_runtime_seconds_bucket{" in body
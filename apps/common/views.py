@@ -1,3 +1,50 @@
-from django.shortcuts import render
+import hmac
+import ipaddress
 
-# Create your views here.
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+from churchpad.celery import app
+
+from .db_metrics import DatabasePoolCollector
+from .metrics import collector_registry
+from .task_metrics import QueueLengthCollector
+
+queue_length_collector = QueueLengthCollector(app)
+database_pool_collector = DatabasePoolCollector()
+
+
+def metrics_access_allowed(request):
+    token = settings.METRICS_TOKEN
+    if token and hmac.compare_digest(
+        request.headers.get("Authorization", "").encode(), f"Bearer {token}".encode()
+    ):
+        return True
+    try:
+        address = ipaddress.ip_address(request.META.get("REMOTE_ADDR", ""))
+    except ValueError:
+        return False
+    return any(
+        address in ipaddress.ip_network(network, strict=False)
+        for network in settings.METRICS_ALLOWED_NETWORKS
+    )
+
+
+def metrics(request):
+    """
+    Prometheus scrape endpoint. When ``PROMETHEUS_MULTIPROC_DIR`` is set
+    (gunicorn with several workers), samples from every worker process are
+    aggregated. Celery queue lengths are read from the broker and database
+    pool statistics from this process per scrape. Celery workers serve
+    their own metrics, see ``apps.common.task_metrics``.
+
+    Only clients in ``METRICS_ALLOWED_NETWORKS`` or sending ``METRICS_TOKEN``
+    as a bearer token are answered.
+    """
+    if not metrics_access_allowed(request):
+        return HttpResponseForbidden()
+    registry = collector_registry()
+    registry.register(queue_length_collector)
+    registry.register(database_pool_collector)
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Plan, Subscriber
+from apps.common.admin import AutocompleteFilter, EstimatedCountPaginator
+from apps.common.db_router import read_db_for
+from .models import Plan, StripeEvent, Subscriber
+from .subscribers import unsubscribe_queryset
 
 
 @admin.register(Plan)
@@ -9,6 +12,10 @@ class PlanAdmin(admin.ModelAdmin):
     list_filter = ("billing_period",)
 
 
+class PlanFilter(AutocompleteFilter):
+    field_name = "plan"
+
+
 @admin.register(Subscriber)
 class SubscriberAdmin(admin.ModelAdmin):
     list_display = (
@@ -21,12 +28,49 @@ class SubscriberAdmin(admin.ModelAdmin):
         "stripe_customer_id",
         "stripe_subscription_id",
     )
+    list_select_related = ("plan",)
+    # Case-sensitive prefix matches can use the unique columns' indexes
+    # (varchar_pattern_ops on PostgreSQL); icontains cannot.
     search_fields = (
-        "name",
-        "email",
-        "phone_number",
-        "stripe_customer_id",
-        "stripe_subscription_id",
+        "email__startswith",
+        "stripe_customer_id__startswith",
+        "stripe_subscription_id__startswith",
     )
-    list_filter = ("is_active", "plan")
-    readonly_fields = ("stripe_customer_id", "stripe_subscription_id")
+    search_help_text = "Search by email, Stripe customer ID or subscription ID prefix."
+    list_filter = ("is_active", PlanFilter)
+    autocomplete_fields = ("plan",)
+    readonly_fields = ("stripe_customer_id", "stripe_subscription_id", "cancelled_at")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ("deactivate",)
+
+    @property
+    def media(self):
+        return super().media + PlanFilter.get_media(self)
+
+    @admin.action(description="Unsubscribe selected subscribers")
+    def deactivate(self, request, queryset):
+        # Also cancels their Stripe subscriptions, so reconciliation does not
+        # turn them back on.
+        updated = unsubscribe_queryset(queryset)
+        self.message_user(request, f"Unsubscribed {updated} subscribers.")
+
+    def changelist_view(self, request, extra_context=None):
+        # Browsing reads from a replica; actions (POST) select rows on the
+        # primary.
+        request.read_from_replica = request.method == "GET"
+        return super().changelist_view(request, extra_context)
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if getattr(request, "read_from_replica", False):
+            queryset = queryset.using(read_db_for(request))
+        return queryset
+
+
+@admin.register(StripeEvent)
+class StripeEventAdmin(admin.ModelAdmin):
+    list_display = ("event_id", "type", "status", "attempts", "created_at")
+    search_fields = ("event_id",)
+    list_filter = ("status", "type")
+    readonly_fields = ("event_id", "type", "payload", "processed_at", "next_attempt_at")
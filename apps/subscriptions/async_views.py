@@ -0,0 +1,199 @@
+import asyncio
+import functools
+import json
+import logging
+
+import stripe
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework import status
+from rest_framework.utils.encoders import JSONEncoder
+
+from .cache import aget_plan
+from .models import Plan
+from .serializers import ReadSubscriberSerializer, WriteSubscriberSerializer
+from .services import get_stripe_service, signup_idempotency_key
+from .subscribers import create_subscriber
+
+# Async counterparts of ``subscribe`` and ``confirm_subscription``. Under an
+# ASGI server (churchpad.asgi) they release the event loop while waiting on
+# Stripe and overlap calls that do not depend on each other.
+
+logger = logging.getLogger(__name__)
+
+
+def releases_stripe_session(view):
+    """
+    Outside an ASGI server, e.g. under runserver or WSGI, every request runs
+    on an event loop of its own that is discarded afterwards; close the
+    Stripe HTTP session opened on it before it goes.
+    """
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            return await view(request, *args, **kwargs)
+        finally:
+            if not isinstance(request, ASGIRequest):
+                await get_stripe_service().close_async()
+
+    return wrapper
+
+
+def json_response(data, status=status.HTTP_200_OK):
+    return JsonResponse(data, status=status, encoder=JSONEncoder, safe=False)
+
+
+def get_request_data(request):
+    if request.content_type == "application/json":
+        return json.loads(request.body or b"{}")
+    return request.POST.dict()
+
+
+@csrf_exempt
+@require_POST
+@releases_stripe_session
+async def subscribe(request):
+    logger.info("Processing async subscription request")
+    try:
+        data = get_request_data(request)
+    except ValueError:
+        return json_response(
+            {"error": "Invalid JSON body"}, status=status.HTTP_400_BAD_REQUEST
+        )
+
+    serializer = WriteSubscriberSerializer(data=data)
+    # Validation queries the database for the unique email check.
+    if not await sync_to_async(serializer.is_valid)():
+        logger.warning("Invalid subscription request data")
+        return json_response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    payment_method_id = data.get("payment_method_id")
+    if not payment_method_id:
+        logger.error("Payment method ID is missing")
+        return json_response(
+            {"error": "Payment method ID is required"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    stripe_service = get_stripe_service()
+    validated = serializer.validated_data
+    idempotency_key = signup_idempotency_key(
+        validated["email"],
+        validated["name"],
+        validated["phone_number"],
+        validated["plan_id"],
+        payment_method_id,
+        client_key=request.headers.get("Idempotency-Key"),
+    )
+    try:
+        # The plan lookup and customer creation are independent; the customer
+        # is created with the payment method attached as its default.
+        plan, customer = await asyncio.gather(
+            aget_plan(id=validated["plan_id"]),
+            stripe_service.create_customer_async(
+                email=validated["email"],
+                name=validated["name"],
+                phone_number=validated["phone_number"],
+                payment_method_id=payment_method_id,
+                idempotency_key=f"{idempotency_key}:customer",
+            ),
+        )
+        logger.info(f"Plan retrieved: {plan.name}")
+        logger.info(
+            f"Stripe customer created: {customer.id} with payment method {payment_method_id}"
+        )
+
+        payment_intent = await stripe_service.create_payment_intent_async(
+            amount=int(plan.price * 100),  # Convert price to cents
+            currency="usd",
+            customer_id=customer.id,
+            metadata={"plan_id": str(plan.id)},
+            idempotency_key=f"{idempotency_key}:payment_intent",
+        )
+        logger.info(f"PaymentIntent created: {payment_intent.id}")
+
+        return json_response(
+            {
+                "client_secret": payment_intent.client_secret,
+                "customer_id": customer.id,
+                "plan_id": plan.id,
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
+    except Plan.DoesNotExist:
+        logger.error("Invalid plan ID provided")
+        return json_response(
+            {"error": "Invalid plan ID"}, status=status.HTTP_400_BAD_REQUEST
+        )
+    except stripe.error.StripeError as e:
+        logger.error(f"Stripe error: {str(e)}")
+        return json_response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+@csrf_exempt
+@require_POST
+@releases_stripe_session
+async def confirm_subscription(request):
+    logger.info("Processing async subscription confirmation")
+    try:
+        data = get_request_data(request)
+    except ValueError:
+        return json_response(
+            {"error": "Invalid JSON body"}, status=status.HTTP_400_BAD_REQUEST
+        )
+    customer_id = data.get("customer_id")
+    plan_id = data.get("plan_id")
+    if not customer_id or not plan_id:
+        logger.error("Subscription confirmation without customer or plan ID")
+        return json_response(
+            {"error": "customer_id and plan_id are required"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    stripe_service = get_stripe_service()
+
+    try:
+        plan, customer = await asyncio.gather(
+            aget_plan(id=plan_id),
+            # Cached by subscribe; only a miss goes to Stripe
+            stripe_service.get_customer_snapshot_async(customer_id),
+        )
+        logger.info(f"Plan retrieved: {plan.name}")
+        logger.info(f"Stripe customer retrieved: {customer_id}")
+
+        # Create a subscription
+        subscription = await stripe_service.create_subscription_async(
+            customer["id"], plan.stripe_price_id
+        )
+        logger.info(f"Subscription created: {subscription.id}")
+
+        # Save the subscriber; the welcome SMS and email are queued in the
+        # same transaction and published by the outbox relay.
+        subscriber = await sync_to_async(create_subscriber)(
+            name=customer["name"],
+            email=customer["email"],
+            phone_number=customer["phone"],
+            plan=plan,
+            stripe_customer_id=customer["id"],
+            stripe_subscription_id=subscription.id,
+        )
+        logger.info(f"Subscriber saved: {subscriber.id}")
+        logger.info(f"Welcome notifications queued for subscriber {subscriber.id}")
+
+        return json_response(
+            ReadSubscriberSerializer(subscriber).data, status=status.HTTP_201_CREATED
+        )
+
+    except (Plan.DoesNotExist, ValidationError):
+        logger.error("Invalid plan ID provided")
+        return json_response(
+            {"error": "Invalid plan ID"}, status=status.HTTP_400_BAD_REQUEST
+        )
+    except stripe.error.StripeError as e:
+        logger.error(f"Stripe error: {str(e)}")
+        return json_response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,314 @@
+"""
+Load-test harness for the subscription API, driven by
+``manage.py benchmark_subscriptions``.
+
+Each scenario issues requests through Django's test client from a pool of
+threads, so the whole stack (middleware, views, ORM) is exercised without a
+network hop. Stripe and Twilio are replaced by ``FakeProviders``.
+"""
+
+import itertools
+import json
+import statistics
+import threading
+import time
+import tracemalloc
+import uuid
+
+from django.db import connection, connections
+from django.test import Client
+from django.urls import reverse
+
+from .fakes import sign_webhook_payload
+from .models import Plan, Subscriber
+from .seeding import seed_subscribers
+from .serializers import ReadSubscriberSerializer, ValuesListSerializer
+from .services import get_stripe_service
+
+METRICS = ("rps", "p50_ms", "p95_ms", "p99_ms", "queries_per_request", "peak_alloc_kb")
+
+
+class Scenario:
+    """
+    A benchmarked request. ``prepare`` runs untimed before each request and
+    returns the keyword arguments for ``request``.
+    """
+
+    name = None
+    expected_status = 200
+
+    def setup(self):
+        pass
+
+    def prepare(self, i):
+        return {}
+
+    def request(self, client, **kwargs):
+        raise NotImplementedError
+
+
+class ListPlans(Scenario):
+    name = "list_plans"
+
+    def request(self, client):
+        return client.get(reverse("subscriptions:plan_list"))
+
+
+class ListSubscriptions(Scenario):
+    name = "list_subscriptions"
+
+    def request(self, client):
+        return client.get(reverse("subscriptions:subscription_list"))
+
+
+class Subscribe(Scenario):
+    name = "subscribe"
+    expected_status = 201
+
+    def setup(self):
+        self.plan_id = str(Plan.objects.values_list("id", flat=True).first())
+
+    def prepare(self, i):
+        return {
+            "data": {
+                "name": f"Bench {i}",
+                "email": f"bench-{uuid.uuid4().hex}@example.com",
+                "phone_number": "+15551234567",
+                "plan_id": self.plan_id,
+                "payment_method_id": "pm_card_visa",
+            }
+        }
+
+    def request(self, client, data):
+        return client.post(
+            reverse("subscriptions:subscription_create"),
+            data,
+            content_type="application/json",
+        )
+
+
+class ConfirmSubscription(Scenario):
+    name = "confirm_subscription"
+    expected_status = 201
+
+    def setup(self):
+        self.plan_id = str(Plan.objects.values_list("id", flat=True).first())
+
+    def prepare(self, i):
+        customer = get_stripe_service().create_customer(
+            f"bench-{uuid.uuid4().hex}@example.com", f"Bench {i}", "+15551234567"
+        )
+        return {"data": {"customer_id": customer.id, "plan_id": self.plan_id}}
+
+    def request(self, client, data):
+        return client.post(
+            reverse("subscriptions:subscription_confirm"),
+            data,
+            content_type="application/json",
+        )
+
+
+class StripeWebhook(Scenario):
+    name = "stripe_webhook"
+
+    def setup(self):
+        self.customer_ids = list(
+            Subscriber.objects.values_list("stripe_customer_id", flat=True)[:1000]
+        ) or ["cus_unknown"]
+
+    def prepare(self, i):
+        payload = json.dumps(
+            {
+                "id": f"evt_bench_{uuid.uuid4().hex}",
+                "type": "customer.subscription.updated",
+                "data": {
+                    "object": {"customer": self.customer_ids[i % len(self.customer_ids)]}
+                },
+            }
+        )
+        return {"payload": payload, "signature": sign_webhook_payload(payload)}
+
+    def request(self, client, payload, signature):
+        return client.post(
+            reverse("subscriptions:stripe_webhook"),
+            payload,
+            content_type="application/json",
+            HTTP_STRIPE_SIGNATURE=signature,
+        )
+
+
+SCENARIOS = {
+    scenario.name: scenario
+    for scenario in (
+        ListPlans,
+        ListSubscriptions,
+        Subscribe,
+        ConfirmSubscription,
+        StripeWebhook,
+    )
+}
+
+
+DATASETS = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+
+def ensure_dataset(subscribers):
+    """
+    Top the database up to at least ``subscribers`` subscribers, using a
+    benchmark plan.
+    """
+    plan = Plan.objects.filter(stripe_price_id="price_benchmark").first()
+    if plan is None:
+        plan = Plan.objects.create(
+            name="Benchmark Plan", stripe_price_id="price_benchmark", price=10
+        )
+    missing = max(subscribers - Subscriber.objects.count(), 0)
+    return seed_subscribers(missing, [plan.pkid])
+
+
+def percentile(samples, pct):
+    if not samples:
+        raise ValueError("percentile() needs at least one sample")
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def measure_peak_allocation(scenario):
+    """
+    Peak memory allocated by a single request, in KiB. Measured in its own
+    pass because tracing slows every allocation down.
+    """
+    client = Client()
+    kwargs = scenario.prepare(0)
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        scenario.request(client, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1024
+
+
+def run_scenario(scenario, requests=100, concurrency=1):
+    """
+    Send ``requests`` requests from ``concurrency`` threads and return the
+    scenario's metrics.
+    """
+    scenario.setup()
+    counter = itertools.count()
+    lock = threading.Lock()
+    latencies = []
+    queries = []
+    failures = []
+
+    def count_queries(execute, sql, params, many, context):
+        context["connection"].benchmark_queries += 1
+        return execute(sql, params, many, context)
+
+    def worker():
+        client = Client()
+        try:
+            while True:
+                with lock:
+                    i = next(counter)
+                if i >= requests:
+                    return
+                kwargs = scenario.prepare(i)
+                connection.benchmark_queries = 0
+                with connection.execute_wrapper(count_queries):
+                    start = time.perf_counter()
+                    response = scenario.request(client, **kwargs)
+                    if response.streaming:
+                        b"".join(response.streaming_content)
+                    elapsed = time.perf_counter() - start
+                with lock:
+                    latencies.append(elapsed)
+                    queries.append(connection.benchmark_queries)
+                    if response.status_code != scenario.expected_status:
+                        failures.append(response.status_code)
+        finally:
+            if threading.current_thread() is not threading.main_thread():
+                connections.close_all()
+
+    start = time.perf_counter()
+    if concurrency == 1:
+        worker()
+    else:
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    wall = time.perf_counter() - start
+
+    return {
+        "requests": len(latencies),
+        "failures": len(failures),
+        "rps": round(len(latencies) / wall, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+        "queries_per_request": round(statistics.fmean(queries), 2),
+        "peak_alloc_kb": round(measure_peak_allocation(scenario), 1),
+    }
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """
+    Return a list of human-readable regressions of ``results`` against
+    ``baseline``. Latency, query count and allocation may grow and
+    throughput may shrink by ``tolerance`` (a fraction) before counting.
+    Any failed request is a regression, baseline or not.
+    """
+    regressions = []
+    for name, current in results.items():
+        if current.get("failures"):
+            regressions.append(f"{name}.failures: {current['failures']} failed requests")
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        for metric in METRICS:
+            if metric not in previous:
+                continue
+            old, new = previous[metric], current[metric]
+            if metric == "rps":
+                regressed = new < old * (1 - tolerance)
+            else:
+                regressed = new > old * (1 + tolerance)
+            if regressed:
+                regressions.append(f"{name}.{metric}: {old} -> {new}")
+    return regressions
+
+
+def benchmark_serializers(rows=1000, repeat=5):
+    """
+    Per-row cost, in microseconds, of fetching and serializing ``rows``
+    active subscribers with ``ReadSubscriberSerializer`` and with the
+    ``ValuesListSerializer`` fast path. Best of ``repeat`` runs each.
+    """
+    subscribers = Subscriber.objects.filter(is_active=True).order_by(
+        "-created_at", "-pkid"
+    )[:rows]
+    fast = ValuesListSerializer(ReadSubscriberSerializer)
+
+    def best(serialize):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            count = len(serialize())
+            timings.append(time.perf_counter() - start)
+        return min(timings) / max(count, 1) * 1_000_000
+
+    serializer = best(
+        lambda: ReadSubscriberSerializer(subscribers.select_related("plan"), many=True).data
+    )
+    fast_path = best(lambda: fast.serialize(fast.values(subscribers)))
+    return {
+        "rows": subscribers.count(),
+        "serializer_us_per_row": round(serializer, 2),
+        "fast_path_us_per_row": round(fast_path, 2),
+        "speedup": round(serializer / fast_path, 2),
+    }
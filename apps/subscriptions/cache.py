@@ -0,0 +1,195 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.utils.encoders import JSONEncoder
+
+from .metrics import PLAN_CACHE
+from .models import Plan
+from .serializers import PlanSerializer
+
+logger = logging.getLogger(__name__)
+
+PLAN_CATALOGUE_KEY = "subscriptions:plan_catalogue"
+PLAN_VERSION_KEY = "subscriptions:plan_version"
+
+PLAN_LOOKUPS = ("id", "stripe_price_id")
+
+
+def build_plan_catalogue():
+    """
+    Serialize every plan and compute an ETag over the serialized payload.
+    """
+    payload = PlanSerializer(Plan.objects.all(), many=True).data
+    body = json.dumps(payload, cls=JSONEncoder, sort_keys=True).encode()
+    etag = f'"{hashlib.md5(body).hexdigest()}"'
+    return {"etag": etag, "payload": payload}
+
+
+def get_plan_catalogue():
+    """
+    Return the cached ``{"etag", "payload"}`` plan catalogue, rebuilding
+    and caching it on a miss.
+    """
+    catalogue = cache.get(PLAN_CATALOGUE_KEY)
+    if catalogue is None:
+        catalogue = build_plan_catalogue()
+        cache.set(PLAN_CATALOGUE_KEY, catalogue, settings.CACHE_TIMEOUT)
+    return catalogue
+
+
+def invalidate_plan_catalogue():
+    try:
+        cache.delete(PLAN_CATALOGUE_KEY)
+    except Exception as e:
+        logger.warning(f"Plan catalogue cache unavailable, not invalidated: {str(e)}")
+
+
+class PlanCache:
+    """
+    Per-process LRU of up to ``maxsize`` ``Plan`` instances, reachable by
+    ``id`` and by ``stripe_price_id``. Entries expire after ``ttl`` seconds.
+
+    Processes share no memory, so a plan change bumps a version counter in
+    the shared cache (``bump_plan_version``); each process compares it with
+    the version it last saw at most every ``check_interval`` seconds and
+    drops everything when it moved. Cached instances are shared between
+    threads and must not be modified.
+    """
+
+    def __init__(self, maxsize, ttl, check_interval):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.version = None
+        self.checked_at = None
+
+    def version_check_due(self):
+        return self.checked_at is None or (
+            time.monotonic() - self.checked_at >= self.check_interval
+        )
+
+    def sync_version(self, version):
+        with self.lock:
+            if version != self.version:
+                self.entries.clear()
+                self.version = version
+            self.checked_at = time.monotonic()
+
+    @staticmethod
+    def keys(plan):
+        return [(field, str(getattr(plan, field))) for field in PLAN_LOOKUPS]
+
+    def get(self, field, value):
+        key = (field, str(value))
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires_at, plan = entry
+            if expires_at <= time.monotonic():
+                del self.entries[key]
+                return None
+            for plan_key in self.keys(plan):
+                if plan_key in self.entries:
+                    self.entries.move_to_end(plan_key)
+            return plan
+
+    def put(self, plan):
+        expires_at = time.monotonic() + self.ttl
+        with self.lock:
+            for key in self.keys(plan):
+                self.entries[key] = (expires_at, plan)
+                self.entries.move_to_end(key)
+            # One entry per lookup field; maxsize counts plans.
+            while len(self.entries) > self.maxsize * len(PLAN_LOOKUPS):
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.version = None
+            self.checked_at = None
+
+
+plan_cache = PlanCache(
+    maxsize=settings.PLAN_CACHE_SIZE,
+    ttl=settings.PLAN_CACHE_TTL,
+    check_interval=settings.PLAN_CACHE_VERSION_CHECK_INTERVAL,
+)
+
+
+def plan_lookup(lookup):
+    if len(lookup) != 1 or not lookup.keys() <= set(PLAN_LOOKUPS):
+        raise TypeError(f"Pass exactly one of {', '.join(PLAN_LOOKUPS)}")
+    (field, value), = lookup.items()
+    return field, value
+
+
+def get_plan(**lookup):
+    """
+    Return the plan with the given ``id`` or ``stripe_price_id`` from the
+    process cache, loading it from the database on a miss. Raises
+    ``Plan.DoesNotExist`` like ``Plan.objects.get``. While the shared cache
+    is unreachable the process cache cannot be trusted and is bypassed.
+    """
+    field, value = plan_lookup(lookup)
+    if plan_cache.version_check_due():
+        try:
+            version = cache.get(PLAN_VERSION_KEY)
+        except Exception as e:
+            logger.warning(f"Plan version unavailable, reading plans from the database: {str(e)}")
+            return Plan.objects.get(**{field: value})
+        plan_cache.sync_version(version)
+    plan = plan_cache.get(field, value)
+    if plan is not None:
+        PLAN_CACHE.labels(result="hit").inc()
+        return plan
+    PLAN_CACHE.labels(result="miss").inc()
+    plan = Plan.objects.get(**{field: value})
+    plan_cache.put(plan)
+    return plan
+
+
+async def aget_plan(**lookup):
+    field, value = plan_lookup(lookup)
+    if plan_cache.version_check_due():
+        try:
+            version = await cache.aget(PLAN_VERSION_KEY)
+        except Exception as e:
+            logger.warning(f"Plan version unavailable, reading plans from the database: {str(e)}")
+            return await Plan.objects.aget(**{field: value})
+        plan_cache.sync_version(version)
+    plan = plan_cache.get(field, value)
+    if plan is not None:
+        PLAN_CACHE.labels(result="hit").inc()
+        return plan
+    PLAN_CACHE.labels(result="miss").inc()
+    plan = await Plan.objects.aget(**{field: value})
+    plan_cache.put(plan)
+    return plan
+
+
+def bump_plan_version():
+    """
+    Make every process drop its cached plans on its next version check.
+    Without the shared cache only this process's plans are dropped; the
+    others pick the change up when their entries expire (``PLAN_CACHE_TTL``).
+    """
+    plan_cache.clear()
+    try:
+        cache.add(PLAN_VERSION_KEY, 0, None)
+        try:
+            cache.incr(PLAN_VERSION_KEY)
+        except ValueError:
+            # Evicted since the add; any value no process has seen will do.
+            cache.set(PLAN_VERSION_KEY, time.time_ns(), None)
+    except Exception as e:
+        logger.warning(f"Plan version not bumped, cache unavailable: {str(e)}")
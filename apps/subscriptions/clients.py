@@ -0,0 +1,121 @@
+import logging
+import threading
+import time
+
+from celery.signals import worker_process_init, worker_process_shutdown
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from twilio.http.http_client import TwilioHttpClient
+from twilio.rest import Client
+
+from .metrics import HTTP_CLIENT_DURATION, HTTP_CLIENT_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+
+class KeepAliveHTTPAdapter(HTTPAdapter):
+    """
+    ``requests`` adapter with a sized connection pool that records, per
+    outbound request, its duration and whether a pooled connection was
+    reused or a new one had to be opened. Requests made from Celery workers
+    are served by the worker metrics exporter (``WORKER_METRICS_PORT``).
+    """
+
+    def __init__(self, service, pool_size=10, **kwargs):
+        self.service = service
+        super().__init__(pool_connections=1, pool_maxsize=pool_size, **kwargs)
+
+    def send(self, request, **kwargs):
+        pool = self.get_connection_with_tls_context(
+            request, kwargs.get("verify", True), kwargs.get("proxies"), kwargs.get("cert")
+        )
+        opened = pool.num_connections
+        start = time.perf_counter()
+        try:
+            response = super().send(request, **kwargs)
+        finally:
+            HTTP_CLIENT_DURATION.labels(service=self.service).observe(
+                time.perf_counter() - start
+            )
+        connection = "new" if pool.num_connections > opened else "reused"
+        HTTP_CLIENT_REQUESTS.labels(service=self.service, connection=connection).inc()
+        return response
+
+
+class TwilioClientRegistry:
+    """
+    Holds one Twilio client per process, so every message sent by a Celery
+    worker process goes through the same keep-alive HTTP session.
+    """
+
+    def __init__(self):
+        self._client = None
+        self._lock = threading.Lock()
+
+    def build(self):
+        http_client = TwilioHttpClient(
+            pool_connections=True, timeout=settings.TWILIO_READ_TIMEOUT
+        )
+        # The constructor only accepts a single number, but the value is
+        # handed straight to requests, which also takes (connect, read).
+        http_client.timeout = (
+            settings.TWILIO_CONNECT_TIMEOUT,
+            settings.TWILIO_READ_TIMEOUT,
+        )
+        adapter = KeepAliveHTTPAdapter(
+            "twilio",
+            pool_size=settings.TWILIO_POOL_SIZE,
+            max_retries=settings.TWILIO_MAX_RETRIES,
+        )
+        http_client.session.mount("https://", adapter)
+        http_client.session.mount("http://", adapter)
+        client = Client(
+            settings.TWILIO_ACCOUNT_SID,
+            settings.TWILIO_AUTH_TOKEN,
+            http_client=http_client,
+        )
+        if settings.TWILIO_API_BASE:
+            client.api.base_url = settings.TWILIO_API_BASE
+        return client
+
+    def get(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self.build()
+        return self._client
+
+    def replace(self, client):
+        """
+        Use ``client`` for the rest of the process, e.g. a local fake.
+        """
+        self.close()
+        with self._lock:
+            self._client = client
+
+    def close(self):
+        with self._lock:
+            session = getattr(self._client and self._client.http_client, "session", None)
+            if session is not None:
+                session.close()
+            self._client = None
+
+
+twilio_clients = TwilioClientRegistry()
+
+
+def get_twilio_client():
+    return twilio_clients.get()
+
+
+@worker_process_init.connect
+def init_worker_clients(**kwargs):
+    # Forked worker processes must not share the parent's sockets.
+    twilio_clients.close()
+    twilio_clients.get()
+    logger.info("Twilio client initialized for worker process")
+
+
+@worker_process_shutdown.connect
+def close_worker_clients(**kwargs):
+    twilio_clients.close()
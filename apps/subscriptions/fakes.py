@@ -0,0 +1,458 @@
+"""
+Local stand-ins for the Stripe and Twilio APIs, for load tests and offline
+development.
+
+``FakeProviders`` implements the subset of both APIs used by
+``StripeService`` and the SMS tasks, with optional latency and error-rate
+injection. It can be used in-process through ``FakeStripeHTTPClient`` and
+``FakeTwilioHttpClient`` (see ``install_fakes``), or over HTTP through
+``FakeProviderServer`` / ``manage.py run_fake_providers``.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import itertools
+import json
+import logging
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+import stripe
+from django.conf import settings
+from twilio.http import HttpClient
+from twilio.http.response import Response as TwilioResponse
+from twilio.rest import Client
+
+logger = logging.getLogger(__name__)
+
+TWILIO_MESSAGES_PATH = re.compile(r"^/2010-04-01/Accounts/(?P<sid>\w+)/Messages\.json$")
+
+
+def sign_webhook_payload(payload, secret=None, timestamp=None):
+    """
+    Return a ``Stripe-Signature`` header value for ``payload``, signed the
+    way Stripe signs webhooks, with ``STRIPE_WEBHOOK_SECRET`` by default.
+    """
+    secret = settings.STRIPE_WEBHOOK_SECRET if secret is None else secret
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    signature = hmac.new(
+        secret.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256
+    ).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+def decode_stripe_params(pairs):
+    """
+    Turn Stripe's form encoding (``items[0][price]=...``) back into nested
+    dicts and lists.
+    """
+    params = {}
+    for key, value in pairs:
+        parts = re.findall(r"[^\[\]]+", key)
+        node = params
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+        node[parts[-1]] = value
+
+    def listify(node):
+        if not isinstance(node, dict):
+            return node
+        if node and all(key.isdigit() for key in node):
+            return [listify(node[key]) for key in sorted(node, key=int)]
+        return {key: listify(value) for key, value in node.items()}
+
+    return listify(params)
+
+
+class FakeProviders:
+    """
+    In-memory Stripe and Twilio state plus request routing.
+
+    ``latency`` seconds are added to every call and ``error_rate`` is the
+    probability of answering with a provider 500 error. ``seed`` makes the
+    error injection repeatable. When ``webhook_url`` is set, subscription
+    changes are delivered there as signed Stripe webhooks. POSTs with an
+    ``Idempotency-Key`` replay the first answer for that key, as Stripe does.
+    """
+
+    def __init__(self, latency=0.0, error_rate=0.0, seed=None, webhook_url=None, webhook_secret=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.webhook_url = webhook_url
+        self.webhook_secret = webhook_secret
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counter = itertools.count(1)
+        self.objects = {}
+        self.messages = []
+        self.events = []
+        self.calls = []
+        self.idempotent_responses = {}
+
+    def next_id(self, prefix):
+        return f"{prefix}_fake{next(self.counter):010d}"
+
+    def should_fail(self):
+        with self.lock:
+            return self.error_rate and self.random.random() < self.error_rate
+
+    def store(self, prefix, obj_type, values):
+        obj = {"id": self.next_id(prefix), "object": obj_type, "created": int(time.time())}
+        obj.update(values)
+        with self.lock:
+            self.objects[obj["id"]] = obj
+        return obj
+
+    # Stripe
+
+    def handle_stripe(self, method, path, params):
+        """
+        Route a Stripe API request. Returns ``(status_code, body)``.
+        """
+        self.calls.append(("stripe", method, path))
+        if self.should_fail():
+            return 500, {"error": {"type": "api_error", "message": "Injected failure"}}
+
+        parts = path.strip("/").split("/")[1:]  # drop the "v1" prefix
+        resource, rest = parts[0], parts[1:]
+
+        if method == "POST" and resource == "customers" and not rest:
+            invoice_settings = params.get("invoice_settings", {})
+            return 200, self.store(
+                "cus",
+                "customer",
+                {
+                    "email": params.get("email"),
+                    "name": params.get("name"),
+                    "phone": params.get("phone"),
+                    "invoice_settings": invoice_settings,
+                    "metadata": params.get("metadata", {}),
+                },
+            )
+        if method == "POST" and resource == "payment_methods" and rest[1:] == ["attach"]:
+            return 200, {
+                "id": rest[0],
+                "object": "payment_method",
+                "customer": params.get("customer"),
+            }
+        if method == "POST" and resource == "payment_intents" and not rest:
+            intent = self.store(
+                "pi",
+                "payment_intent",
+                {
+                    "amount": int(params.get("amount", 0)),
+                    "currency": params.get("currency"),
+                    "customer": params.get("customer"),
+                    "metadata": params.get("metadata", {}),
+                    "status": "requires_confirmation",
+                },
+            )
+            intent["client_secret"] = f"{intent['id']}_secret_fake"
+            return 200, intent
+        if method == "POST" and resource == "subscriptions" and not rest:
+            subscription = self.store(
+                "sub",
+                "subscription",
+                {
+                    "customer": params.get("customer"),
+                    "items": {"object": "list", "data": params.get("items", [])},
+                    "status": "active",
+                },
+            )
+            self.emit("customer.subscription.created", subscription)
+            return 200, subscription
+        if method == "GET" and resource == "subscriptions" and not rest:
+            return 200, self.list_objects("subscription", path, params)
+        if method == "DELETE" and resource == "subscriptions" and rest:
+            subscription = self.objects.get(rest[0])
+            if subscription is None:
+                return self.missing(rest[0])
+            subscription["status"] = "canceled"
+            self.emit("customer.subscription.deleted", subscription)
+            return 200, subscription
+        if method == "POST" and resource == "prices" and not rest:
+            return 200, self.store(
+                "price",
+                "price",
+                {
+                    "currency": params.get("currency"),
+                    "unit_amount": int(params.get("unit_amount", 0)),
+                    "recurring": params.get("recurring"),
+                    "product": self.next_id("prod"),
+                },
+            )
+        if resource == "customers" and len(rest) == 1:
+            customer = self.objects.get(rest[0])
+            if customer is None:
+                return self.missing(rest[0])
+            if method == "POST":
+                customer.update(params)
+            return 200, customer
+
+        return 404, {
+            "error": {
+                "type": "invalid_request_error",
+                "message": f"Unrecognized request URL ({method}: {path})",
+            }
+        }
+
+    def missing(self, object_id):
+        return 404, {
+            "error": {
+                "type": "invalid_request_error",
+                "code": "resource_missing",
+                "message": f"No such object: '{object_id}'",
+            }
+        }
+
+    def list_objects(self, obj_type, path, params):
+        """
+        Stripe list endpoint: newest first, with ``limit``,
+        ``starting_after`` and ``created[gt|gte|lt|lte]`` filters.
+        """
+        with self.lock:
+            rows = [obj for obj in self.objects.values() if obj["object"] == obj_type]
+        rows.sort(key=lambda obj: (obj["created"], obj["id"]), reverse=True)
+
+        created = params.get("created", {})
+        if not isinstance(created, dict):
+            created = {"eq": created}
+        filters = {
+            "gt": lambda a, b: a > b,
+            "gte": lambda a, b: a >= b,
+            "lt": lambda a, b: a < b,
+            "lte": lambda a, b: a <= b,
+            "eq": lambda a, b: a == b,
+        }
+        for op, value in created.items():
+            rows = [obj for obj in rows if filters[op](obj["created"], int(value))]
+
+        starting_after = params.get("starting_after")
+        if starting_after:
+            ids = [obj["id"] for obj in rows]
+            start = ids.index(starting_after) + 1 if starting_after in ids else len(rows)
+            rows = rows[start:]
+
+        limit = int(params.get("limit", 10))
+        return {
+            "object": "list",
+            "url": path,
+            "data": rows[:limit],
+            "has_more": len(rows) > limit,
+        }
+
+    def emit(self, event_type, obj):
+        event = {
+            "id": self.next_id("evt"),
+            "object": "event",
+            "type": event_type,
+            "created": int(time.time()),
+            "data": {"object": obj},
+        }
+        self.events.append(event)
+        if self.webhook_url:
+            threading.Thread(target=self.deliver, args=(event,), daemon=True).start()
+        return event
+
+    def deliver(self, event):
+        payload = json.dumps(event)
+        try:
+            requests.post(
+                self.webhook_url,
+                data=payload,
+                headers={
+                    "Content-Type": "application/json",
+                    "Stripe-Signature": sign_webhook_payload(payload, self.webhook_secret),
+                },
+                timeout=10,
+            )
+        except requests.RequestException as e:
+            logger.error(f"Failed to deliver fake webhook {event['id']}: {str(e)}")
+
+    # Twilio
+
+    def handle_twilio(self, method, path, data):
+        """
+        Route a Twilio API request. Returns ``(status_code, body)``.
+        """
+        self.calls.append(("twilio", method, path))
+        if self.should_fail():
+            return 500, {"code": 20500, "message": "Injected failure", "status": 500}
+
+        match = TWILIO_MESSAGES_PATH.match(path)
+        if method != "POST" or match is None:
+            return 404, {"code": 20404, "message": "Not found", "status": 404}
+
+        message = {
+            "sid": self.next_id("SM"),
+            "account_sid": match.group("sid"),
+            "to": data.get("To"),
+            "from": data.get("From"),
+            "body": data.get("Body"),
+            "status": "queued",
+        }
+        with self.lock:
+            self.messages.append(message)
+        return 201, message
+
+    def handle(self, method, url, body="", idempotency_key=None):
+        """
+        Route a raw HTTP request to the Stripe or Twilio handler.
+        """
+        parts = urlsplit(url)
+        pairs = parse_qsl(parts.query) + parse_qsl(body or "")
+        if not parts.path.startswith("/v1/"):
+            return self.handle_twilio(method, parts.path, dict(pairs))
+        if method != "POST" or not idempotency_key:
+            return self.handle_stripe(method, parts.path, decode_stripe_params(pairs))
+
+        with self.lock:
+            response = self.idempotent_responses.get(idempotency_key)
+        if response is not None:
+            return response
+        response = self.handle_stripe(method, parts.path, decode_stripe_params(pairs))
+        # Stripe does not save the result of requests that failed server side.
+        if response[0] < 500:
+            with self.lock:
+                response = self.idempotent_responses.setdefault(idempotency_key, response)
+        return response
+
+
+class FakeStripeHTTPClient(stripe.HTTPClient):
+    """
+    Stripe HTTP client that answers from ``FakeProviders`` in-process.
+    """
+
+    name = "fake"
+
+    def __init__(self, providers):
+        super().__init__()
+        self.providers = providers
+
+    def request(self, method, url, headers, post_data=None):
+        if self.providers.latency:
+            time.sleep(self.providers.latency)
+        status_code, body = self.providers.handle(
+            method.upper(), url, post_data, headers.get("Idempotency-Key")
+        )
+        return json.dumps(body), status_code, {}
+
+    async def request_async(self, method, url, headers, post_data=None):
+        if self.providers.latency:
+            await asyncio.sleep(self.providers.latency)
+        status_code, body = self.providers.handle(
+            method.upper(), url, post_data, headers.get("Idempotency-Key")
+        )
+        return json.dumps(body).encode(), status_code, {}
+
+    def sleep_async(self, secs):
+        return asyncio.sleep(secs)
+
+    def close(self):
+        pass
+
+    async def close_async(self):
+        pass
+
+
+class FakeTwilioHttpClient(HttpClient):
+    """
+    Twilio HTTP client that answers from ``FakeProviders`` in-process.
+    """
+
+    def __init__(self, providers):
+        super().__init__(logger, is_async=False)
+        self.providers = providers
+
+    def request(
+        self,
+        method,
+        uri,
+        params=None,
+        data=None,
+        headers=None,
+        auth=None,
+        timeout=None,
+        allow_redirects=False,
+    ):
+        if self.providers.latency:
+            time.sleep(self.providers.latency)
+        status_code, body = self.providers.handle_twilio(
+            method.upper(), urlsplit(uri).path, data or {}
+        )
+        return TwilioResponse(status_code, json.dumps(body))
+
+
+def install_fakes(providers):
+    """
+    Point ``get_stripe_service()`` and ``get_twilio_client()`` at
+    ``providers`` for the rest of the process.
+    """
+    from .clients import twilio_clients
+    from .services import StripeService, set_stripe_service
+
+    set_stripe_service(
+        StripeService(
+            client=stripe.StripeClient(
+                settings.STRIPE_TEST_KEY or "sk_test_fake",
+                http_client=FakeStripeHTTPClient(providers),
+            )
+        )
+    )
+    twilio_clients.replace(
+        Client(
+            settings.TWILIO_ACCOUNT_SID,
+            settings.TWILIO_AUTH_TOKEN,
+            http_client=FakeTwilioHttpClient(providers),
+        )
+    )
+    return providers
+
+
+class FakeProviderRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def handle_request(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length).decode() if length else ""
+        providers = self.server.providers
+        if providers.latency:
+            time.sleep(providers.latency)
+        status_code, payload = providers.handle(
+            self.command, self.path, body, self.headers.get("Idempotency-Key")
+        )
+        data = json.dumps(payload).encode()
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST = do_DELETE = handle_request
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+class FakeProviderServer(ThreadingHTTPServer):
+    """
+    HTTP server exposing ``FakeProviders`` on ``address``. Point
+    ``STRIPE_API_BASE`` and ``TWILIO_API_BASE`` at ``url`` to use it.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, providers, address=("127.0.0.1", 0)):
+        super().__init__(address, FakeProviderRequestHandler)
+        self.providers = providers
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
@@ -0,0 +1,105 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from apps.subscriptions.benchmarks import (
+    DATASETS,
+    SCENARIOS,
+    benchmark_serializers,
+    compare_to_baseline,
+    ensure_dataset,
+    run_scenario,
+)
+from apps.subscriptions.clients import twilio_clients
+from apps.subscriptions.fakes import FakeProviders, install_fakes
+from apps.subscriptions.services import set_stripe_service
+from churchpad.celery import app
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the subscription API against a seeded dataset with local "
+        "Stripe/Twilio stand-ins. Writes to the configured database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scenario",
+            action="append",
+            choices=sorted(SCENARIOS),
+            help="Scenario to run (repeatable, default: all)",
+        )
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument(
+            "--dataset",
+            choices=sorted(DATASETS),
+            help="Seed at least this many subscribers before running",
+        )
+        parser.add_argument(
+            "--provider-latency",
+            type=float,
+            default=0.0,
+            help="Seconds of simulated Stripe/Twilio latency per call",
+        )
+        parser.add_argument(
+            "--broker",
+            action="store_true",
+            help="Publish Celery tasks to the real broker instead of running them eagerly",
+        )
+        parser.add_argument(
+            "--serializers",
+            action="store_true",
+            help="Also compare per-row cost of the list serializer and its fast path",
+        )
+        parser.add_argument("--output", help="Write results as JSON to this path")
+        parser.add_argument("--baseline", help="Fail if results regress against this JSON file")
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.2,
+            help="Allowed regression against the baseline, as a fraction",
+        )
+
+    def handle(self, *args, **options):
+        if options["dataset"]:
+            created = ensure_dataset(DATASETS[options["dataset"]])
+            self.stdout.write(f"Seeded {created} subscribers")
+
+        install_fakes(FakeProviders(latency=options["provider_latency"]))
+        app.conf.task_always_eager = not options["broker"]
+        results = {}
+        try:
+            with override_settings(
+                EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+                CELERY_EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+                STRIPE_WEBHOOK_SECRET="whsec_benchmark",
+            ):
+                for name in options["scenario"] or SCENARIOS:
+                    results[name] = run_scenario(
+                        SCENARIOS[name](),
+                        requests=options["requests"],
+                        concurrency=options["concurrency"],
+                    )
+                    self.stdout.write(f"{name}: {json.dumps(results[name])}")
+        finally:
+            app.conf.task_always_eager = False
+            set_stripe_service(None)
+            twilio_clients.close()
+
+        if options["serializers"]:
+            results["serializers"] = benchmark_serializers()
+            self.stdout.write(f"serializers: {json.dumps(results['serializers'])}")
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+
+        if options["baseline"]:
+            with open(options["baseline"]) as f:
+                baseline = json.load(f)
+            regressions = compare_to_baseline(results, baseline, options["tolerance"])
+            if regressions:
+                raise CommandError("Regressions:\n" + "\n".join(regressions))
+            self.stdout.write(self.style.SUCCESS("No regressions against baseline"))
@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.subscriptions.fakes import FakeProviders, FakeProviderServer
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve local stand-ins for the Stripe and Twilio APIs. Point "
+        "STRIPE_API_BASE and TWILIO_API_BASE at the printed URL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=12111)
+        parser.add_argument(
+            "--latency", type=float, default=0.0, help="Seconds added to every call"
+        )
+        parser.add_argument(
+            "--error-rate",
+            type=float,
+            default=0.0,
+            help="Probability (0-1) of answering a call with a 500 error",
+        )
+        parser.add_argument("--seed", type=int, default=None)
+        parser.add_argument(
+            "--webhook-url",
+            default=None,
+            help="Deliver signed subscription webhooks to this URL",
+        )
+
+    def handle(self, *args, **options):
+        providers = FakeProviders(
+            latency=options["latency"],
+            error_rate=options["error_rate"],
+            seed=options["seed"],
+            webhook_url=options["webhook_url"],
+            webhook_secret=settings.STRIPE_WEBHOOK_SECRET,
+        )
+        server = FakeProviderServer(providers, (options["host"], options["port"]))
+        self.stdout.write(
+            self.style.SUCCESS(f"Fake Stripe/Twilio listening on {server.url}")
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
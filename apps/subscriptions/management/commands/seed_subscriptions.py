@@ -0,0 +1,59 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.subscriptions.models import Plan
+from apps.subscriptions.seeding import seed_plans, seed_subscribers
+
+
+class Command(BaseCommand):
+    help = "Bulk-load synthetic plans and subscribers for benchmarks and staging."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--subscribers", type=int, default=10_000)
+        parser.add_argument(
+            "--plans",
+            type=int,
+            default=0,
+            help="Plans to create; subscribers use existing plans when 0",
+        )
+        parser.add_argument("--batch-size", type=int, default=10_000)
+        parser.add_argument(
+            "--active-ratio",
+            type=float,
+            default=0.9,
+            help="Fraction of subscribers marked active",
+        )
+        parser.add_argument(
+            "--no-copy",
+            action="store_true",
+            help="Use bulk_create even on PostgreSQL",
+        )
+        parser.add_argument("--seed", type=int, default=None, help="Faker seed")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        plan_pkids = []
+        if options["plans"]:
+            plan_pkids = seed_plans(options["plans"])
+            self.stdout.write(f"Created {len(plan_pkids)} plans")
+        else:
+            plan_pkids = list(Plan.objects.values_list("pkid", flat=True))
+        if options["subscribers"] and not plan_pkids:
+            raise CommandError("No plans to subscribe to; pass --plans")
+
+        total = options["subscribers"]
+        seed_subscribers(
+            total,
+            plan_pkids,
+            batch_size=options["batch_size"],
+            active_ratio=options["active_ratio"],
+            use_copy=not options["no_copy"],
+            seed=options["seed"],
+            progress=lambda done: self.stdout.write(f"{done}/{total} subscribers"),
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Seeded {total} subscribers in {time.perf_counter() - start:.1f}s"
+            )
+        )
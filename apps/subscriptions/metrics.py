@@ -0,0 +1,31 @@
+from prometheus_client import Counter, Histogram
+
+STRIPE_EVENT_DEDUP = Counter(
+    "churchpad_stripe_event_dedup_total",
+    "Stripe webhook deliveries checked for redelivery, by layer and result.",
+    ["layer", "result"],
+)
+
+HTTP_CLIENT_REQUESTS = Counter(
+    "churchpad_http_client_requests_total",
+    "Outbound provider HTTP requests, by service and whether a pooled connection was reused.",
+    ["service", "connection"],
+)
+
+HTTP_CLIENT_DURATION = Histogram(
+    "churchpad_http_client_request_duration_seconds",
+    "Duration of outbound provider HTTP requests, by service.",
+    ["service"],
+)
+
+STRIPE_CUSTOMER_CACHE = Counter(
+    "churchpad_stripe_customer_cache_total",
+    "Stripe customer snapshot lookups, by result (hit or miss).",
+    ["result"],
+)
+
+PLAN_CACHE = Counter(
+    "churchpad_plan_cache_total",
+    "In-process plan lookups, by result (hit or miss).",
+    ["result"],
+)
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.1 on 2026-10-18 16:42
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("subscriptions", "0003_stripeevent"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SyncCursor",
+            fields=[
+                (
+                    "pkid",
+                    models.BigAutoField(
+                        editable=False, primary_key=True, serialize=False
+                    ),
+                ),
+                (
+                    "id",
+                    models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "name",
+                    models.CharField(max_length=100, unique=True, verbose_name="Name"),
+                ),
+                (
+                    "high_water_mark",
+                    models.PositiveBigIntegerField(
+                        default=0, verbose_name="High Water Mark"
+                    ),
+                ),
+                (
+                    "last_run_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Last Run At"
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-created_at", "-updated_at"],
+                "abstract": False,
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-18 16:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("subscriptions", "0004_synccursor"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="subscriber",
+            name="subscriptio_email_1fc610_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="subscriber",
+            name="subscriptio_is_acti_6b04ba_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="subscriber",
+            name="subscriptio_plan_id_2fe586_idx",
+        ),
+        migrations.AddIndex(
+            model_name="subscriber",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["-created_at", "-pkid"],
+                name="subscriber_active_recent_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("subscriptions", "0006_stripeevent_next_attempt_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="subscriber",
+            name="cancelled_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Cancelled At"
+            ),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("subscriptions", "0007_subscriber_cancelled_at"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="plan",
+            name="stripe_price_id",
+            field=models.CharField(
+                max_length=100, unique=True, verbose_name="Stripe Price ID"
+            ),
+        ),
+    ]
@@ -10,7 +10,7 @@ class Plan(TimeStampedModel):
 
     name = models.CharField(verbose_name=_("Name"), max_length=100)
     stripe_price_id = models.CharField(
-        verbose_name=_("Stripe Price ID"), max_length=100
+        verbose_name=_("Stripe Price ID"), max_length=100, unique=True
     )
     price = models.DecimalField(
         verbose_name=_("Price"), max_digits=10, decimal_places=2
@@ -34,13 +34,77 @@ class Subscriber(TimeStampedModel):
     is_active = models.BooleanField(default=False)
     stripe_customer_id = models.CharField(max_length=100, unique=True)
     stripe_subscription_id = models.CharField(max_length=100, unique=True)
+    # Set when the subscriber opts out locally; never reactivated after that
+    cancelled_at = models.DateTimeField(
+        verbose_name=_("Cancelled At"), null=True, blank=True
+    )
 
     class Meta:
+        # email, stripe_customer_id and stripe_subscription_id are covered by
+        # their unique constraints and plan by the foreign key index.
         indexes = [
-            models.Index(fields=["email"]),
-            models.Index(fields=["is_active"]),
-            models.Index(fields=["plan"]),
+            # list_subscriptions: active subscribers, newest first (keyset)
+            models.Index(
+                fields=["-created_at", "-pkid"],
+                condition=models.Q(is_active=True),
+                name="subscriber_active_recent_idx",
+            ),
         ]
 
     def __str__(self):
         return self.email
+
+
+class StripeEvent(TimeStampedModel):
+    class Status(models.TextChoices):
+        PENDING = "pending", _("Pending")
+        PROCESSED = "processed", _("Processed")
+        IGNORED = "ignored", _("Ignored")
+        FAILED = "failed", _("Failed")
+
+    event_id = models.CharField(
+        verbose_name=_("Stripe Event ID"), max_length=255, unique=True
+    )
+    type = models.CharField(verbose_name=_("Event Type"), max_length=100)
+    payload = models.JSONField(verbose_name=_("Payload"))
+    status = models.CharField(
+        verbose_name=_("Status"),
+        max_length=20,
+        choices=Status.choices,
+        default=Status.PENDING,
+    )
+    attempts = models.PositiveIntegerField(verbose_name=_("Attempts"), default=0)
+    last_error = models.TextField(verbose_name=_("Last Error"), blank=True)
+    processed_at = models.DateTimeField(
+        verbose_name=_("Processed At"), null=True, blank=True
+    )
+    # Set while a pending event waits to be retried
+    next_attempt_at = models.DateTimeField(
+        verbose_name=_("Next Attempt At"), null=True, blank=True
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "created_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.type} ({self.event_id})"
+
+
+class SyncCursor(TimeStampedModel):
+    """
+    Progress of an incremental sync against an external API, e.g. the
+    newest Stripe ``created`` timestamp already reconciled.
+    """
+
+    name = models.CharField(verbose_name=_("Name"), max_length=100, unique=True)
+    high_water_mark = models.PositiveBigIntegerField(
+        verbose_name=_("High Water Mark"), default=0
+    )
+    last_run_at = models.DateTimeField(
+        verbose_name=_("Last Run At"), null=True, blank=True
+    )
+
+    def __str__(self):
+        return f"{self.name} ({self.high_water_mark})"
@@ -0,0 +1,116 @@
+import base64
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class KeysetPagination:
+    """
+    Keyset (seek) pagination over ``(created_at, pkid)``, newest first.
+
+    Unlike offset pagination the cost of a page does not grow with its
+    position, because each page is a range scan starting after the last
+    row of the previous one.
+    """
+
+    ordering = ("-created_at", "-pkid")
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+
+    def __init__(self):
+        self.page_size = settings.SUBSCRIPTIONS_PAGE_SIZE
+        self.max_page_size = settings.SUBSCRIPTIONS_MAX_PAGE_SIZE
+
+    @staticmethod
+    def encode_cursor(created_at, pkid):
+        raw = json.dumps([created_at.isoformat(), pkid]).encode()
+        return base64.urlsafe_b64encode(raw).decode()
+
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            created_at, pkid = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            created_at = parse_datetime(created_at)
+            pkid = int(pkid)
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise ValidationError({"cursor": "Invalid cursor."})
+        if created_at is None:
+            raise ValidationError({"cursor": "Invalid cursor."})
+        return created_at, pkid
+
+    def get_page_size(self, request):
+        value = request.query_params.get(self.page_size_query_param)
+        if value is None:
+            return self.page_size
+        try:
+            page_size = int(value)
+        except ValueError:
+            raise ValidationError({"page_size": "A valid integer is required."})
+        if page_size < 1:
+            raise ValidationError({"page_size": "Must be at least 1."})
+        return min(page_size, self.max_page_size)
+
+    def seek(self, queryset, request):
+        """
+        Order the queryset and skip everything up to and including the
+        row referenced by the ``cursor`` query parameter.
+        """
+        queryset = queryset.order_by(*self.ordering)
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            created_at, pkid = self.decode_cursor(cursor)
+            # The redundant created_at bound lets the database seek into
+            # the (created_at, pkid) index instead of scanning from its start.
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, pkid__lt=pkid),
+                created_at__lte=created_at,
+            )
+        return queryset
+
+    def paginate_queryset(self, queryset, request):
+        page_size = self.get_page_size(request)
+        # Fetch one extra row to find out whether a next page exists
+        # without issuing a COUNT(*).
+        rows = list(self.seek(queryset, request)[: page_size + 1])
+        self.next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            last = rows[-1]
+            self.next_cursor = self.encode_cursor(last.created_at, last.pkid)
+        return rows
+
+    def get_paginated_data(self, data):
+        return {"next": self.next_cursor, "results": data}
+
+
+def stream_rows(queryset, serializer, fmt="json", chunk_size=2000):
+    """
+    Yield encoded rows from a server-side cursor, one serialized object at
+    a time, so memory stays flat regardless of the result size.
+
+    ``fmt`` is ``"json"`` for a single JSON array or ``"ndjson"`` for one
+    JSON document per line.
+    """
+    encoder = JSONEncoder
+    separators = (",", ":")
+    rows = queryset.iterator(chunk_size=chunk_size)
+
+    if fmt == "ndjson":
+        for obj in rows:
+            row = serializer.to_representation(obj)
+            yield json.dumps(row, cls=encoder, separators=separators) + "\n"
+        return
+
+    yield "["
+    first = True
+    for obj in rows:
+        row = serializer.to_representation(obj)
+        yield ("" if first else ",") + json.dumps(
+            row, cls=encoder, separators=separators
+        )
+        first = False
+    yield "]"
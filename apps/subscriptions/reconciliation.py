@@ -0,0 +1,101 @@
+"""
+Resync ``Subscriber.is_active`` with Stripe, driven by the
+``reconcile_stripe_subscriptions`` task.
+
+Stripe's subscription list is paged newest first with ``starting_after``,
+optionally bounded by ``created[gte]`` set to the high-water mark stored in
+a ``SyncCursor``. Subscriptions are diffed against the database
+``STRIPE_RECONCILE_CHUNK_SIZE`` at a time, so memory stays bounded however
+many customers there are.
+"""
+
+import logging
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Subscriber, SyncCursor
+from .services import get_stripe_service
+from .subscribers import set_subscribers_active
+from .tasks import chunked
+
+logger = logging.getLogger(__name__)
+
+CURSOR_NAME = "stripe_subscriptions"
+
+# Stripe subscription statuses that keep a subscriber active
+ACTIVE_STATUSES = {"active", "trialing", "past_due"}
+
+
+def iter_stripe_subscriptions(stripe_service, created_gte=None, page_size=100):
+    starting_after = None
+    while True:
+        page = stripe_service.list_subscriptions(
+            created_gte=created_gte, starting_after=starting_after, limit=page_size
+        )
+        yield from page.data
+        if not page.has_more or not page.data:
+            return
+        starting_after = page.data[-1].id
+
+
+def reconcile_chunk(subscriptions):
+    """
+    Bring local subscribers in line with a chunk of Stripe subscriptions.
+    Returns ``(activated, deactivated)``.
+    """
+    should_be_active = {
+        subscription.id: subscription.status in ACTIVE_STATUSES
+        for subscription in subscriptions
+    }
+    to_activate, to_deactivate = [], []
+    rows = Subscriber.objects.filter(
+        stripe_subscription_id__in=should_be_active
+    ).values_list("pkid", "stripe_subscription_id", "is_active", "cancelled_at")
+    for pkid, subscription_id, is_active, cancelled_at in rows:
+        # Local opt-outs win; their Stripe cancellation may still be queued.
+        if should_be_active[subscription_id] and not is_active and cancelled_at is None:
+            to_activate.append(pkid)
+        elif is_active and not should_be_active[subscription_id]:
+            to_deactivate.append(pkid)
+
+    activated = set_subscribers_active(True, pkids=to_activate) if to_activate else 0
+    deactivated = (
+        set_subscribers_active(False, pkids=to_deactivate) if to_deactivate else 0
+    )
+    return activated, deactivated
+
+
+def reconcile_subscriptions(full=False, stripe_service=None, page_size=None, chunk_size=None):
+    """
+    Page through Stripe subscriptions created since the stored high-water
+    mark (all of them when ``full``) and fix up local ``is_active`` flags.
+
+    The high-water mark only moves once the whole listing has been applied,
+    so an interrupted run is simply repeated by the next one.
+    """
+    stripe_service = stripe_service or get_stripe_service()
+    page_size = page_size or settings.STRIPE_RECONCILE_PAGE_SIZE
+    chunk_size = chunk_size or settings.STRIPE_RECONCILE_CHUNK_SIZE
+    cursor, _ = SyncCursor.objects.get_or_create(name=CURSOR_NAME)
+
+    # gte, not gt: later subscriptions may share the mark's second.
+    created_gte = None if full else cursor.high_water_mark or None
+    high_water_mark = cursor.high_water_mark
+    result = {"seen": 0, "activated": 0, "deactivated": 0}
+    subscriptions = iter_stripe_subscriptions(stripe_service, created_gte, page_size)
+    for chunk in chunked(subscriptions, chunk_size):
+        activated, deactivated = reconcile_chunk(chunk)
+        result["seen"] += len(chunk)
+        result["activated"] += activated
+        result["deactivated"] += deactivated
+        high_water_mark = max(
+            high_water_mark, max(subscription.created for subscription in chunk)
+        )
+
+    cursor.high_water_mark = high_water_mark
+    cursor.last_run_at = timezone.now()
+    cursor.save(update_fields=["high_water_mark", "last_run_at", "updated_at"])
+    if result["activated"] or result["deactivated"]:
+        logger.warning(f"Subscribers drifted from Stripe: {result}")
+    return result
@@ -0,0 +1,155 @@
+"""
+Synthetic data for benchmarks and staging, driven by
+``manage.py seed_subscriptions``.
+
+Rows are generated in batches from small pools of Faker values combined by
+row index, so generation cost does not depend on Faker per row and
+``email``, ``stripe_customer_id`` and ``stripe_subscription_id`` stay unique.
+Subscribers are loaded with PostgreSQL ``COPY`` when available and
+``bulk_create`` otherwise.
+"""
+
+import csv
+import io
+import itertools
+import uuid
+
+from django.db import connection, transaction
+from django.utils import timezone
+from faker import Faker
+
+from .models import Plan, Subscriber
+
+POOL_SIZE = 500
+
+SUBSCRIBER_COLUMNS = (
+    "id",
+    "created_at",
+    "updated_at",
+    "name",
+    "email",
+    "phone_number",
+    "plan_id",
+    "is_active",
+    "stripe_customer_id",
+    "stripe_subscription_id",
+)
+
+
+class NamePool:
+    def __init__(self, seed=None):
+        fake = Faker()
+        fake.seed_instance(seed)
+        self.first_names = [fake.first_name() for _ in range(POOL_SIZE)]
+        self.last_names = [fake.last_name() for _ in range(POOL_SIZE)]
+
+    def name(self, i):
+        first = self.first_names[i % POOL_SIZE]
+        last = self.last_names[(i // POOL_SIZE) % POOL_SIZE]
+        return first, last
+
+
+def seed_plans(count, prefix=None):
+    """
+    Create ``count`` plans and return their primary keys.
+    """
+    prefix = prefix or uuid.uuid4().hex[:8]
+    periods = itertools.cycle(Plan.BillingPeriod.values)
+    plans = Plan.objects.bulk_create(
+        [
+            Plan(
+                name=f"Plan {i + 1}",
+                stripe_price_id=f"price_seed_{prefix}_{i}",
+                price=5 + (i % 20) * 5,
+                billing_period=next(periods),
+            )
+            for i in range(count)
+        ],
+        batch_size=1000,
+    )
+    if plans and plans[0].pkid is None:
+        return list(
+            Plan.objects.filter(stripe_price_id__startswith=f"price_seed_{prefix}_")
+            .values_list("pkid", flat=True)
+        )
+    return [plan.pkid for plan in plans]
+
+
+def subscriber_rows(start, stop, plan_pkids, prefix, active_ratio, names, now):
+    """
+    Yield subscriber column tuples, in ``SUBSCRIBER_COLUMNS`` order, for row
+    indexes ``start`` to ``stop``.
+    """
+    active_below = int(active_ratio * 100)
+    for i in range(start, stop):
+        first, last = names.name(i)
+        yield (
+            uuid.uuid4(),
+            now,
+            now,
+            f"{first} {last}",
+            f"{first.lower()}.{last.lower()}.{prefix}.{i}@example.com",
+            f"+1555{i % 10_000_000:07d}",
+            plan_pkids[i % len(plan_pkids)],
+            i % 100 < active_below,
+            f"cus_seed_{prefix}_{i}",
+            f"sub_seed_{prefix}_{i}",
+        )
+
+
+def copy_subscribers(rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    columns = ", ".join(SUBSCRIBER_COLUMNS)
+    sql = f"COPY {Subscriber._meta.db_table} ({columns}) FROM STDIN WITH (FORMAT csv)"
+    with connection.cursor() as cursor:
+        if hasattr(cursor, "copy_expert"):  # psycopg2
+            cursor.copy_expert(sql, buffer)
+        else:  # psycopg 3
+            with cursor.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+
+
+def create_subscribers(rows, batch_size):
+    Subscriber.objects.bulk_create(
+        [Subscriber(**dict(zip(SUBSCRIBER_COLUMNS, row))) for row in rows],
+        batch_size=batch_size,
+    )
+
+
+def seed_subscribers(
+    count,
+    plan_pkids,
+    batch_size=10_000,
+    active_ratio=0.9,
+    use_copy=True,
+    prefix=None,
+    seed=None,
+    progress=None,
+):
+    """
+    Load ``count`` subscribers spread over ``plan_pkids`` in batches of
+    ``batch_size``, each batch in its own transaction. ``progress`` is
+    called with the running total after every batch.
+    """
+    prefix = prefix or uuid.uuid4().hex[:8]
+    names = NamePool(seed)
+    now = timezone.now()
+    use_copy = use_copy and connection.vendor == "postgresql"
+
+    if use_copy:
+        # csv.writer str()s every value; format the shared timestamp once.
+        now = now.isoformat()
+
+    for start in range(0, count, batch_size):
+        stop = min(start + batch_size, count)
+        rows = subscriber_rows(start, stop, plan_pkids, prefix, active_ratio, names, now)
+        with transaction.atomic():
+            if use_copy:
+                copy_subscribers(rows)
+            else:
+                create_subscribers(rows, batch_size)
+        if progress:
+            progress(stop)
+    return count
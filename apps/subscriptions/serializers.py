@@ -56,3 +56,69 @@ class RegisterPriceSerializer(serializers.ModelSerializer):
     class Meta:
         model = Plan
         fields = ["name", "currency", "unit_amount", "interval"]
+
+
+class ValuesListSerializer:
+    """
+    Read-only fast path producing the same representation as a
+    ``ModelSerializer`` from ``values_list`` rows instead of model
+    instances. Nested serializers become joins in the same query.
+
+    The field conversions are taken from the serializer once, up front, so
+    serializing a row is a handful of tuple lookups and ``to_representation``
+    calls: no model instantiation and no per-row field introspection.
+    Nested serializers must follow non-nullable relations. ``extra_columns``
+    are fetched but not serialized, e.g. for pagination cursors.
+    """
+
+    def __init__(self, serializer_class, extra_columns=()):
+        self.columns = list(extra_columns)
+        self.extractors = self.compile(serializer_class())
+
+    def compile(self, serializer, prefix=""):
+        model = serializer.Meta.model
+        extractors = []
+        for field in serializer.fields.values():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.BaseSerializer):
+                if model._meta.get_field(field.source).null:
+                    raise ValueError(f"{model.__name__}.{field.source} is nullable")
+                nested = self.compile(field, f"{prefix}{field.source}__")
+                extractors.append((field.field_name, self.nested_extractor(nested)))
+                continue
+            extractors.append(
+                (
+                    field.field_name,
+                    self.column_extractor(len(self.columns), field.to_representation),
+                )
+            )
+            self.columns.append(prefix + field.source.replace(".", "__"))
+        return extractors
+
+    @staticmethod
+    def column_extractor(index, to_representation):
+        def extract(row):
+            value = row[index]
+            return None if value is None else to_representation(value)
+
+        return extract
+
+    @staticmethod
+    def nested_extractor(extractors):
+        def extract(row):
+            return {name: extract(row) for name, extract in extractors}
+
+        return extract
+
+    def values(self, queryset):
+        """
+        ``queryset`` as named rows of the columns this serializer reads.
+        """
+        return queryset.values_list(*self.columns, named=True)
+
+    def to_representation(self, row):
+        return {name: extract(row) for name, extract in self.extractors}
+
+    def serialize(self, rows):
+        return [self.to_representation(row) for row in rows]
@@ -1,47 +1,345 @@
+import asyncio
+import hashlib
+import json
+import logging
+import ssl
+import time
+import weakref
+
+import aiohttp
+import requests
 import stripe
 from django.conf import settings
+from django.core.cache import cache
+
+from .clients import KeepAliveHTTPAdapter
+from .metrics import HTTP_CLIENT_DURATION, STRIPE_CUSTOMER_CACHE
+
+logger = logging.getLogger(__name__)
+
+CUSTOMER_CACHE_KEY = "subscriptions:stripe_customer:{}"
+
+
+class TimedAIOHTTPClient(stripe.AIOHTTPClient):
+    """
+    ``AIOHTTPClient`` that records request durations like
+    ``KeepAliveHTTPAdapter`` does for synchronous calls.
+
+    An aiohttp session only works on the event loop it was created on, so
+    one is kept per running loop instead of one per client.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._sessions = weakref.WeakKeyDictionary()
+
+    @property
+    def _session(self):
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            if self._verify_ssl_certs:
+                connector = aiohttp.TCPConnector(
+                    ssl=ssl.create_default_context(cafile=stripe.ca_bundle_path)
+                )
+            else:
+                connector = aiohttp.TCPConnector(ssl=False)
+            session = self._sessions[loop] = aiohttp.ClientSession(connector=connector)
+        return session
+
+    async def close_async(self):
+        """
+        Close the session of the running loop, if it has one.
+        """
+        session = self._sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None:
+            await session.close()
+
+    async def request_async(self, method, url, headers, post_data=None):
+        start = time.perf_counter()
+        try:
+            return await super().request_async(method, url, headers, post_data)
+        finally:
+            HTTP_CLIENT_DURATION.labels(service="stripe").observe(
+                time.perf_counter() - start
+            )
+
+
+def build_stripe_client(http_client=None):
+    """
+    Build a ``StripeClient`` on a shared keep-alive HTTP session.
+
+    Retries are left to the Stripe library, which backs off exponentially
+    with jitter and only retries requests that are safe to repeat.
+    """
+    if http_client is None:
+        session = requests.Session()
+        adapter = KeepAliveHTTPAdapter("stripe", pool_size=settings.STRIPE_POOL_SIZE)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        # Async calls (the *_async methods) go through a keep-alive aiohttp
+        # session created on first use in the serving event loop.
+        async_client = TimedAIOHTTPClient(
+            timeout=aiohttp.ClientTimeout(
+                sock_connect=settings.STRIPE_CONNECT_TIMEOUT,
+                sock_read=settings.STRIPE_READ_TIMEOUT,
+            )
+        )
+        http_client = stripe.RequestsClient(
+            session=session,
+            timeout=(settings.STRIPE_CONNECT_TIMEOUT, settings.STRIPE_READ_TIMEOUT),
+            async_fallback_client=async_client,
+        )
+    base_addresses = {}
+    if settings.STRIPE_API_BASE:
+        base_addresses["api"] = settings.STRIPE_API_BASE
+    return stripe.StripeClient(
+        settings.STRIPE_TEST_KEY,
+        http_client=http_client,
+        max_network_retries=settings.STRIPE_MAX_NETWORK_RETRIES,
+        base_addresses=base_addresses,
+    )
+
+
+def signup_idempotency_key(
+    email, name, phone_number, plan_id, payment_method_id, client_key=None
+):
+    """
+    Base idempotency key for the Stripe calls of one signup: the client's
+    ``Idempotency-Key`` header when sent, otherwise a digest of the signup
+    details, so a retried request replays the original Stripe objects
+    instead of creating new ones. Append the call, e.g. ``f"{key}:customer"``.
+    """
+    if client_key:
+        source = f"client:{client_key}"
+    else:
+        source = json.dumps(
+            [email, name, phone_number, str(plan_id), payment_method_id]
+        )
+    return f"signup-{hashlib.sha256(source.encode()).hexdigest()}"
+
+
+def customer_snapshot(customer):
+    """
+    The customer fields confirmation needs, as a plain cacheable dict.
+    """
+    return {
+        "id": customer.id,
+        "name": customer.get("name"),
+        "email": customer.get("email"),
+        "phone": customer.get("phone"),
+    }
+
+
+# The snapshot cache only saves a Stripe round trip; a cache outage must not
+# fail a signup, so errors are logged and the caller falls back to Stripe.
+
+def store_customer_snapshot(customer):
+    try:
+        cache.set(
+            CUSTOMER_CACHE_KEY.format(customer.id),
+            customer_snapshot(customer),
+            settings.STRIPE_CUSTOMER_CACHE_TTL,
+        )
+    except Exception as e:
+        logger.warning(f"Stripe customer cache unavailable: {str(e)}")
+
+
+def load_customer_snapshot(customer_id):
+    try:
+        return cache.get(CUSTOMER_CACHE_KEY.format(customer_id))
+    except Exception as e:
+        logger.warning(f"Stripe customer cache unavailable: {str(e)}")
+        return None
+
+
+async def astore_customer_snapshot(customer):
+    try:
+        await cache.aset(
+            CUSTOMER_CACHE_KEY.format(customer.id),
+            customer_snapshot(customer),
+            settings.STRIPE_CUSTOMER_CACHE_TTL,
+        )
+    except Exception as e:
+        logger.warning(f"Stripe customer cache unavailable: {str(e)}")
+
+
+async def aload_customer_snapshot(customer_id):
+    try:
+        return await cache.aget(CUSTOMER_CACHE_KEY.format(customer_id))
+    except Exception as e:
+        logger.warning(f"Stripe customer cache unavailable: {str(e)}")
+        return None
 
-stripe.api_key = settings.STRIPE_TEST_KEY
+
+def request_options(idempotency_key):
+    return {"idempotency_key": idempotency_key} if idempotency_key else {}
+
+
+def customer_params(email, name, phone_number, payment_method_id):
+    params = {"email": email, "name": name, "phone": phone_number}
+    if payment_method_id:
+        # Attaches the payment method and makes it the default in the same
+        # call, instead of separate attach and update requests.
+        params["payment_method"] = payment_method_id
+        params["invoice_settings"] = {"default_payment_method": payment_method_id}
+    return params
+
+
+def payment_intent_params(amount, currency, customer_id, metadata):
+    return {
+        "amount": amount,
+        "currency": currency,
+        "customer": customer_id,
+        "setup_future_usage": "off_session",
+        "metadata": metadata,
+    }
 
 
 class StripeService:
-    @staticmethod
-    def create_customer(email, name, phone_number):
-        return stripe.Customer.create(email=email, name=name, phone=phone_number)
+    def __init__(self, client=None):
+        self.client = client or build_stripe_client()
+
+    def create_customer(
+        self, email, name, phone_number, payment_method_id=None, idempotency_key=None
+    ):
+        customer = self.client.customers.create(
+            params=customer_params(email, name, phone_number, payment_method_id),
+            options=request_options(idempotency_key),
+        )
+        store_customer_snapshot(customer)
+        return customer
+
+    def retrieve_customer(self, customer_id):
+        return self.client.customers.retrieve(customer_id)
 
-    @staticmethod
-    def attach_payment_method(payment_method_id, customer_id):
-        stripe.PaymentMethod.attach(
+    def get_customer_snapshot(self, customer_id):
+        """
+        Return the customer's snapshot from the cache written at signup,
+        retrieving the customer from Stripe only on a miss.
+        """
+        snapshot = load_customer_snapshot(customer_id)
+        if snapshot is not None:
+            STRIPE_CUSTOMER_CACHE.labels(result="hit").inc()
+            return snapshot
+        STRIPE_CUSTOMER_CACHE.labels(result="miss").inc()
+        return customer_snapshot(self.retrieve_customer(customer_id))
+
+    def attach_payment_method(self, payment_method_id, customer_id):
+        self.client.payment_methods.attach(
             payment_method_id,
-            customer=customer_id,
+            params={"customer": customer_id},
         )
-        stripe.Customer.modify(
+        self.client.customers.update(
             customer_id,
-            invoice_settings={"default_payment_method": payment_method_id},
+            params={"invoice_settings": {"default_payment_method": payment_method_id}},
+        )
+
+    def create_payment_intent(
+        self, amount, currency, customer_id, metadata, idempotency_key=None
+    ):
+        return self.client.payment_intents.create(
+            params=payment_intent_params(amount, currency, customer_id, metadata),
+            options=request_options(idempotency_key),
         )
 
-    @staticmethod
-    def create_payment_intent(amount, currency, customer_id, metadata):
-        return stripe.PaymentIntent.create(
-            amount=amount,
-            currency=currency,
-            customer=customer_id,
-            setup_future_usage="off_session",
-            metadata=metadata,
+    def create_subscription(self, customer_id, price_id):
+        return self.client.subscriptions.create(
+            params={"customer": customer_id, "items": [{"price": price_id}]}
         )
 
-    @staticmethod
-    def create_subscription(customer_id, price_id):
-        return stripe.Subscription.create(
-            customer=customer_id,
-            items=[{"price": price_id}],
+    def cancel_subscription(self, subscription_id):
+        return self.client.subscriptions.cancel(subscription_id)
+
+    def list_subscriptions(self, created_gte=None, starting_after=None, limit=100):
+        """
+        One page of subscriptions in any status, newest first.
+        """
+        params = {"status": "all", "limit": limit}
+        if created_gte:
+            params["created"] = {"gte": created_gte}
+        if starting_after:
+            params["starting_after"] = starting_after
+        return self.client.subscriptions.list(params=params)
+
+    def create_price(self, currency, unit_amount, interval, product_name):
+        return self.client.prices.create(
+            params={
+                "currency": currency,
+                "unit_amount": unit_amount,
+                "recurring": {"interval": interval},
+                "product_data": {"name": product_name},
+            }
         )
 
-    @staticmethod
-    def create_price(currency, unit_amount, interval, product_name):
-        return stripe.Price.create(
-            currency=currency,
-            unit_amount=unit_amount,
-            recurring={"interval": interval},
-            product_data={"name": product_name},
+    async def create_customer_async(
+        self, email, name, phone_number, payment_method_id=None, idempotency_key=None
+    ):
+        customer = await self.client.customers.create_async(
+            params=customer_params(email, name, phone_number, payment_method_id),
+            options=request_options(idempotency_key),
         )
+        await astore_customer_snapshot(customer)
+        return customer
+
+    async def retrieve_customer_async(self, customer_id):
+        return await self.client.customers.retrieve_async(customer_id)
+
+    async def get_customer_snapshot_async(self, customer_id):
+        snapshot = await aload_customer_snapshot(customer_id)
+        if snapshot is not None:
+            STRIPE_CUSTOMER_CACHE.labels(result="hit").inc()
+            return snapshot
+        STRIPE_CUSTOMER_CACHE.labels(result="miss").inc()
+        return customer_snapshot(await self.retrieve_customer_async(customer_id))
+
+    async def attach_payment_method_async(self, payment_method_id, customer_id):
+        await self.client.payment_methods.attach_async(
+            payment_method_id,
+            params={"customer": customer_id},
+        )
+        await self.client.customers.update_async(
+            customer_id,
+            params={"invoice_settings": {"default_payment_method": payment_method_id}},
+        )
+
+    async def create_payment_intent_async(
+        self, amount, currency, customer_id, metadata, idempotency_key=None
+    ):
+        return await self.client.payment_intents.create_async(
+            params=payment_intent_params(amount, currency, customer_id, metadata),
+            options=request_options(idempotency_key),
+        )
+
+    async def close_async(self):
+        """
+        Release the async HTTP session bound to the running event loop.
+        """
+        await self.client._requestor._client.close_async()
+
+    async def create_subscription_async(self, customer_id, price_id):
+        return await self.client.subscriptions.create_async(
+            params={"customer": customer_id, "items": [{"price": price_id}]}
+        )
+
+
+_stripe_service = None
+
+
+def get_stripe_service():
+    """
+    Return the process-wide ``StripeService``, creating it on first use.
+    """
+    global _stripe_service
+    if _stripe_service is None:
+        _stripe_service = StripeService()
+    return _stripe_service
+
+
+def set_stripe_service(service):
+    """
+    Replace the process-wide ``StripeService``, e.g. with one backed by a
+    local fake. Pass ``None`` to go back to the default on next use.
+    """
+    global _stripe_service
+    _stripe_service = service
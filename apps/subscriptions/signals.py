@@ -0,0 +1,15 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import bump_plan_version, invalidate_plan_catalogue
+from .models import Plan
+
+
+@receiver(post_save, sender=Plan)
+@receiver(post_delete, sender=Plan)
+def invalidate_plan_caches_on_change(sender, **kwargs):
+    # Invalidate once the write is visible to other connections, otherwise a
+    # concurrent request could re-cache the old plans before commit.
+    transaction.on_commit(invalidate_plan_catalogue)
+    transaction.on_commit(bump_plan_version)
@@ -0,0 +1,117 @@
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from apps.common.outbox import enqueue
+
+from .models import Subscriber
+from .tasks import cancel_stripe_subscriptions, send_email_task, send_welcome_sms
+
+LOOKUPS = {
+    "ids": "id__in",
+    "pkids": "pkid__in",
+    "customer_ids": "stripe_customer_id__in",
+}
+
+WELCOME_SUBJECT = "Welcome to ChurchPad"
+WELCOME_EMAIL = "Hi {name},\n\nThank you for subscribing to our service. We are excited to have you on board!"
+
+
+def create_subscriber(**fields):
+    """
+    Save a new subscriber and queue its welcome SMS and email in the outbox,
+    in one transaction.
+    """
+    with transaction.atomic():
+        subscriber = Subscriber.objects.create(**fields)
+        enqueue(send_welcome_sms, subscriber.id)
+        enqueue(
+            send_email_task,
+            WELCOME_SUBJECT,
+            WELCOME_EMAIL.format(name=subscriber.name),
+            [subscriber.email],
+        )
+    return subscriber
+
+
+def set_subscribers_active(is_active, batch_size=None, **identifiers):
+    """
+    Flip ``is_active`` for the subscribers identified by exactly one of
+    ``ids``, ``pkids`` or ``customer_ids`` and return how many rows changed.
+
+    Each batch of ``batch_size`` identifiers is a single
+    ``UPDATE ... WHERE <key> IN (...)`` that only writes ``is_active`` and
+    ``updated_at``, and skips rows already in the requested state.
+    """
+    if len(identifiers) != 1 or not identifiers.keys() <= LOOKUPS.keys():
+        raise TypeError(f"Pass exactly one of {', '.join(LOOKUPS)}")
+    (key, values), = identifiers.items()
+    values = list(values)
+    batch_size = batch_size or settings.SUBSCRIBER_STATUS_BATCH_SIZE
+
+    updated = 0
+    for start in range(0, len(values), batch_size):
+        batch = values[start:start + batch_size]
+        updated += set_queryset_active(
+            Subscriber.objects.filter(**{LOOKUPS[key]: batch}),
+            is_active,
+        )
+    return updated
+
+
+def set_queryset_active(queryset, is_active):
+    """
+    Flip ``is_active`` for every subscriber in ``queryset`` with a single
+    UPDATE and return how many rows changed.
+    """
+    return queryset.exclude(is_active=is_active).update(
+        is_active=is_active, updated_at=timezone.now()
+    )
+
+
+def activate_subscribers(batch_size=None, **identifiers):
+    return set_subscribers_active(True, batch_size, **identifiers)
+
+
+def deactivate_subscribers(batch_size=None, **identifiers):
+    return set_subscribers_active(False, batch_size, **identifiers)
+
+
+def unsubscribe_queryset(queryset, batch_size=None):
+    """
+    Opt the subscribers in ``queryset`` out: deactivate them, stamp
+    ``cancelled_at`` and queue cancellation of their Stripe subscriptions in
+    the outbox, all in one transaction. Opted-out subscribers are never
+    reactivated by webhooks or reconciliation. Returns how many subscribers
+    were unsubscribed; ones that already were are skipped.
+    """
+    batch_size = batch_size or settings.SUBSCRIBER_STATUS_BATCH_SIZE
+    pending = queryset.filter(cancelled_at__isnull=True)
+    unsubscribed = 0
+    with transaction.atomic():
+        while True:
+            # Updated rows drop out of ``pending``, so this walks the set.
+            batch = list(pending.values_list("pkid", "stripe_subscription_id")[:batch_size])
+            if not batch:
+                return unsubscribed
+            now = timezone.now()
+            unsubscribed += Subscriber.objects.filter(
+                pkid__in=[pkid for pkid, _ in batch], cancelled_at__isnull=True
+            ).update(is_active=False, cancelled_at=now, updated_at=now)
+            enqueue(
+                cancel_stripe_subscriptions,
+                [subscription_id for _, subscription_id in batch],
+            )
+
+
+def unsubscribe_subscribers(batch_size=None, **identifiers):
+    """
+    ``unsubscribe_queryset`` for the subscribers identified by exactly one
+    of ``ids``, ``pkids`` or ``customer_ids``.
+    """
+    if len(identifiers) != 1 or not identifiers.keys() <= LOOKUPS.keys():
+        raise TypeError(f"Pass exactly one of {', '.join(LOOKUPS)}")
+    (key, values), = identifiers.items()
+    return unsubscribe_queryset(
+        Subscriber.objects.filter(**{LOOKUPS[key]: list(values)}), batch_size
+    )
@@ -1,45 +1,333 @@
+import smtplib
+import time
+
+import requests
+import stripe
 from celery import shared_task
-from twilio.rest import Client
+from celery.utils.time import get_exponential_backoff_interval, rate
+from twilio.base.exceptions import TwilioRestException
 from django.conf import settings
-from django.core.mail import send_mail
-from .models import Subscriber
+from django.core.mail import EmailMessage, get_connection, send_mail
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .clients import get_twilio_client
+from .models import StripeEvent, Subscriber
+from .services import get_stripe_service
 import logging
 
 logger = logging.getLogger(__name__)
 
-@shared_task
+WELCOME_SMS = "Hi {name}, thanks for subscribing to our livestream service on ChurchPad!"
+
+# Exponential backoff with full jitter between attempts, capped, then give up
+# and let the failure surface (task_failure, worker logs) instead of swallowing it.
+NOTIFICATION_RETRY_POLICY = {
+    "retry_backoff": settings.NOTIFICATION_RETRY_BACKOFF,
+    "retry_backoff_max": settings.NOTIFICATION_RETRY_BACKOFF_MAX,
+    "retry_jitter": True,
+    "max_retries": settings.NOTIFICATION_MAX_RETRIES,
+}
+
+
+def retry_countdown(task):
+    """
+    Seconds to wait before the next manual ``task.retry``, following
+    ``NOTIFICATION_RETRY_POLICY``.
+    """
+    return get_exponential_backoff_interval(
+        factor=settings.NOTIFICATION_RETRY_BACKOFF,
+        retries=task.request.retries,
+        maximum=settings.NOTIFICATION_RETRY_BACKOFF_MAX,
+        full_jitter=True,
+    )
+
+
+def chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class Pacer:
+    """
+    Spaces calls to ``wait`` out to at most ``rate_limit`` per second, a
+    Celery rate string such as ``"1/s"`` or ``"60/m"``; falsy means no limit.
+    """
+
+    def __init__(self, rate_limit):
+        per_second = rate(rate_limit)
+        self.interval = 1 / per_second if per_second else 0
+        self.next_at = None
+
+    def wait(self):
+        now = time.monotonic()
+        if self.next_at is not None and self.next_at > now:
+            time.sleep(self.next_at - now)
+            now = self.next_at
+        self.next_at = now + self.interval
+
+
+def delivery_connection():
+    """
+    Mail connection to the backend that actually delivers. The default
+    ``EMAIL_BACKEND`` would only queue yet another Celery task per message,
+    so delivery errors would never reach the calling task.
+    """
+    return get_connection(
+        getattr(
+            settings,
+            "CELERY_EMAIL_BACKEND",
+            "django.core.mail.backends.smtp.EmailBackend",
+        )
+    )
+
+
+def is_permanent_twilio_error(exc):
+    """
+    Twilio 4xx errors (bad number, unsubscribed recipient...) will fail the
+    same way on every attempt; only throttling and server errors are retried.
+    """
+    return 400 <= exc.status < 500 and exc.status != 429
+
+
+@shared_task(
+    autoretry_for=(TwilioRestException, requests.RequestException),
+    **NOTIFICATION_RETRY_POLICY,
+)
 def send_welcome_sms(subscriber_id):
     """
     Celery task to send a welcome SMS to a subscriber.
     """
     try:
         subscriber = Subscriber.objects.get(id=subscriber_id)
-        client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
-        message = client.messages.create(
-            body=f"Hi {subscriber.name}, thanks for subscribing to our livestream service on ChurchPad!",
+    except Subscriber.DoesNotExist:
+        logger.error(f"Subscriber with ID {subscriber_id} does not exist.")
+        return
+
+    try:
+        get_twilio_client().messages.create(
+            body=WELCOME_SMS.format(name=subscriber.name),
             from_=settings.TWILIO_PHONE_NUMBER,
             to=subscriber.phone_number,
         )
-        logger.info(f"SMS sent to {subscriber.phone_number} for subscriber {subscriber.name}")
-    except Subscriber.DoesNotExist:
-        logger.error(f"Subscriber with ID {subscriber_id} does not exist.")
-    except Exception as e:
-        logger.error(f"Failed to send SMS to subscriber ID {subscriber_id}: {str(e)}")
+    except TwilioRestException as e:
+        if is_permanent_twilio_error(e):
+            logger.error(f"Failed to send SMS to subscriber ID {subscriber_id}: {str(e)}")
+            return
+        logger.warning(f"SMS to subscriber ID {subscriber_id} failed, retrying: {str(e)}")
+        raise
+    logger.info(f"SMS sent to {subscriber.phone_number} for subscriber {subscriber.name}")
 
 
-@shared_task
+@shared_task(
+    autoretry_for=(smtplib.SMTPException, OSError),
+    **NOTIFICATION_RETRY_POLICY,
+)
 def send_email_task(subject, message, recipient_list):
     """
     Celery task to send emails asynchronously.
     """
+    send_mail(
+        subject,
+        message,
+        settings.DEFAULT_FROM_EMAIL,
+        recipient_list,
+        fail_silently=False,
+        connection=delivery_connection(),
+    )
+    logger.info(f"Email sent to {', '.join(recipient_list)} with subject '{subject}'")
+
+
+@shared_task(bind=True, max_retries=settings.NOTIFICATION_MAX_RETRIES)
+def send_bulk_email_task(self, subject, message, subscriber_ids):
+    """
+    Celery task to email a batch of subscribers over a single SMTP connection.
+
+    ``message`` may contain a ``{name}`` placeholder, filled in per subscriber.
+    Messages are sent one by one, paced to ``EMAIL_TASK_RATE_LIMIT``, so that
+    only the recipients whose delivery failed transiently are retried; the
+    others are not emailed twice.
+    """
+    subscribers = Subscriber.objects.filter(id__in=subscriber_ids).only(
+        "name", "email"
+    )
+    connection = delivery_connection()
+    try:
+        connection.open()
+    except (smtplib.SMTPException, OSError) as e:
+        logger.warning(f"Bulk email '{subject}' could not connect, retrying: {str(e)}")
+        raise self.retry(exc=e, countdown=retry_countdown(self))
+
+    pacer = Pacer(settings.EMAIL_TASK_RATE_LIMIT)
+    sent = 0
+    retry_ids = []
+    error = None
     try:
-        send_mail(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL,
-            recipient_list,
-            fail_silently=False,
+        for subscriber in subscribers:
+            pacer.wait()
+            email = EmailMessage(
+                subject,
+                message.format(name=subscriber.name),
+                settings.DEFAULT_FROM_EMAIL,
+                [subscriber.email],
+                connection=connection,
+            )
+            try:
+                sent += email.send()
+            except smtplib.SMTPRecipientsRefused as e:
+                logger.error(f"Failed to email subscriber ID {subscriber.id}: {str(e)}")
+            except (smtplib.SMTPException, OSError) as e:
+                logger.error(f"Failed to email subscriber ID {subscriber.id}: {str(e)}")
+                retry_ids.append(str(subscriber.id))
+                error = e
+    finally:
+        connection.close()
+    logger.info(f"Bulk email '{subject}' sent to {sent} of {len(subscriber_ids)} subscribers")
+    if retry_ids:
+        logger.warning(f"Retrying bulk email '{subject}' to {len(retry_ids)} subscribers")
+        raise self.retry(
+            args=[subject, message, retry_ids], exc=error, countdown=retry_countdown(self)
+        )
+    return sent
+
+
+@shared_task(bind=True, max_retries=settings.NOTIFICATION_MAX_RETRIES)
+def send_bulk_sms(self, subscriber_ids, body=WELCOME_SMS):
+    """
+    Celery task to text a batch of subscribers through one pooled Twilio client.
+
+    ``body`` may contain a ``{name}`` placeholder, filled in per subscriber.
+    Messages are paced to ``SMS_TASK_RATE_LIMIT``. Recipients that failed
+    transiently are retried with backoff; the others are not texted twice.
+    """
+    subscribers = Subscriber.objects.filter(id__in=subscriber_ids).only(
+        "name", "phone_number"
+    )
+    client = get_twilio_client()
+    pacer = Pacer(settings.SMS_TASK_RATE_LIMIT)
+    sent = 0
+    retry_ids = []
+    error = None
+    for subscriber in subscribers:
+        pacer.wait()
+        try:
+            client.messages.create(
+                body=body.format(name=subscriber.name),
+                from_=settings.TWILIO_PHONE_NUMBER,
+                to=subscriber.phone_number,
+            )
+            sent += 1
+        except TwilioRestException as e:
+            logger.error(f"Failed to send SMS to subscriber ID {subscriber.id}: {str(e)}")
+            if not is_permanent_twilio_error(e):
+                retry_ids.append(str(subscriber.id))
+                error = e
+        except requests.RequestException as e:
+            logger.error(f"Failed to send SMS to subscriber ID {subscriber.id}: {str(e)}")
+            retry_ids.append(str(subscriber.id))
+            error = e
+    logger.info(f"Bulk SMS sent to {sent} of {len(subscriber_ids)} subscribers")
+    if retry_ids:
+        logger.warning(f"Retrying bulk SMS to {len(retry_ids)} subscribers")
+        raise self.retry(
+            args=[retry_ids, body], exc=error, countdown=retry_countdown(self)
         )
-        logger.info(f"Email sent to {', '.join(recipient_list)} with subject '{subject}'")
-    except Exception as e:
-        logger.error(f"Failed to send email to {', '.join(recipient_list)}: {str(e)}")
\ No newline at end of file
+    return sent
+
+
+@shared_task
+def announce_to_subscribers(subject, message, sms_body=None, plan_id=None):
+    """
+    Celery task to fan an announcement out to every active subscriber,
+    optionally limited to one plan, as one bulk task per
+    ``NOTIFICATION_BATCH_SIZE`` recipients.
+    """
+    subscribers = Subscriber.objects.filter(is_active=True)
+    if plan_id:
+        subscribers = subscribers.filter(plan__id=plan_id)
+    ids = subscribers.values_list("id", flat=True).iterator(
+        chunk_size=settings.NOTIFICATION_BATCH_SIZE
+    )
+    batches = 0
+    for batch in chunked(ids, settings.NOTIFICATION_BATCH_SIZE):
+        batch = [str(subscriber_id) for subscriber_id in batch]
+        send_bulk_email_task.delay(subject, message, batch)
+        if sms_body:
+            send_bulk_sms.delay(batch, sms_body)
+        batches += 1
+    logger.info(f"Announcement '{subject}' queued in {batches} batches")
+    return batches
+
+
+@shared_task
+def process_stripe_events(batch_size=None):
+    """
+    Celery task to apply pending Stripe webhook events in batches.
+
+    Rows are claimed with ``SKIP LOCKED`` so several workers can drain the
+    queue concurrently; events waiting out a retry backoff are skipped. A
+    full batch re-queues the task to keep draining.
+    """
+    from .webhooks import process_events
+
+    batch_size = batch_size or settings.STRIPE_EVENT_BATCH_SIZE
+    with transaction.atomic():
+        events = list(
+            StripeEvent.objects.select_for_update(skip_locked=True)
+            .filter(status=StripeEvent.Status.PENDING)
+            .filter(Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=timezone.now()))
+            .order_by("created_at", "pkid")[:batch_size]
+        )
+        if events:
+            process_events(events)
+    logger.info(f"Processed {len(events)} Stripe events")
+
+    if len(events) == batch_size:
+        process_stripe_events.delay(batch_size)
+    return len(events)
+
+
+@shared_task(bind=True, max_retries=settings.NOTIFICATION_MAX_RETRIES)
+def cancel_stripe_subscriptions(self, subscription_ids):
+    """
+    Celery task to cancel the Stripe subscriptions of subscribers who
+    unsubscribed locally. Subscriptions Stripe rejects (already cancelled,
+    unknown) are skipped; on a transient error the remaining ones are
+    retried with backoff.
+    """
+    stripe_service = get_stripe_service()
+    for index, subscription_id in enumerate(subscription_ids):
+        try:
+            stripe_service.cancel_subscription(subscription_id)
+        except stripe.error.InvalidRequestError as e:
+            logger.warning(f"Stripe subscription {subscription_id} not cancelled: {str(e)}")
+        except (
+            stripe.error.APIConnectionError,
+            stripe.error.RateLimitError,
+            stripe.error.APIError,
+        ) as e:
+            logger.warning(f"Cancelling Stripe subscription {subscription_id} failed, retrying: {str(e)}")
+            raise self.retry(
+                args=[subscription_ids[index:]], exc=e, countdown=retry_countdown(self)
+            )
+    logger.info(f"Cancelled {len(subscription_ids)} Stripe subscriptions")
+
+
+@shared_task
+def reconcile_stripe_subscriptions(full=False):
+    """
+    Celery task to resync ``Subscriber.is_active`` with Stripe. Incremental
+    runs only look at subscriptions created since the last run; a ``full``
+    sweep also catches status changes on older subscriptions.
+    """
+    from .reconciliation import reconcile_subscriptions
+
+    result = reconcile_subscriptions(full=full)
+    logger.info(f"Stripe reconciliation finished: {result}")
+    return result
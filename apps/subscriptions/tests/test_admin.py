@@ -0,0 +1,103 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from unittest.mock import patch
+
+from apps.common.admin import EstimatedCountPaginator
+from apps.common.models import OutboxMessage
+from apps.subscriptions.models import Plan, Subscriber
+
+CHANGELIST = "admin:subscriptions_subscriber_changelist"
+
+
+@pytest.fixture
+def subscribers(db):
+    plans = [
+        Plan.objects.create(
+            name=f"Plan {i}",
+            stripe_price_id=f"price_{i}",
+            price=10.00,
+            billing_period="month",
+        )
+        for i in range(2)
+    ]
+    return [
+        Subscriber.objects.create(
+            name=f"Subscriber {i}",
+            email=f"subscriber{i}@example.com",
+            phone_number=f"+1555123456{i}",
+            plan=plans[i % 2],
+            stripe_customer_id=f"cus_{i}",
+            stripe_subscription_id=f"sub_{i}",
+            is_active=True,
+        )
+        for i in range(4)
+    ]
+
+
+@pytest.mark.django_db
+def test_changelist_prefix_search_and_plan_filter(admin_client, subscribers):
+    plan = subscribers[1].plan
+
+    response = admin_client.get(reverse(CHANGELIST), {"q": "cus_", "plan": plan.pkid})
+
+    assert response.status_code == 200
+    assert list(response.context["cl"].result_list) == [subscribers[3], subscribers[1]]
+    assert b"autocomplete-filter" in response.content
+    assert b"common/admin/autocomplete_filter.js" in response.content
+
+
+@pytest.mark.django_db
+def test_changelist_search_does_not_match_substrings(admin_client, subscribers):
+    response = admin_client.get(reverse(CHANGELIST), {"q": "example.com"})
+
+    assert list(response.context["cl"].result_list) == []
+
+
+@pytest.mark.django_db
+def test_changelist_rejects_invalid_plan_filter(admin_client, subscribers):
+    response = admin_client.get(reverse(CHANGELIST), {"plan": "not-a-plan"})
+
+    assert response.status_code == 302
+    assert response.url.endswith("?e=1")
+
+
+@pytest.mark.django_db
+def test_deactivate_action_is_one_update(admin_client, subscribers):
+    ids = [str(subscriber.pkid) for subscriber in subscribers[:3]]
+
+    with CaptureQueriesContext(connection) as queries:
+        response = admin_client.post(
+            reverse(CHANGELIST),
+            {"action": "deactivate", "_selected_action": ids},
+        )
+
+    assert response.status_code == 302
+    updates = [
+        query["sql"]
+        for query in queries
+        if query["sql"].startswith('UPDATE "subscriptions_subscriber"')
+    ]
+    assert len(updates) == 1
+    assert Subscriber.objects.filter(is_active=True).get() == subscribers[3]
+    message = OutboxMessage.objects.get()
+    assert message.task_name == "apps.subscriptions.tasks.cancel_stripe_subscriptions"
+    assert sorted(message.args[0]) == sorted(
+        subscriber.stripe_subscription_id for subscriber in subscribers[:3]
+    )
+
+
+@pytest.mark.django_db
+def test_estimated_count_paginator(subscribers, django_assert_num_queries):
+    queryset = Subscriber.objects.order_by("pkid")
+
+    with patch.object(EstimatedCountPaginator, "estimate_count", return_value=5_000_000):
+        with django_assert_num_queries(0):
+            assert EstimatedCountPaginator(queryset, 100).count == 5_000_000
+
+    with patch.object(EstimatedCountPaginator, "max_count", 2):
+        # Filtered counts are exact up to the cap.
+        assert EstimatedCountPaginator(queryset.filter(is_active=True), 100).count == 2
+        # SQLite has no pg_class statistics.
+        assert EstimatedCountPaginator(queryset, 100).count == 2
@@ -0,0 +1,173 @@
+import threading
+
+import pytest
+from django.urls import reverse
+from stripe import StripeObject
+from unittest.mock import AsyncMock, patch
+
+from apps.common.models import OutboxMessage
+from apps.subscriptions.fakes import FakeProviders, FakeProviderServer
+from apps.subscriptions.models import Plan, Subscriber
+from apps.subscriptions.services import StripeService, build_stripe_client, set_stripe_service
+
+
+def stripe_object(**values):
+    return StripeObject.construct_from(values, "sk_test")
+
+
+@pytest.fixture
+def plan(db):
+    return Plan.objects.create(
+        name="Basic Plan",
+        stripe_price_id="price_12345",
+        price=10.00,
+        billing_period="month",
+    )
+
+
+@pytest.mark.django_db
+@patch(
+    "apps.subscriptions.services.StripeService.create_payment_intent_async",
+    new_callable=AsyncMock,
+)
+@patch(
+    "apps.subscriptions.services.StripeService.create_customer_async",
+    new_callable=AsyncMock,
+)
+def test_async_subscribe(mock_create_customer, mock_create_intent, client, plan):
+    mock_create_customer.return_value = stripe_object(id="cus_12345")
+    mock_create_intent.return_value = stripe_object(
+        id="pi_12345", client_secret="pi_12345_secret"
+    )
+
+    response = client.post(
+        reverse("subscriptions:subscription_create_async"),
+        {
+            "name": "John Doe",
+            "email": "john@example.com",
+            "phone_number": "+15551234567",
+            "plan_id": str(plan.id),
+            "payment_method_id": "pm_12345",
+        },
+        content_type="application/json",
+    )
+
+    assert response.status_code == 201
+    assert response.json() == {
+        "client_secret": "pi_12345_secret",
+        "customer_id": "cus_12345",
+        "plan_id": str(plan.id),
+    }
+    # The payment method is attached as part of creating the customer.
+    customer_kwargs = mock_create_customer.await_args.kwargs
+    assert customer_kwargs["payment_method_id"] == "pm_12345"
+    assert customer_kwargs["idempotency_key"].endswith(":customer")
+    intent_kwargs = mock_create_intent.await_args.kwargs
+    assert intent_kwargs["amount"] == 1000
+    assert intent_kwargs["idempotency_key"].endswith(":payment_intent")
+
+
+@pytest.mark.django_db
+def test_async_subscribe_requires_payment_method(client, plan):
+    response = client.post(
+        reverse("subscriptions:subscription_create_async"),
+        {
+            "name": "John Doe",
+            "email": "john@example.com",
+            "phone_number": "+15551234567",
+            "plan_id": str(plan.id),
+        },
+        content_type="application/json",
+    )
+
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+@patch("apps.subscriptions.tasks.send_welcome_sms.delay")
+@patch("apps.subscriptions.tasks.send_email_task.delay")
+@patch(
+    "apps.subscriptions.services.StripeService.create_subscription_async",
+    new_callable=AsyncMock,
+)
+@patch(
+    "apps.subscriptions.services.StripeService.retrieve_customer_async",
+    new_callable=AsyncMock,
+)
+def test_async_confirm_subscription(
+    mock_retrieve_customer, mock_create_subscription, mock_send_email, mock_send_sms, client, plan
+):
+    mock_retrieve_customer.return_value = stripe_object(
+        id="cus_12345", name="John Doe", email="john@example.com", phone="+15551234567"
+    )
+    mock_create_subscription.return_value = stripe_object(id="sub_12345")
+
+    response = client.post(
+        reverse("subscriptions:subscription_confirm_async"),
+        {"customer_id": "cus_12345", "plan_id": str(plan.id)},
+        content_type="application/json",
+    )
+
+    assert response.status_code == 201
+    assert response.json()["plan"]["name"] == "Basic Plan"
+    assert Subscriber.objects.filter(stripe_subscription_id="sub_12345").exists()
+    mock_send_sms.assert_not_called()
+    mock_send_email.assert_not_called()
+    assert OutboxMessage.objects.count() == 2
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("field", ["customer_id", "plan_id"])
+@patch(
+    "apps.subscriptions.services.StripeService.retrieve_customer_async",
+    new_callable=AsyncMock,
+)
+def test_async_confirm_subscription_requires_customer_and_plan(
+    mock_retrieve_customer, field, client, plan
+):
+    data = {"customer_id": "cus_12345", "plan_id": str(plan.id)}
+    del data[field]
+
+    response = client.post(
+        reverse("subscriptions:subscription_confirm_async"),
+        data,
+        content_type="application/json",
+    )
+
+    assert response.status_code == 400
+    mock_retrieve_customer.assert_not_awaited()
+
+
+@pytest.fixture
+def fake_stripe_server(settings):
+    server = FakeProviderServer(FakeProviders())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    settings.STRIPE_API_BASE = server.url
+    settings.STRIPE_MAX_NETWORK_RETRIES = 0
+    set_stripe_service(StripeService(client=build_stripe_client()))
+    yield server
+    set_stripe_service(None)
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.django_db
+def test_async_subscribe_through_real_transport(fake_stripe_server, client, plan):
+    # Outside ASGI each request runs on a fresh event loop; the aiohttp
+    # session must not outlive the loop it was created on.
+    for i in range(2):
+        response = client.post(
+            reverse("subscriptions:subscription_create_async"),
+            {
+                "name": f"John Doe {i}",
+                "email": f"john{i}@example.com",
+                "phone_number": "+15551234567",
+                "plan_id": str(plan.id),
+                "payment_method_id": "pm_card_visa",
+            },
+            content_type="application/json",
+        )
+
+        assert response.status_code == 201
+        assert response.json()["client_secret"]
@@ -0,0 +1,75 @@
+import json
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from apps.subscriptions.benchmarks import compare_to_baseline, ensure_dataset, percentile
+from apps.subscriptions.models import Subscriber
+
+
+@pytest.mark.django_db
+def test_benchmark_command_reports_metrics(tmp_path):
+    ensure_dataset(20)
+    output = tmp_path / "results.json"
+
+    call_command(
+        "benchmark_subscriptions",
+        "--requests=5",
+        "--concurrency=1",
+        f"--output={output}",
+    )
+
+    results = json.loads(output.read_text())
+    assert set(results) == {
+        "list_plans",
+        "list_subscriptions",
+        "subscribe",
+        "confirm_subscription",
+        "stripe_webhook",
+    }
+    for metrics in results.values():
+        assert metrics["requests"] == 5
+        assert metrics["failures"] == 0
+        assert metrics["p50_ms"] <= metrics["p99_ms"]
+    assert Subscriber.objects.filter(stripe_customer_id__startswith="cus_seed_").count() == 20
+
+
+@pytest.mark.django_db
+def test_benchmark_command_fails_on_regression(tmp_path):
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps({"list_plans": {"queries_per_request": 0}}))
+
+    with pytest.raises(CommandError):
+        call_command(
+            "benchmark_subscriptions",
+            "--scenario=list_plans",
+            "--requests=2",
+            "--concurrency=1",
+            f"--baseline={baseline}",
+        )
+
+
+def test_compare_to_baseline_tolerance():
+    baseline = {"list_plans": {"rps": 100, "p95_ms": 10}}
+
+    assert compare_to_baseline({"list_plans": {"rps": 90, "p95_ms": 11}}, baseline, 0.2) == []
+    assert compare_to_baseline({"list_plans": {"rps": 70, "p95_ms": 13}}, baseline, 0.2) == [
+        "list_plans.rps: 100 -> 70",
+        "list_plans.p95_ms: 10 -> 13",
+    ]
+
+
+def test_compare_to_baseline_fails_on_failed_requests():
+    results = {"subscribe": {"failures": 2, "rps": 100}}
+
+    assert compare_to_baseline(results, {"subscribe": {"rps": 100}}, 0.2) == [
+        "subscribe.failures: 2 failed requests",
+    ]
+    assert compare_to_baseline(results, {}, 0.2) == ["subscribe.failures: 2 failed requests"]
+
+
+def test_percentile_rejects_empty_samples():
+    assert percentile([3, 1, 2], 50) == 2
+    with pytest.raises(ValueError):
+        percentile([], 95)
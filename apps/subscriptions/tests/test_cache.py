@@ -0,0 +1,139 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from apps.subscriptions.cache import (
+    PLAN_VERSION_KEY,
+    PlanCache,
+    aget_plan,
+    bump_plan_version,
+    get_plan,
+    plan_cache,
+)
+from apps.subscriptions.models import Plan
+
+
+@pytest.fixture
+def plan(db):
+    return Plan.objects.create(
+        name="Basic Plan",
+        stripe_price_id="price_12345",
+        price=10.00,
+        billing_period="month",
+    )
+
+
+@pytest.mark.django_db
+def test_get_plan_is_served_from_process_cache(plan):
+    assert get_plan(id=plan.id) == plan
+
+    with CaptureQueriesContext(connection) as queries:
+        assert get_plan(id=str(plan.id)) == plan
+        assert get_plan(stripe_price_id="price_12345") == plan
+
+    assert len(queries) == 0
+
+
+@pytest.mark.django_db
+def test_get_plan_raises_for_unknown_plan():
+    with pytest.raises(Plan.DoesNotExist):
+        get_plan(stripe_price_id="price_missing")
+    with pytest.raises(TypeError):
+        get_plan(name="Basic Plan")
+
+
+@pytest.mark.django_db
+def test_stripe_price_id_identifies_one_plan(plan):
+    with pytest.raises(IntegrityError), transaction.atomic():
+        Plan.objects.create(name="Copy", stripe_price_id="price_12345", price=10.00)
+
+    assert get_plan(stripe_price_id="price_12345") == plan
+
+
+@pytest.mark.django_db(transaction=True)
+def test_saving_a_plan_invalidates_every_process(plan):
+    get_plan(id=plan.id)
+    version = cache.get(PLAN_VERSION_KEY)
+
+    plan.name = "Premium Plan"
+    plan.save()
+
+    assert cache.get(PLAN_VERSION_KEY) == version + 1
+    assert get_plan(id=plan.id).name == "Premium Plan"
+
+
+@pytest.mark.django_db
+def test_other_process_bump_is_seen_after_check_interval(plan, monkeypatch):
+    monkeypatch.setattr(plan_cache, "check_interval", 0)
+    get_plan(id=plan.id)
+    # Another process changed the plan and bumped the shared version.
+    Plan.objects.filter(pkid=plan.pkid).update(name="Premium Plan")
+    cache.set(PLAN_VERSION_KEY, 7, None)
+
+    assert get_plan(id=plan.id).name == "Premium Plan"
+
+
+@pytest.mark.django_db(transaction=True)
+def test_aget_plan(plan):
+    assert asyncio.run(aget_plan(id=plan.id)) == plan
+    assert plan_cache.get("stripe_price_id", "price_12345") == plan
+
+
+@pytest.mark.django_db(transaction=True)
+def test_plan_lookups_fall_back_to_database_during_cache_outage(plan):
+    outage = ConnectionError("cache down")
+
+    with patch.object(cache, "get", side_effect=outage), patch.object(
+        cache, "aget", side_effect=outage
+    ):
+        assert get_plan(stripe_price_id="price_12345") == plan
+        assert asyncio.run(aget_plan(id=plan.id)) == plan
+        with pytest.raises(Plan.DoesNotExist):
+            get_plan(stripe_price_id="price_missing")
+
+    assert plan_cache.get("id", plan.id) is None
+
+
+@pytest.mark.django_db(transaction=True)
+def test_saving_a_plan_survives_cache_outage(plan):
+    get_plan(id=plan.id)
+    outage = ConnectionError("cache down")
+
+    with patch.object(cache, "delete", side_effect=outage), patch.object(
+        cache, "add", side_effect=outage
+    ):
+        plan.name = "Premium Plan"
+        plan.save()
+
+    assert plan_cache.get("id", plan.id) is None
+
+
+@pytest.mark.django_db
+def test_bump_plan_version_tolerates_evicted_key(plan):
+    cache.set(PLAN_VERSION_KEY, 3, None)
+
+    with patch.object(cache, "incr", side_effect=ValueError("Key not found")):
+        bump_plan_version()
+
+    assert cache.get(PLAN_VERSION_KEY) not in (None, 3)
+
+
+def test_plan_cache_evicts_least_recently_used_and_expired(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr("apps.subscriptions.cache.time.monotonic", lambda: clock[0])
+    lru = PlanCache(maxsize=2, ttl=10, check_interval=1)
+    plans = [Plan(name=f"Plan {i}", stripe_price_id=f"price_{i}") for i in range(3)]
+
+    lru.put(plans[0])
+    lru.put(plans[1])
+    assert lru.get("stripe_price_id", "price_0") == plans[0]
+    lru.put(plans[2])
+
+    assert lru.get("id", plans[0].id) == plans[0]
+    assert lru.get("stripe_price_id", "price_1") is None
+    clock[0] += 10
+    assert lru.get("stripe_price_id", "price_0") is None
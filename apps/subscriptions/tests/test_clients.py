@@ -0,0 +1,83 @@
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.request import urlopen
+
+import pytest
+import requests
+
+from apps.common.task_metrics import start_worker_metrics_exporter
+from apps.subscriptions.clients import KeepAliveHTTPAdapter, TwilioClientRegistry
+from apps.subscriptions.metrics import HTTP_CLIENT_REQUESTS
+
+
+class OkHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def http_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), OkHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+    server.server_close()
+
+
+def test_keep_alive_adapter_reports_connection_reuse(http_server):
+    def count(connection):
+        return HTTP_CLIENT_REQUESTS.labels(service="test", connection=connection)._value.get()
+
+    new, reused = count("new"), count("reused")
+    session = requests.Session()
+    session.mount("http://", KeepAliveHTTPAdapter("test", pool_size=2))
+
+    for _ in range(3):
+        assert session.get(http_server).text == "ok"
+
+    assert count("new") - new == 1
+    assert count("reused") - reused == 2
+
+
+def test_keep_alive_adapter_counters_are_served_by_worker_exporter(http_server, settings):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        settings.WORKER_METRICS_PORT = sock.getsockname()[1]
+    session = requests.Session()
+    session.mount("http://", KeepAliveHTTPAdapter("worker-test"))
+    session.get(http_server)
+
+    server = start_worker_metrics_exporter()
+    try:
+        with urlopen(f"http://127.0.0.1:{settings.WORKER_METRICS_PORT}/") as response:
+            body = response.read()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert b'churchpad_http_client_requests_total{connection="new",service="worker-test"} 1.0' in body
+    assert b'churchpad_http_client_request_duration_seconds_count{service="worker-test"} 1.0' in body
+
+
+def test_twilio_client_registry_shares_one_client(settings):
+    settings.TWILIO_POOL_SIZE = 4
+    registry = TwilioClientRegistry()
+
+    client = registry.get()
+
+    assert registry.get() is client
+    adapter = client.http_client.session.get_adapter("https://api.twilio.com")
+    assert isinstance(adapter, KeepAliveHTTPAdapter)
+    assert adapter._pool_maxsize == 4
+    registry.close()
+    assert registry.get() is not client
@@ -0,0 +1,184 @@
+import asyncio
+import json
+import threading
+from unittest.mock import patch
+
+import pytest
+import stripe
+from django.core.cache import cache
+from django.urls import reverse
+
+from apps.subscriptions.clients import get_twilio_client, twilio_clients
+from apps.subscriptions.fakes import (
+    FakeProviders,
+    FakeProviderServer,
+    install_fakes,
+    sign_webhook_payload,
+)
+from apps.subscriptions.metrics import STRIPE_CUSTOMER_CACHE
+from apps.subscriptions.models import Plan
+from apps.subscriptions.services import (
+    StripeService,
+    build_stripe_client,
+    get_stripe_service,
+    set_stripe_service,
+)
+
+
+@pytest.fixture
+def providers():
+    providers = install_fakes(FakeProviders(seed=1))
+    yield providers
+    set_stripe_service(None)
+    twilio_clients.close()
+
+
+def test_in_process_stripe_signup_flow(providers):
+    service = get_stripe_service()
+
+    customer = service.create_customer("john@example.com", "John Doe", "+15551234567")
+    service.attach_payment_method("pm_card_visa", customer.id)
+    intent = service.create_payment_intent(1000, "usd", customer.id, {"plan_id": "1"})
+    subscription = service.create_subscription(customer.id, "price_12345")
+
+    retrieved = service.retrieve_customer(customer.id)
+    assert retrieved.email == "john@example.com"
+    assert retrieved.invoice_settings.default_payment_method == "pm_card_visa"
+    assert intent.amount == 1000
+    assert intent.client_secret
+    assert subscription.customer == customer.id
+    assert providers.events[0]["type"] == "customer.subscription.created"
+
+
+@pytest.mark.django_db
+def test_retried_signup_reuses_stripe_objects(providers, client):
+    plan = Plan.objects.create(
+        name="Basic Plan", stripe_price_id="price_12345", price=10.00, billing_period="month"
+    )
+    data = {
+        "name": "John Doe",
+        "email": "john@example.com",
+        "phone_number": "+15551234567",
+        "plan_id": str(plan.id),
+        "payment_method_id": "pm_card_visa",
+    }
+
+    responses = [
+        client.post(
+            reverse("subscriptions:subscription_create"), data, content_type="application/json"
+        )
+        for _ in range(2)
+    ]
+
+    assert [response.status_code for response in responses] == [201, 201]
+    assert responses[0].data == responses[1].data
+    # The retry is answered from the idempotency keys of the first attempt.
+    assert [call[2] for call in providers.calls] == ["/v1/customers", "/v1/payment_intents"]
+    customers = [obj for obj in providers.objects.values() if obj["object"] == "customer"]
+    assert len(customers) == 1
+    assert customers[0]["invoice_settings"]["default_payment_method"] == "pm_card_visa"
+
+
+@pytest.mark.django_db
+def test_confirm_reads_customer_cached_at_signup(providers, client):
+    plan = Plan.objects.create(
+        name="Basic Plan", stripe_price_id="price_12345", price=10.00, billing_period="month"
+    )
+    hits = STRIPE_CUSTOMER_CACHE.labels(result="hit")._value.get()
+    customer = get_stripe_service().create_customer(
+        "john@example.com", "John Doe", "+15551234567"
+    )
+
+    response = client.post(
+        reverse("subscriptions:subscription_confirm"),
+        {"customer_id": customer.id, "plan_id": str(plan.id)},
+        content_type="application/json",
+    )
+
+    assert response.status_code == 201
+    assert response.data["email"] == "john@example.com"
+    assert ("stripe", "GET", f"/v1/customers/{customer.id}") not in providers.calls
+    assert STRIPE_CUSTOMER_CACHE.labels(result="hit")._value.get() == hits + 1
+
+
+def test_customer_snapshot_falls_back_to_stripe(providers):
+    service = get_stripe_service()
+    customer = service.create_customer("john@example.com", "John Doe", "+15551234567")
+    cache.clear()
+
+    snapshot = service.get_customer_snapshot(customer.id)
+
+    assert snapshot["name"] == "John Doe"
+    assert ("stripe", "GET", f"/v1/customers/{customer.id}") in providers.calls
+
+
+def test_customer_snapshot_survives_cache_outage(providers):
+    service = get_stripe_service()
+    outage = ConnectionError("cache down")
+
+    with patch.object(cache, "set", side_effect=outage), patch.object(
+        cache, "get", side_effect=outage
+    ):
+        customer = service.create_customer("john@example.com", "John Doe", "+15551234567")
+        snapshot = service.get_customer_snapshot(customer.id)
+
+    assert snapshot["name"] == "John Doe"
+    assert ("stripe", "GET", f"/v1/customers/{customer.id}") in providers.calls
+
+
+def test_async_customer_snapshot_survives_cache_outage(providers):
+    service = get_stripe_service()
+    outage = ConnectionError("cache down")
+
+    async def signup():
+        customer = await service.create_customer_async(
+            "john@example.com", "John Doe", "+15551234567"
+        )
+        return await service.get_customer_snapshot_async(customer.id)
+
+    with patch.object(cache, "aset", side_effect=outage), patch.object(
+        cache, "aget", side_effect=outage
+    ):
+        snapshot = asyncio.run(signup())
+
+    assert snapshot["name"] == "John Doe"
+
+
+def test_in_process_twilio_messages(providers):
+    get_twilio_client().messages.create(body="Hi", from_="+15550000000", to="+15551234567")
+
+    assert providers.messages[0]["to"] == "+15551234567"
+    assert providers.messages[0]["body"] == "Hi"
+
+
+def test_error_rate_injection(providers):
+    providers.error_rate = 1.0
+
+    with pytest.raises(stripe.error.APIError):
+        get_stripe_service().create_customer("john@example.com", "John Doe", "+1555")
+
+
+def test_http_server_serves_stripe_api(settings):
+    server = FakeProviderServer(FakeProviders())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        settings.STRIPE_API_BASE = server.url
+        settings.STRIPE_MAX_NETWORK_RETRIES = 0
+        service = StripeService(client=build_stripe_client())
+
+        customer = service.create_customer("john@example.com", "John Doe", "+1555")
+
+        assert service.retrieve_customer(customer.id).name == "John Doe"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_signed_webhook_verifies_with_stripe(settings):
+    settings.STRIPE_WEBHOOK_SECRET = "whsec_test"
+    payload = json.dumps({"id": "evt_1"})
+
+    header = sign_webhook_payload(payload)
+
+    assert stripe.WebhookSignature.verify_header(payload, header, "whsec_test")
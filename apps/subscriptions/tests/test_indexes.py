@@ -0,0 +1,61 @@
+import pytest
+from django.db import connection
+from django.test import RequestFactory
+from rest_framework.request import Request
+
+from apps.subscriptions.models import Subscriber
+from apps.subscriptions.pagination import KeysetPagination
+from apps.subscriptions.seeding import seed_plans, seed_subscribers
+
+
+@pytest.fixture
+def dataset(db):
+    seed_subscribers(2000, seed_plans(3), batch_size=1000, active_ratio=0.5, seed=1)
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+        if connection.vendor == "postgresql":
+            # Only an index that cannot serve the query loses to a sequential
+            # scan then, however small the table is. Reset on rollback.
+            cursor.execute("SET LOCAL enable_seqscan = off")
+
+
+def seek(query_string=""):
+    request = Request(RequestFactory().get(f"/subscriptions/{query_string}"))
+    subscribers = Subscriber.objects.filter(is_active=True).select_related("plan")
+    return KeysetPagination().seek(subscribers, request)
+
+
+@pytest.mark.django_db
+def test_subscription_list_reads_partial_index_in_order(dataset):
+    first_page = seek()[:21]
+    last = list(first_page)[-1]
+    cursor = KeysetPagination.encode_cursor(last.created_at, last.pkid)
+    next_page = seek(f"?cursor={cursor}")[:21]
+
+    for queryset in (first_page, next_page):
+        plan = queryset.explain()
+        assert "subscriber_active_recent_idx" in plan
+        if connection.vendor == "sqlite":
+            assert "TEMP B-TREE" not in plan
+        else:
+            assert "Sort" not in plan
+
+    # Later pages seek into the index rather than scanning from its start.
+    if connection.vendor == "sqlite":
+        assert "SEARCH subscriptions_subscriber" in next_page.explain()
+
+
+@pytest.mark.django_db
+def test_webhook_customer_lookup_uses_an_index(dataset):
+    customer_ids = list(
+        Subscriber.objects.values_list("stripe_customer_id", flat=True)[:50]
+    )
+
+    plan = Subscriber.objects.filter(stripe_customer_id__in=customer_ids).explain()
+
+    if connection.vendor == "sqlite":
+        # SQLite names the unique constraint's index sqlite_autoindex_<table>_<n>
+        assert "USING INDEX sqlite_autoindex_subscriptions_subscriber_" in plan
+        assert "(stripe_customer_id=?)" in plan
+    else:
+        assert "subscriptions_subscriber_stripe_customer_id_key" in plan
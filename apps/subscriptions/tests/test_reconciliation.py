@@ -0,0 +1,116 @@
+import pytest
+from django.urls import reverse
+
+from apps.subscriptions.clients import twilio_clients
+from apps.common.models import OutboxMessage
+from apps.subscriptions.fakes import FakeProviders, install_fakes
+from apps.subscriptions.models import Plan, Subscriber, SyncCursor
+from apps.subscriptions.reconciliation import CURSOR_NAME, reconcile_subscriptions
+from apps.subscriptions.services import get_stripe_service, set_stripe_service
+from apps.subscriptions.tasks import cancel_stripe_subscriptions
+
+
+@pytest.fixture
+def providers():
+    providers = install_fakes(FakeProviders(seed=1))
+    yield providers
+    set_stripe_service(None)
+    twilio_clients.close()
+
+
+@pytest.fixture
+def plan(db):
+    return Plan.objects.create(
+        name="Basic Plan",
+        stripe_price_id="price_12345",
+        price=10.00,
+        billing_period="month",
+    )
+
+
+def make_subscribers(plan, count):
+    service = get_stripe_service()
+    subscribers = []
+    for i in range(count):
+        customer = service.create_customer(f"user{i}@example.com", f"User {i}", "+1555")
+        subscription = service.create_subscription(customer.id, plan.stripe_price_id)
+        subscribers.append(
+            Subscriber.objects.create(
+                name=f"User {i}",
+                email=f"user{i}@example.com",
+                phone_number=f"+1555123456{i}",
+                plan=plan,
+                stripe_customer_id=customer.id,
+                stripe_subscription_id=subscription.id,
+                is_active=True,
+            )
+        )
+    return subscribers
+
+
+@pytest.mark.django_db
+def test_full_reconciliation_fixes_drift_in_chunks(providers, plan):
+    subscribers = make_subscribers(plan, 7)
+    # Missed customer.subscription.deleted webhooks
+    for subscriber in subscribers[:3]:
+        get_stripe_service().client.subscriptions.cancel(subscriber.stripe_subscription_id)
+    # Missed customer.subscription.created webhook
+    Subscriber.objects.filter(pkid=subscribers[6].pkid).update(is_active=False)
+
+    result = reconcile_subscriptions(full=True, page_size=2, chunk_size=3)
+
+    assert result == {"seen": 7, "activated": 1, "deactivated": 3}
+    assert set(Subscriber.objects.filter(is_active=False)) == set(subscribers[:3])
+    cursor = SyncCursor.objects.get(name=CURSOR_NAME)
+    assert cursor.high_water_mark == max(
+        obj["created"] for obj in providers.objects.values() if obj["object"] == "subscription"
+    )
+
+
+@pytest.mark.django_db
+def test_incremental_reconciliation_starts_at_high_water_mark(providers, plan):
+    old, new = make_subscribers(plan, 2)
+    providers.objects[old.stripe_subscription_id]["created"] -= 3600
+    mark = providers.objects[new.stripe_subscription_id]["created"]
+    SyncCursor.objects.create(name=CURSOR_NAME, high_water_mark=mark)
+    for subscriber in (old, new):
+        providers.objects[subscriber.stripe_subscription_id]["status"] = "canceled"
+
+    result = reconcile_subscriptions()
+
+    assert result == {"seen": 1, "activated": 0, "deactivated": 1}
+    old.refresh_from_db()
+    new.refresh_from_db()
+    assert old.is_active is True
+    assert new.is_active is False
+
+
+@pytest.mark.django_db
+def test_full_reconciliation_keeps_unsubscribed_inactive(providers, plan, client):
+    subscriber, other = make_subscribers(plan, 2)
+
+    response = client.delete(reverse("subscriptions:subscription_delete", args=[subscriber.id]))
+    assert response.status_code == 204
+    # The Stripe cancellation is still sitting in the outbox.
+    assert providers.objects[subscriber.stripe_subscription_id]["status"] == "active"
+
+    result = reconcile_subscriptions(full=True)
+
+    assert result["activated"] == 0
+    subscriber.refresh_from_db()
+    assert subscriber.is_active is False
+    assert subscriber.cancelled_at is not None
+
+    message = OutboxMessage.objects.get(task_name=cancel_stripe_subscriptions.name)
+    cancel_stripe_subscriptions(*message.args)
+    assert providers.objects[subscriber.stripe_subscription_id]["status"] == "canceled"
+    assert providers.objects[other.stripe_subscription_id]["status"] == "active"
+
+
+@pytest.mark.django_db
+def test_cancel_stripe_subscriptions_skips_unknown_subscriptions(providers, plan):
+    (subscriber,) = make_subscribers(plan, 1)
+
+    cancel_stripe_subscriptions(["sub_unknown", subscriber.stripe_subscription_id])
+
+    assert providers.objects[subscriber.stripe_subscription_id]["status"] == "canceled"
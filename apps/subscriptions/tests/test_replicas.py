@@ -0,0 +1,88 @@
+import pytest
+from django.db import connections
+from django.urls import reverse
+
+from apps.common.db_router import PIN_COOKIE
+from apps.subscriptions.models import Plan, Subscriber
+
+
+@pytest.fixture
+def replica(settings):
+    """
+    A second, empty in-memory SQLite database standing in for a replica.
+
+    The alias is dropped from the settings once its connection exists, so
+    the test case treats it as a dynamically created connection and allows
+    queries on it.
+    """
+    connections.settings["replica1"] = {
+        **connections["default"].settings_dict,
+        "NAME": ":memory:",
+    }
+    connection = connections["replica1"]
+    del connections.settings["replica1"]
+    with connection.schema_editor() as editor:
+        editor.create_model(Plan)
+        editor.create_model(Subscriber)
+    settings.DATABASE_REPLICAS = ["replica1"]
+    yield "replica1"
+    connection.close()
+    del connections["replica1"]
+
+
+def create_subscriber(using, name):
+    plan = Plan.objects.using(using).create(
+        name="Basic Plan",
+        stripe_price_id=f"price_{name}",
+        price=10.00,
+        billing_period="month",
+    )
+    subscriber = Subscriber(
+        name=name,
+        email=f"{name}@example.com",
+        phone_number="+15551234567",
+        plan=plan,
+        stripe_customer_id=f"cus_{name}",
+        stripe_subscription_id=f"sub_{name}",
+        is_active=True,
+    )
+    subscriber.save(using=using)
+    return subscriber
+
+
+@pytest.mark.django_db
+def test_list_subscriptions_reads_replica_until_client_writes(client, replica):
+    create_subscriber(replica, "lagging")
+    first = create_subscriber("default", "first")
+    create_subscriber("default", "second")
+    url = reverse("subscriptions:subscription_list")
+
+    response = client.get(url)
+    assert [row["email"] for row in response.data["results"]] == ["lagging@example.com"]
+
+    response = client.delete(reverse("subscriptions:subscription_delete", args=[first.id]))
+    assert response.status_code == 204
+    assert response.cookies[PIN_COOKIE]["max-age"] > 0
+
+    # The client now reads from the primary and sees its own write.
+    response = client.get(url)
+    assert [row["email"] for row in response.data["results"]] == ["second@example.com"]
+
+
+@pytest.mark.django_db
+def test_reads_do_not_pin_to_primary(client, replica):
+    response = client.get(reverse("subscriptions:subscription_list"))
+
+    assert PIN_COOKIE not in response.cookies
+
+
+@pytest.mark.django_db
+def test_subscriber_admin_changelist_reads_replica(admin_client, replica):
+    create_subscriber(replica, "lagging")
+    create_subscriber("default", "primary")
+
+    response = admin_client.get(reverse("admin:subscriptions_subscriber_changelist"))
+
+    assert response.status_code == 200
+    assert b"lagging@example.com" in response.content
+    assert b"primary@example.com" not in response.content
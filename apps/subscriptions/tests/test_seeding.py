@@ -0,0 +1,38 @@
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from apps.subscriptions.models import Plan, Subscriber
+
+
+@pytest.mark.django_db
+def test_seed_subscriptions_command():
+    call_command(
+        "seed_subscriptions",
+        "--plans=3",
+        "--subscribers=300",
+        "--batch-size=100",
+        "--active-ratio=0.8",
+        "--seed=1",
+    )
+
+    assert Plan.objects.count() == 3
+    assert Subscriber.objects.count() == 300
+    assert Subscriber.objects.filter(is_active=True).count() == 240
+    assert Subscriber.objects.values("plan").distinct().count() == 3
+
+
+@pytest.mark.django_db
+def test_seed_subscriptions_keeps_identifiers_unique_across_runs():
+    call_command("seed_subscriptions", "--plans=1", "--subscribers=50", "--seed=1")
+    call_command("seed_subscriptions", "--subscribers=50", "--seed=1")
+
+    assert Subscriber.objects.count() == 100
+    for field in ("email", "stripe_customer_id", "stripe_subscription_id"):
+        assert Subscriber.objects.values(field).distinct().count() == 100
+
+
+@pytest.mark.django_db
+def test_seed_subscriptions_requires_plans():
+    with pytest.raises(CommandError):
+        call_command("seed_subscriptions", "--subscribers=10")
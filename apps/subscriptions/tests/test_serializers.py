@@ -0,0 +1,46 @@
+import pytest
+from rest_framework.renderers import JSONRenderer
+
+from apps.subscriptions.benchmarks import benchmark_serializers
+from apps.subscriptions.models import Subscriber
+from apps.subscriptions.seeding import seed_plans, seed_subscribers
+from apps.subscriptions.serializers import ReadSubscriberSerializer, ValuesListSerializer
+
+
+@pytest.fixture
+def dataset(db):
+    seed_subscribers(50, seed_plans(3), active_ratio=0.5, seed=1)
+
+
+@pytest.mark.django_db
+def test_values_list_serializer_matches_read_serializer_byte_for_byte(dataset):
+    subscribers = Subscriber.objects.order_by("-created_at", "-pkid")
+    fast = ValuesListSerializer(ReadSubscriberSerializer, extra_columns=["pkid"])
+
+    expected = ReadSubscriberSerializer(subscribers.select_related("plan"), many=True).data
+    rows = fast.serialize(fast.values(subscribers))
+
+    assert JSONRenderer().render(rows) == JSONRenderer().render(expected)
+    assert fast.columns == [
+        "pkid",
+        "id",
+        "name",
+        "email",
+        "phone_number",
+        "plan__id",
+        "plan__name",
+        "plan__price",
+        "plan__billing_period",
+        "is_active",
+        "created_at",
+    ]
+
+
+@pytest.mark.django_db
+def test_benchmark_serializers_reports_per_row_cost(dataset):
+    result = benchmark_serializers(rows=20, repeat=1)
+
+    assert result["rows"] == 20
+    assert result["serializer_us_per_row"] > 0
+    assert result["fast_path_us_per_row"] > 0
+    assert result["speedup"] > 0
@@ -0,0 +1,98 @@
+import json
+from urllib.parse import parse_qs, urlparse
+
+import stripe
+
+from apps.subscriptions.clients import KeepAliveHTTPAdapter
+from apps.subscriptions.services import (
+    StripeService,
+    build_stripe_client,
+    signup_idempotency_key,
+)
+
+
+class RecordingHTTPClient(stripe.HTTPClient):
+    name = "recording"
+
+    def __init__(self, responses):
+        super().__init__()
+        self.responses = responses
+        self.requests = []
+        self.headers = []
+
+    def request(self, method, url, headers, post_data=None):
+        self.headers.append(headers)
+        self.requests.append((method, urlparse(url).path, parse_qs(post_data or "")))
+        return json.dumps(self.responses.pop(0)), 200, {}
+
+    def close(self):
+        pass
+
+
+def test_stripe_service_uses_injected_client():
+    http_client = RecordingHTTPClient(
+        [{"id": "cus_123", "object": "customer", "email": "john@example.com"}]
+    )
+    service = StripeService(
+        client=stripe.StripeClient("sk_test_123", http_client=http_client)
+    )
+
+    customer = service.create_customer("john@example.com", "John Doe", "+15551234567")
+
+    assert customer.id == "cus_123"
+    method, path, params = http_client.requests[0]
+    assert (method, path) == ("post", "/v1/customers")
+    assert params == {
+        "email": ["john@example.com"],
+        "name": ["John Doe"],
+        "phone": ["+15551234567"],
+    }
+
+
+def test_create_customer_attaches_payment_method_idempotently():
+    http_client = RecordingHTTPClient([{"id": "cus_123", "object": "customer"}])
+    service = StripeService(
+        client=stripe.StripeClient("sk_test_123", http_client=http_client)
+    )
+
+    service.create_customer(
+        "john@example.com",
+        "John Doe",
+        "+15551234567",
+        payment_method_id="pm_card_visa",
+        idempotency_key="signup-abc:customer",
+    )
+
+    _, _, params = http_client.requests[0]
+    assert params["payment_method"] == ["pm_card_visa"]
+    assert params["invoice_settings[default_payment_method]"] == ["pm_card_visa"]
+    assert http_client.headers[0]["Idempotency-Key"] == "signup-abc:customer"
+
+
+def test_signup_idempotency_key():
+    details = ("john@example.com", "John Doe", "+15551234567", "plan-1", "pm_card_visa")
+
+    assert signup_idempotency_key(*details) == signup_idempotency_key(*details)
+    assert signup_idempotency_key(*details) != signup_idempotency_key(
+        *details[:-1], "pm_other"
+    )
+    assert signup_idempotency_key(*details, client_key="k1") == signup_idempotency_key(
+        *details[:-1], "pm_other", client_key="k1"
+    )
+
+
+def test_build_stripe_client_uses_tuned_session(settings):
+    settings.STRIPE_POOL_SIZE = 7
+    settings.STRIPE_CONNECT_TIMEOUT = 1.5
+    settings.STRIPE_READ_TIMEOUT = 9.0
+    settings.STRIPE_MAX_NETWORK_RETRIES = 3
+
+    client = build_stripe_client()
+
+    requestor = client._requestor
+    http_client = requestor._client
+    assert requestor._options.max_network_retries == 3
+    assert http_client._timeout == (1.5, 9.0)
+    adapter = http_client._session.get_adapter("https://api.stripe.com")
+    assert isinstance(adapter, KeepAliveHTTPAdapter)
+    assert adapter._pool_maxsize == 7
@@ -0,0 +1,64 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from apps.subscriptions.models import Plan, Subscriber
+from apps.subscriptions.subscribers import (
+    activate_subscribers,
+    deactivate_subscribers,
+    set_subscribers_active,
+)
+
+
+@pytest.fixture
+def subscribers(db):
+    plan = Plan.objects.create(
+        name="Basic Plan",
+        stripe_price_id="price_12345",
+        price=10.00,
+        billing_period="month",
+    )
+    return [
+        Subscriber.objects.create(
+            name=f"Subscriber {i}",
+            email=f"subscriber{i}@example.com",
+            phone_number=f"+1555123456{i}",
+            plan=plan,
+            stripe_customer_id=f"cus_{i}",
+            stripe_subscription_id=f"sub_{i}",
+            is_active=i % 2 == 0,
+        )
+        for i in range(6)
+    ]
+
+
+@pytest.mark.django_db
+def test_deactivate_subscribers_is_one_narrow_update(subscribers):
+    customer_ids = [subscriber.stripe_customer_id for subscriber in subscribers]
+
+    with CaptureQueriesContext(connection) as queries:
+        assert deactivate_subscribers(customer_ids=customer_ids) == 3
+
+    assert len(queries) == 1
+    sql = queries[0]["sql"]
+    assert sql.startswith("UPDATE")
+    assert "email" not in sql.split("WHERE")[0]
+    assert not Subscriber.objects.filter(is_active=True).exists()
+
+
+@pytest.mark.django_db
+def test_set_subscribers_active_batches_identifiers(subscribers, django_assert_num_queries):
+    ids = [subscriber.id for subscriber in subscribers]
+
+    with django_assert_num_queries(3):
+        assert activate_subscribers(batch_size=2, ids=ids) == 3
+
+    assert Subscriber.objects.filter(is_active=True).count() == 6
+
+
+@pytest.mark.django_db
+def test_set_subscribers_active_requires_one_identifier_kind(subscribers):
+    with pytest.raises(TypeError):
+        set_subscribers_active(False, ids=[subscribers[0].id], pkids=[subscribers[0].pkid])
+    with pytest.raises(TypeError):
+        set_subscribers_active(False, emails=["subscriber0@example.com"])
@@ -0,0 +1,263 @@
+import smtplib
+
+import pytest
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend as LocmemEmailBackend
+from prometheus_client import REGISTRY
+from twilio.base.exceptions import TwilioRestException
+from unittest.mock import MagicMock, patch
+
+from apps.subscriptions.models import Plan, Subscriber
+from apps.subscriptions.tasks import (
+    announce_to_subscribers,
+    process_stripe_events,
+    send_bulk_email_task,
+    send_bulk_sms,
+    send_email_task,
+    send_welcome_sms,
+)
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+@pytest.fixture
+def unpaced(settings):
+    settings.EMAIL_TASK_RATE_LIMIT = None
+    settings.SMS_TASK_RATE_LIMIT = None
+
+
+@pytest.fixture
+def subscribers(db):
+    plan = Plan.objects.create(
+        name="Basic Plan",
+        stripe_price_id="price_12345",
+        price=10.00,
+        billing_period="month",
+    )
+    return [
+        Subscriber.objects.create(
+            name=f"Subscriber {i}",
+            email=f"subscriber{i}@example.com",
+            phone_number=f"+1555123456{i}",
+            plan=plan,
+            stripe_customer_id=f"cus_{i}",
+            stripe_subscription_id=f"sub_{i}",
+            is_active=True,
+        )
+        for i in range(5)
+    ]
+
+
+@pytest.mark.django_db
+def test_send_bulk_email_task_uses_one_connection(settings, subscribers, django_assert_num_queries, unpaced):
+    settings.CELERY_EMAIL_BACKEND = "django.core.mail.backends.locmem.EmailBackend"
+    ids = [str(subscriber.id) for subscriber in subscribers]
+
+    with patch("apps.subscriptions.tasks.get_connection", wraps=mail.get_connection) as get_connection:
+        with django_assert_num_queries(1):
+            assert send_bulk_email_task("News", "Hi {name}", ids) == 5
+
+    get_connection.assert_called_once()
+    assert sorted(message.body for message in mail.outbox) == [
+        f"Hi Subscriber {i}" for i in range(5)
+    ]
+
+
+@pytest.mark.django_db
+def test_send_bulk_sms_reuses_client(subscribers, django_assert_num_queries, unpaced):
+    client = MagicMock()
+    ids = [str(subscriber.id) for subscriber in subscribers]
+
+    with patch("apps.subscriptions.tasks.get_twilio_client", return_value=client):
+        with django_assert_num_queries(1):
+            assert send_bulk_sms(ids, "Hello {name}") == 5
+
+    assert client.messages.create.call_count == 5
+
+
+@pytest.mark.django_db
+def test_send_bulk_email_task_retries_batch_on_smtp_error(settings, subscribers, unpaced):
+    settings.CELERY_EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+    ids = [str(subscriber.id) for subscriber in subscribers]
+
+    with patch(
+        "django.core.mail.backends.smtp.EmailBackend.open",
+        side_effect=smtplib.SMTPServerDisconnected("gone"),
+    ) as mock_open:
+        result = send_bulk_email_task.apply(args=("News", "Hi {name}", ids))
+
+    assert result.failed()
+    assert mock_open.call_count == send_bulk_email_task.max_retries + 1
+
+
+@pytest.mark.django_db
+def test_send_bulk_email_task_retries_only_undelivered_recipients(settings, subscribers, unpaced):
+    settings.CELERY_EMAIL_BACKEND = "django.core.mail.backends.locmem.EmailBackend"
+    failing = {subscribers[1].email, subscribers[3].email}
+    send_messages = LocmemEmailBackend.send_messages
+
+    def drop_connection_once(backend, messages):
+        recipient = messages[0].to[0]
+        if recipient in failing:
+            failing.discard(recipient)
+            raise smtplib.SMTPServerDisconnected("gone")
+        return send_messages(backend, messages)
+
+    ids = [str(subscriber.id) for subscriber in subscribers]
+    with patch.object(
+        LocmemEmailBackend, "send_messages", autospec=True, side_effect=drop_connection_once
+    ):
+        result = send_bulk_email_task.apply(args=("News", "Hi {name}", ids))
+
+    assert result.successful()
+    assert result.result == 2
+    assert sorted(message.to[0] for message in mail.outbox) == sorted(
+        subscriber.email for subscriber in subscribers
+    )
+
+
+@pytest.mark.django_db
+def test_send_bulk_sms_is_paced_to_the_sms_rate_limit(settings, subscribers):
+    settings.SMS_TASK_RATE_LIMIT = "2/s"
+    clock = [100.0]
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        clock[0] += seconds
+
+    ids = [str(subscriber.id) for subscriber in subscribers]
+    with patch("apps.subscriptions.tasks.get_twilio_client", return_value=MagicMock()), patch(
+        "apps.subscriptions.tasks.time.monotonic", side_effect=lambda: clock[0]
+    ), patch("apps.subscriptions.tasks.time.sleep", side_effect=sleep):
+        assert send_bulk_sms(ids, "Hello {name}") == 5
+
+    assert sleeps == [0.5] * 4
+
+
+@pytest.mark.django_db
+def test_send_bulk_sms_retries_only_transient_failures(subscribers, unpaced):
+    attempts = {}
+
+    def create(body, from_, to):
+        attempts[to] = attempts.get(to, 0) + 1
+        if to == subscribers[0].phone_number:
+            raise TwilioRestException(400, "uri", "Invalid number")
+        if to == subscribers[1].phone_number and attempts[to] == 1:
+            raise TwilioRestException(503, "uri", "Service unavailable")
+
+    client = MagicMock()
+    client.messages.create.side_effect = create
+    ids = [str(subscriber.id) for subscriber in subscribers]
+
+    with patch("apps.subscriptions.tasks.get_twilio_client", return_value=client):
+        result = send_bulk_sms.apply(args=(ids, "Hello {name}"))
+
+    assert result.successful()
+    assert result.result == 1
+    assert attempts[subscribers[0].phone_number] == 1
+    assert attempts[subscribers[1].phone_number] == 2
+    assert client.messages.create.call_count == 6
+
+
+@pytest.mark.django_db
+@patch("apps.subscriptions.tasks.send_bulk_sms.delay")
+@patch("apps.subscriptions.tasks.send_bulk_email_task.delay")
+def test_announce_to_subscribers_batches_recipients(mock_email, mock_sms, settings, subscribers):
+    settings.NOTIFICATION_BATCH_SIZE = 2
+    Subscriber.objects.filter(pkid=subscribers[0].pkid).update(is_active=False)
+
+    assert announce_to_subscribers("News", "Hi {name}", sms_body="Hello") == 2
+
+    recipients = [call.args[2] for call in mock_email.call_args_list]
+    assert [len(batch) for batch in recipients] == [2, 2]
+    assert str(subscribers[0].id) not in sum(recipients, [])
+    assert mock_sms.call_count == 2
+
+
+@pytest.mark.django_db
+def test_send_email_task_delivers_through_celery_email_backend(settings):
+    settings.EMAIL_BACKEND = "djcelery_email.backends.CeleryEmailBackend"
+    settings.CELERY_EMAIL_BACKEND = "django.core.mail.backends.locmem.EmailBackend"
+
+    result = send_email_task.apply(args=("Hi", "Body", ["a@example.com"]))
+
+    assert result.successful()
+    assert [message.to for message in mail.outbox] == [["a@example.com"]]
+
+
+@pytest.mark.django_db
+def test_send_email_task_retries_then_fails(settings):
+    settings.EMAIL_BACKEND = "djcelery_email.backends.CeleryEmailBackend"
+    settings.CELERY_EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+    name = send_email_task.name
+    retries_before = sample("churchpad_celery_task_retries_total", task=name)
+    failures_before = sample("churchpad_celery_task_failures_total", task=name)
+
+    with patch(
+        "django.core.mail.backends.smtp.EmailBackend.open",
+        side_effect=smtplib.SMTPServerDisconnected("gone"),
+    ) as mock_open:
+        result = send_email_task.apply(args=("Hi", "Body", ["a@example.com"]))
+
+    assert result.failed()
+    assert mock_open.call_count == send_email_task.max_retries + 1
+    assert (
+        sample("churchpad_celery_task_retries_total", task=name)
+        == retries_before + send_email_task.max_retries
+    )
+    assert sample("churchpad_celery_task_failures_total", task=name) == failures_before + 1
+    assert sample("churchpad_celery_task_runtime_seconds_count", task=name, state="FAILURE") > 0
+
+
+@pytest.mark.django_db
+def test_send_welcome_sms_retries_transient_twilio_errors(subscribers):
+    client = MagicMock()
+    client.messages.create.side_effect = [
+        TwilioRestException(503, "/Messages", "Service unavailable"),
+        MagicMock(),
+    ]
+
+    with patch("apps.subscriptions.tasks.get_twilio_client", return_value=client):
+        result = send_welcome_sms.apply(args=(str(subscribers[0].id),))
+
+    assert result.successful()
+    assert client.messages.create.call_count == 2
+
+
+@pytest.mark.django_db
+def test_send_welcome_sms_does_not_retry_permanent_twilio_errors(subscribers):
+    client = MagicMock()
+    client.messages.create.side_effect = TwilioRestException(
+        400, "/Messages", "Invalid 'To' number"
+    )
+
+    with patch("apps.subscriptions.tasks.get_twilio_client", return_value=client):
+        result = send_welcome_sms.apply(args=(str(subscribers[0].id),))
+
+    assert result.successful()
+    client.messages.create.assert_called_once()
+
+
+@pytest.mark.parametrize(
+    "task, queue",
+    [
+        (send_email_task, "notifications.email"),
+        (send_bulk_email_task, "notifications.email"),
+        (send_welcome_sms, "notifications.sms"),
+        (send_bulk_sms, "notifications.sms"),
+        (process_stripe_events, "webhooks"),
+        (announce_to_subscribers, "default"),
+    ],
+)
+def test_tasks_are_routed_to_dedicated_queues(task, queue):
+    route = task.app.amqp.router.route({}, task.name)
+
+    assert route["queue"].name == queue
+
+
+def test_notification_tasks_are_rate_limited(settings):
+    assert send_email_task.rate_limit == settings.EMAIL_TASK_RATE_LIMIT
+    assert send_welcome_sms.rate_limit == settings.SMS_TASK_RATE_LIMIT
@@ -1,7 +1,11 @@
+import json
+
 import pytest
 from django.urls import reverse
+from apps.common.models import OutboxMessage
 from apps.subscriptions.models import Plan, Subscriber
 from unittest.mock import patch
+from stripe import StripeObject
 
 @pytest.mark.django_db
 def test_list_plans(client):
@@ -11,18 +15,48 @@ def test_list_plans(client):
         price=10.00,
         billing_period="month",
     )
-    response = client.get(reverse("subscriptions:list_plans"))
+    response = client.get(reverse("subscriptions:plan_list"))
     assert response.status_code == 200
     assert len(response.data) == 1
     assert response.data[0]["name"] == "Basic Plan"
 
+@pytest.mark.django_db(transaction=True)
+def test_list_plans_conditional_get_and_invalidation(client):
+    Plan.objects.create(
+        name="Basic Plan",
+        stripe_price_id="price_12345",
+        price=10.00,
+        billing_period="month",
+    )
+    url = reverse("subscriptions:plan_list")
+    response = client.get(url)
+    etag = response["ETag"]
+
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+
+    with patch("apps.subscriptions.cache.PlanSerializer") as serializer:
+        client.get(url)
+    serializer.assert_not_called()
+
+    Plan.objects.create(
+        name="Premium Plan",
+        stripe_price_id="price_67890",
+        price=20.00,
+        billing_period="month",
+    )
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response["ETag"] != etag
+    assert len(response.data) == 2
+
 @pytest.mark.django_db
 @patch("apps.subscriptions.tasks.send_welcome_sms.delay")
 @patch("apps.subscriptions.tasks.send_email_task.delay")
 @patch("apps.subscriptions.services.StripeService.create_subscription")
-@patch("apps.subscriptions.services.StripeService.create_customer")
+@patch("apps.subscriptions.services.StripeService.retrieve_customer")
 def test_confirm_subscription(
-    mock_create_customer, mock_create_subscription, mock_send_email, mock_send_sms, client
+    mock_retrieve_customer, mock_create_subscription, mock_send_email, mock_send_sms, client
 ):
     plan = Plan.objects.create(
         name="Basic Plan",
@@ -30,18 +64,59 @@ def test_confirm_subscription(
         price=10.00,
         billing_period="month",
     )
-    mock_create_customer.return_value = {"id": "cus_12345"}
-    mock_create_subscription.return_value = {"id": "sub_12345"}
+    mock_retrieve_customer.return_value = StripeObject.construct_from(
+        {
+            "id": "cus_12345",
+            "name": "John Doe",
+            "email": "john@example.com",
+            "phone": "+15551234567",
+        },
+        "sk_test",
+    )
+    mock_create_subscription.return_value = StripeObject.construct_from(
+        {"id": "sub_12345"}, "sk_test"
+    )
 
     data = {
         "customer_id": "cus_12345",
         "plan_id": plan.id,
     }
-    response = client.post(reverse("subscriptions:confirm_subscription"), data)
+    response = client.post(reverse("subscriptions:subscription_confirm"), data)
     assert response.status_code == 201
-    assert Subscriber.objects.filter(stripe_customer_id="cus_12345").exists()
-    mock_send_sms.assert_called_once()
-    mock_send_email.assert_called_once()
+    subscriber = Subscriber.objects.get(stripe_customer_id="cus_12345")
+    # Notifications go through the outbox; the request never hits the broker.
+    mock_send_sms.assert_not_called()
+    mock_send_email.assert_not_called()
+    assert list(OutboxMessage.objects.order_by("pkid").values_list("task_name", "args")) == [
+        ("apps.subscriptions.tasks.send_welcome_sms", [str(subscriber.id)]),
+        (
+            "apps.subscriptions.tasks.send_email_task",
+            [
+                "Welcome to ChurchPad",
+                "Hi John Doe,\n\nThank you for subscribing to our service. We are excited to have you on board!",
+                ["john@example.com"],
+            ],
+        ),
+    ]
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("field", ["customer_id", "plan_id"])
+@patch("apps.subscriptions.services.StripeService.retrieve_customer")
+def test_confirm_subscription_requires_customer_and_plan(mock_retrieve_customer, field, client):
+    plan = Plan.objects.create(
+        name="Basic Plan",
+        stripe_price_id="price_12345",
+        price=10.00,
+        billing_period="month",
+    )
+    data = {"customer_id": "cus_12345", "plan_id": plan.id}
+    del data[field]
+
+    response = client.post(reverse("subscriptions:subscription_confirm"), data)
+
+    assert response.status_code == 400
+    mock_retrieve_customer.assert_not_called()
+    assert not Subscriber.objects.exists()
 
 @pytest.mark.django_db
 def test_unsubscribe(client):
@@ -60,10 +135,12 @@ def test_unsubscribe(client):
         stripe_subscription_id="sub_12345",
         is_active=True,
     )
-    response = client.delete(reverse("subscriptions:unsubscribe", args=[subscriber.id]))
+    response = client.delete(reverse("subscriptions:subscription_delete", args=[subscriber.id]))
     assert response.status_code == 204
     subscriber.refresh_from_db()
     assert subscriber.is_active is False
+    response = client.delete(reverse("subscriptions:subscription_delete", args=[subscriber.id]))
+    assert response.status_code == 404
 
 @pytest.mark.django_db
 def test_list_subscriptions(client):
@@ -82,7 +159,80 @@ def test_list_subscriptions(client):
         stripe_subscription_id="sub_12345",
         is_active=True,
     )
-    response = client.get(reverse("subscriptions:list_subscriptions"))
+    response = client.get(reverse("subscriptions:subscription_list"))
     assert response.status_code == 200
-    assert len(response.data) == 1
-    assert response.data[0]["name"] == "John Doe"
\ No newline at end of file
+    assert len(response.data["results"]) == 1
+    assert response.data["results"][0]["name"] == "John Doe"
+    assert response.data["next"] is None
+
+@pytest.mark.django_db
+def test_list_subscriptions_keyset_pagination(client):
+    plan = Plan.objects.create(
+        name="Basic Plan",
+        stripe_price_id="price_12345",
+        price=10.00,
+        billing_period="month",
+    )
+    for i in range(5):
+        Subscriber.objects.create(
+            name=f"Subscriber {i}",
+            email=f"subscriber{i}@example.com",
+            phone_number="+15551234567",
+            plan=plan,
+            stripe_customer_id=f"cus_{i}",
+            stripe_subscription_id=f"sub_{i}",
+            is_active=True,
+        )
+    url = reverse("subscriptions:subscription_list")
+
+    names = []
+    cursor = None
+    while True:
+        params = {"page_size": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get(url, params)
+        assert response.status_code == 200
+        names += [row["name"] for row in response.data["results"]]
+        cursor = response.data["next"]
+        if cursor is None:
+            break
+
+    assert names == [f"Subscriber {i}" for i in reversed(range(5))]
+
+@pytest.mark.django_db
+def test_list_subscriptions_invalid_cursor(client):
+    response = client.get(
+        reverse("subscriptions:subscription_list"), {"cursor": "not-a-cursor"}
+    )
+    assert response.status_code == 400
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("fmt", ["json", "ndjson"])
+def test_list_subscriptions_streaming(client, fmt):
+    plan = Plan.objects.create(
+        name="Basic Plan",
+        stripe_price_id="price_12345",
+        price=10.00,
+        billing_period="month",
+    )
+    for i in range(3):
+        Subscriber.objects.create(
+            name=f"Subscriber {i}",
+            email=f"subscriber{i}@example.com",
+            phone_number="+15551234567",
+            plan=plan,
+            stripe_customer_id=f"cus_{i}",
+            stripe_subscription_id=f"sub_{i}",
+            is_active=i != 1,
+        )
+    response = client.get(reverse("subscriptions:subscription_list"), {"stream": fmt})
+    assert response.status_code == 200
+    assert response.streaming
+    body = b"".join(response.streaming_content).decode()
+    if fmt == "json":
+        rows = json.loads(body)
+    else:
+        rows = [json.loads(line) for line in body.splitlines()]
+    assert [row["name"] for row in rows] == ["Subscriber 2", "Subscriber 0"]
+    assert rows[0]["plan"]["name"] == "Basic Plan"
\ No newline at end of file
@@ -0,0 +1,205 @@
+import hashlib
+import hmac
+import json
+import time
+
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.common.models import OutboxMessage
+from apps.subscriptions.models import Plan, StripeEvent, Subscriber
+from apps.subscriptions.tasks import process_stripe_events
+
+WEBHOOK_SECRET = "whsec_test"
+
+
+def sign(payload, secret=WEBHOOK_SECRET):
+    timestamp = int(time.time())
+    signature = hmac.new(
+        secret.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256
+    ).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+def make_event(event_id, event_type, customer_id):
+    return {
+        "id": event_id,
+        "type": event_type,
+        "data": {"object": {"customer": customer_id}},
+    }
+
+
+def post_event(client, event, secret=WEBHOOK_SECRET):
+    payload = json.dumps(event)
+    return client.post(
+        reverse("subscriptions:stripe_webhook"),
+        payload,
+        content_type="application/json",
+        HTTP_STRIPE_SIGNATURE=sign(payload, secret),
+    )
+
+
+@pytest.fixture
+def subscriber(db):
+    plan = Plan.objects.create(
+        name="Basic Plan",
+        stripe_price_id="price_12345",
+        price=10.00,
+        billing_period="month",
+    )
+    return Subscriber.objects.create(
+        name="John Doe",
+        email="john@example.com",
+        phone_number="+15551234567",
+        plan=plan,
+        stripe_customer_id="cus_12345",
+        stripe_subscription_id="sub_12345",
+    )
+
+
+@pytest.mark.django_db
+def test_webhook_stores_event_without_touching_subscriber(client, settings, subscriber):
+    settings.STRIPE_WEBHOOK_SECRET = WEBHOOK_SECRET
+    event = make_event("evt_1", "customer.subscription.created", "cus_12345")
+
+    response = post_event(client, event)
+
+    assert response.status_code == 200
+    stored = StripeEvent.objects.get(event_id="evt_1")
+    assert stored.status == StripeEvent.Status.PENDING
+    assert stored.payload == event
+    subscriber.refresh_from_db()
+    assert subscriber.is_active is False
+
+
+@pytest.mark.django_db
+def test_webhook_rejects_bad_signature(client, settings):
+    settings.STRIPE_WEBHOOK_SECRET = WEBHOOK_SECRET
+    event = make_event("evt_1", "customer.subscription.created", "cus_12345")
+
+    response = post_event(client, event, secret="whsec_other")
+
+    assert response.status_code == 400
+    assert not StripeEvent.objects.exists()
+
+
+@pytest.mark.django_db
+def test_process_stripe_events_applies_batch_in_order(subscriber):
+    for event_id, event_type, customer_id in [
+        ("evt_1", "customer.subscription.created", "cus_12345"),
+        ("evt_2", "customer.subscription.deleted", "cus_12345"),
+        ("evt_3", "customer.subscription.created", "cus_12345"),
+        ("evt_4", "customer.subscription.created", "cus_missing"),
+        ("evt_5", "invoice.created", "cus_12345"),
+    ]:
+        StripeEvent.objects.create(
+            event_id=event_id,
+            type=event_type,
+            payload=make_event(event_id, event_type, customer_id),
+        )
+
+    assert process_stripe_events(batch_size=10) == 5
+
+    subscriber.refresh_from_db()
+    assert subscriber.is_active is True
+    statuses = dict(StripeEvent.objects.values_list("event_id", "status"))
+    assert statuses == {
+        "evt_1": StripeEvent.Status.PROCESSED,
+        "evt_2": StripeEvent.Status.PROCESSED,
+        "evt_3": StripeEvent.Status.PROCESSED,
+        "evt_4": StripeEvent.Status.PENDING,
+        "evt_5": StripeEvent.Status.IGNORED,
+    }
+    assert OutboxMessage.objects.filter(
+        task_name="apps.subscriptions.tasks.send_email_task"
+    ).count() == 3
+
+
+@pytest.mark.django_db
+def test_webhook_redelivery_short_circuits_before_orm(client, settings, django_assert_num_queries):
+    settings.STRIPE_WEBHOOK_SECRET = WEBHOOK_SECRET
+    event = make_event("evt_1", "customer.subscription.created", "cus_12345")
+    assert post_event(client, event).data == {"status": "received"}
+
+    with django_assert_num_queries(0):
+        response = post_event(client, event)
+
+    assert response.status_code == 200
+    assert response.data == {"status": "duplicate"}
+    assert StripeEvent.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_webhook_redelivery_caught_by_unique_event_id(client, settings):
+    from django.core.cache import cache
+
+    settings.STRIPE_WEBHOOK_SECRET = WEBHOOK_SECRET
+    event = make_event("evt_1", "customer.subscription.created", "cus_12345")
+    post_event(client, event)
+    cache.clear()
+
+    response = post_event(client, event)
+
+    assert response.data == {"status": "duplicate"}
+    assert StripeEvent.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_event_before_subscriber_exists_is_retried(settings):
+    settings.STRIPE_EVENT_RETRY_BACKOFF = 30
+    plan = Plan.objects.create(
+        name="Basic Plan", stripe_price_id="price_12345", price=10.00, billing_period="month"
+    )
+    # Stripe's subscription.created lands before confirm_subscription saved the row.
+    event = StripeEvent.objects.create(
+        event_id="evt_1",
+        type="customer.subscription.created",
+        payload=make_event("evt_1", "customer.subscription.created", "cus_12345"),
+    )
+
+    process_stripe_events(batch_size=10)
+
+    event.refresh_from_db()
+    assert event.status == StripeEvent.Status.PENDING
+    assert event.attempts == 1
+    assert event.next_attempt_at > timezone.now()
+
+    subscriber = Subscriber.objects.create(
+        name="John Doe",
+        email="john@example.com",
+        phone_number="+15551234567",
+        plan=plan,
+        stripe_customer_id="cus_12345",
+        stripe_subscription_id="sub_12345",
+    )
+    # Still backing off
+    assert process_stripe_events(batch_size=10) == 0
+
+    StripeEvent.objects.filter(pk=event.pk).update(next_attempt_at=timezone.now())
+    assert process_stripe_events(batch_size=10) == 1
+
+    event.refresh_from_db()
+    subscriber.refresh_from_db()
+    assert event.status == StripeEvent.Status.PROCESSED
+    assert event.attempts == 2
+    assert subscriber.is_active is True
+
+
+@pytest.mark.django_db
+def test_event_fails_after_max_attempts(settings):
+    settings.STRIPE_EVENT_MAX_ATTEMPTS = 2
+    event = StripeEvent.objects.create(
+        event_id="evt_1",
+        type="customer.subscription.created",
+        payload=make_event("evt_1", "customer.subscription.created", "cus_missing"),
+    )
+
+    for _ in range(2):
+        StripeEvent.objects.filter(pk=event.pk).update(next_attempt_at=None)
+        process_stripe_events(batch_size=10)
+
+    event.refresh_from_db()
+    assert event.status == StripeEvent.Status.FAILED
+    assert event.attempts == 2
+    assert event.last_error == "Subscriber not found"
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import async_views, views
 
 
 app_name = "subscriptions"
@@ -13,7 +13,17 @@ urlpatterns = [
         name="subscription_confirm",
     ),
     path(
-        "subscriptions/<int:pk>/delete/", views.unsubscribe, name="subscription_delete"
+        "subscriptions/<uuid:id>/delete/", views.unsubscribe, name="subscription_delete"
+    ),
+    path(
+        "async/subscriptions/create/",
+        async_views.subscribe,
+        name="subscription_create_async",
+    ),
+    path(
+        "async/subscriptions/confirm/",
+        async_views.confirm_subscription,
+        name="subscription_confirm_async",
     ),
     path("plans/", views.list_plans, name="plan_list"),
     path("plans/register-price/", views.register_price, name="register_price"),
@@ -1,32 +1,51 @@
 
+import json
 import logging
-from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils.http import parse_etags
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
+from apps.common.db_router import read_db_for
 from .models import Subscriber, Plan
 from .serializers import (
     PlanSerializer,
     ReadSubscriberSerializer,
     WriteSubscriberSerializer,
     RegisterPriceSerializer,
+    ValuesListSerializer,
 )
 import stripe
 from django.conf import settings
-from .tasks import send_welcome_sms, send_email_task
-from .services import StripeService
+from .services import get_stripe_service, signup_idempotency_key
+from .pagination import KeysetPagination, stream_rows
+from .cache import get_plan, get_plan_catalogue
+from .webhooks import record_event
+from .subscribers import create_subscriber, unsubscribe_subscribers
 
 
 # Initialize logger
 logger = logging.getLogger(__name__)
 
+STREAM_CONTENT_TYPES = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+}
+
+# ReadSubscriberSerializer output straight from values_list rows; pkid is
+# fetched for the pagination cursor.
+subscriber_rows = ValuesListSerializer(ReadSubscriberSerializer, extra_columns=["pkid"])
+
 
 @swagger_auto_schema(
     method="post",
     operation_summary="Subscribe a user to a plan",
-    operation_description="Creates a new subscription for a user by creating a Stripe customer, payment intent, and subscription, and saving the subscriber in the database.",
+    operation_description=(
+        "Creates a new subscription for a user by creating a Stripe customer, payment intent, "
+        "and subscription, and saving the subscriber in the database."
+    ),
     request_body=WriteSubscriberSerializer,
     responses={
         201: ReadSubscriberSerializer,
@@ -39,7 +58,7 @@ def subscribe(request):
     serializer = WriteSubscriberSerializer(data=request.data)
     if serializer.is_valid():
         try:
-            plan = Plan.objects.get(id=serializer.validated_data["plan_id"])
+            plan = get_plan(id=serializer.validated_data["plan_id"])
             logger.info(f"Plan retrieved: {plan.name}")
         except Plan.DoesNotExist:
             logger.error("Invalid plan ID provided")
@@ -47,35 +66,44 @@ def subscribe(request):
                 {"error": "Invalid plan ID"}, status=status.HTTP_400_BAD_REQUEST
             )
 
+        payment_method_id = request.data.get("payment_method_id")
+        if not payment_method_id:
+            logger.error("Payment method ID is missing")
+            return Response(
+                {"error": "Payment method ID is required"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        stripe_service = get_stripe_service()
+        idempotency_key = signup_idempotency_key(
+            serializer.validated_data["email"],
+            serializer.validated_data["name"],
+            serializer.validated_data["phone_number"],
+            plan.id,
+            payment_method_id,
+            client_key=request.headers.get("Idempotency-Key"),
+        )
         try:
-            # Create Stripe Customer
-            customer = StripeService.create_customer(
+            # Create the Stripe Customer with the PaymentMethod attached as
+            # its default
+            customer = stripe_service.create_customer(
                 email=serializer.validated_data["email"],
                 name=serializer.validated_data["name"],
                 phone_number=serializer.validated_data["phone_number"],
+                payment_method_id=payment_method_id,
+                idempotency_key=f"{idempotency_key}:customer",
             )
-            logger.info(f"Stripe customer created: {customer.id}")
-
-            # Attach the PaymentMethod to the Customer
-            payment_method_id = request.data.get("payment_method_id")
-            if not payment_method_id:
-                logger.error("Payment method ID is missing")
-                return Response(
-                    {"error": "Payment method ID is required"},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-
-            StripeService.attach_payment_method(payment_method_id, customer.id)
             logger.info(
-                f"Payment method {payment_method_id} attached to customer {customer.id}"
+                f"Stripe customer created: {customer.id} with payment method {payment_method_id}"
             )
 
             # Create a PaymentIntent
-            payment_intent = StripeService.create_payment_intent(
+            payment_intent = stripe_service.create_payment_intent(
                 amount=int(plan.price * 100),  # Convert price to cents
                 currency="usd",
                 customer_id=customer.id,
                 metadata={"plan_id": plan.id},
+                idempotency_key=f"{idempotency_key}:payment_intent",
             )
             logger.info(f"PaymentIntent created: {payment_intent.id}")
 
@@ -101,7 +129,10 @@ def subscribe(request):
 @swagger_auto_schema(
     method="post",
     operation_summary="Confirm a subscription",
-    operation_description="Confirms a subscription by creating a Stripe subscription for the customer and saving the subscriber in the database.",
+    operation_description=(
+        "Confirms a subscription by creating a Stripe subscription for the customer "
+        "and saving the subscriber in the database."
+    ),
     request_body=openapi.Schema(
         type=openapi.TYPE_OBJECT,
         properties={
@@ -124,40 +155,39 @@ def confirm_subscription(request):
     logger.info("Processing subscription confirmation")
     customer_id = request.data.get("customer_id")
     plan_id = request.data.get("plan_id")
+    if not customer_id or not plan_id:
+        logger.error("Subscription confirmation without customer or plan ID")
+        return Response(
+            {"error": "customer_id and plan_id are required"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    stripe_service = get_stripe_service()
 
     try:
-        plan = Plan.objects.get(id=plan_id)
+        plan = get_plan(id=plan_id)
         logger.info(f"Plan retrieved: {plan.name}")
-        customer = stripe.Customer.retrieve(customer_id)
+        # Cached by subscribe; only a miss goes to Stripe
+        customer = stripe_service.get_customer_snapshot(customer_id)
         logger.info(f"Stripe customer retrieved: {customer_id}")
 
         # Create a subscription
-        subscription = StripeService.create_subscription(
-            customer.id, plan.stripe_price_id
+        subscription = stripe_service.create_subscription(
+            customer["id"], plan.stripe_price_id
         )
         logger.info(f"Subscription created: {subscription.id}")
 
-        # Save the subscriber in the database
-        with transaction.atomic():
-            subscriber = Subscriber.objects.create(
-                name=customer.name,
-                email=customer.email,
-                phone_number=customer.phone,
-                plan=plan,
-                stripe_customer_id=customer.id,
-                stripe_subscription_id=subscription.id,
-            )
-            logger.info(f"Subscriber saved: {subscriber.id}")
-
-        # Trigger Celery task to send SMS
-        send_welcome_sms.delay(subscriber.id)
-        logger.info(f"Welcome SMS task triggered for subscriber {subscriber.id}")
-
-        # Trigger Celery task to send email
-        subject = "Welcome to ChurchPad"
-        message = f"Hi {subscriber.name},\n\nThank you for subscribing to our service. We are excited to have you on board!"
-        send_email_task.delay(subject, message, [subscriber.email])
-        logger.info(f"Welcome email task triggered for subscriber {subscriber.id}")
+        # Save the subscriber; the welcome SMS and email are queued in the
+        # same transaction and published by the outbox relay.
+        subscriber = create_subscriber(
+            name=customer["name"],
+            email=customer["email"],
+            phone_number=customer["phone"],
+            plan=plan,
+            stripe_customer_id=customer["id"],
+            stripe_subscription_id=subscription.id,
+        )
+        logger.info(f"Subscriber saved: {subscriber.id}")
+        logger.info(f"Welcome notifications queued for subscriber {subscriber.id}")
         return Response(
             ReadSubscriberSerializer(subscriber).data, status=status.HTTP_201_CREATED
         )
@@ -176,16 +206,58 @@ def confirm_subscription(request):
 @swagger_auto_schema(
     method="get",
     operation_summary="List active subscriptions",
-    operation_description="Retrieves a list of all active subscriptions, including their associated plans.",
+    operation_description="Retrieves a page of active subscriptions, including their associated plans. "
+    "Pages are keyset-paginated on creation time; pass the returned `next` cursor to fetch the following page. "
+    "With `stream=json` or `stream=ndjson` every remaining row is streamed instead of a single page.",
+    manual_parameters=[
+        openapi.Parameter(
+            "cursor",
+            openapi.IN_QUERY,
+            description="Opaque cursor returned as `next` by the previous page",
+            type=openapi.TYPE_STRING,
+        ),
+        openapi.Parameter(
+            "page_size",
+            openapi.IN_QUERY,
+            description="Number of subscriptions per page",
+            type=openapi.TYPE_INTEGER,
+        ),
+        openapi.Parameter(
+            "stream",
+            openapi.IN_QUERY,
+            description="Stream all rows as a JSON array (`json`) or newline-delimited JSON (`ndjson`)",
+            type=openapi.TYPE_STRING,
+            enum=list(STREAM_CONTENT_TYPES),
+        ),
+    ],
     responses={
         200: ReadSubscriberSerializer(many=True),
     },
 )
 @api_view(["GET"])
 def list_subscriptions(request):
-    subscribers = Subscriber.objects.filter(is_active=True).select_related("plan")
-    serializer = ReadSubscriberSerializer(subscribers, many=True)
-    return Response(serializer.data)
+    subscribers = subscriber_rows.values(
+        Subscriber.objects.using(read_db_for(request)).filter(is_active=True)
+    )
+    paginator = KeysetPagination()
+
+    stream = request.query_params.get("stream")
+    if stream:
+        if stream not in STREAM_CONTENT_TYPES:
+            return Response(
+                {"error": f"Unsupported stream format: {stream}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        rows = stream_rows(
+            paginator.seek(subscribers, request),
+            subscriber_rows,
+            fmt=stream,
+            chunk_size=settings.SUBSCRIPTIONS_STREAM_CHUNK_SIZE,
+        )
+        return StreamingHttpResponse(rows, content_type=STREAM_CONTENT_TYPES[stream])
+
+    page = paginator.paginate_queryset(subscribers, request)
+    return Response(paginator.get_paginated_data(subscriber_rows.serialize(page)))
 
 
 # This view handles the unsubscription of a user
@@ -200,13 +272,10 @@ def list_subscriptions(request):
 )
 @api_view(["DELETE"])
 def unsubscribe(request, id):
-    try:
-        subscriber = Subscriber.objects.get(id=id, is_active=True)
-    except Subscriber.DoesNotExist:
+    # Nothing changed means unknown or already unsubscribed. The Stripe
+    # subscription is cancelled by a queued task.
+    if not unsubscribe_subscribers(ids=[id]):
         return Response(status=status.HTTP_404_NOT_FOUND)
-
-    subscriber.is_active = False
-    subscriber.save()
     return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -214,25 +283,39 @@ def unsubscribe(request, id):
 @swagger_auto_schema(
     method="get",
     operation_summary="List all plans",
-    operation_description="Retrieves a list of all available subscription plans.",
+    operation_description="Retrieves a list of all available subscription plans. "
+    "Responses carry an `ETag`; send it back in `If-None-Match` to get a 304 when the catalogue is unchanged.",
     responses={
         200: openapi.Response(
-            description="List of plans", schema=ReadSubscriberSerializer(many=True)
+            description="List of plans", schema=PlanSerializer(many=True)
         ),
+        304: openapi.Response(description="Plan catalogue not modified"),
     },
 )
 @api_view(["GET"])
 def list_plans(request):
-    plans = Plan.objects.all()
-    serializer = PlanSerializer(plans, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    catalogue = get_plan_catalogue()
+    etag = catalogue["etag"]
+
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match and (
+        if_none_match.strip() == "*" or etag in parse_etags(if_none_match)
+    ):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    return Response(
+        catalogue["payload"], status=status.HTTP_200_OK, headers={"ETag": etag}
+    )
 
 
 # This view handles the registration of a price for a plan
 @swagger_auto_schema(
     method="post",
     operation_summary="Register a price for a plan",
-    operation_description="Creates a price for a plan using the Stripe Price API and stores the price in the database.",
+    operation_description=(
+        "Creates a price for a plan using the Stripe Price API "
+        "and stores the price in the database."
+    ),
     request_body=RegisterPriceSerializer,
     responses={
         201: openapi.Response(description="Price created and stored successfully"),
@@ -245,9 +328,10 @@ def register_price(request):
     serializer = RegisterPriceSerializer(data=request.data)
     if serializer.is_valid():
         data = serializer.validated_data
+        stripe_service = get_stripe_service()
         try:
             # Create a price in Stripe
-            price = StripeService.create_price(
+            price = stripe_service.create_price(
                 currency=data["currency"],
                 unit_amount=data["unit_amount"],
                 interval=data["interval"],
@@ -288,22 +372,29 @@ def register_price(request):
 @swagger_auto_schema(
     method="post",
     operation_summary="Handle Stripe webhook events",
-    operation_description="Handles Stripe webhook events such as `payment_failed`, `customer.subscription.created`, and others.",
+    operation_description=(
+        "Verifies and stores Stripe webhook events such as `payment_failed`, "
+        "`customer.subscription.created`, and others. "
+        "Events are acknowledged immediately and applied asynchronously by Celery workers."
+    ),
     request_body=openapi.Schema(
         type=openapi.TYPE_OBJECT,
         properties={
-            "event_type": openapi.Schema(
+            "id": openapi.Schema(
+                type=openapi.TYPE_STRING, description="Stripe event ID"
+            ),
+            "type": openapi.Schema(
                 type=openapi.TYPE_STRING, description="Type of Stripe event"
             ),
-            "customer_id": openapi.Schema(
-                type=openapi.TYPE_STRING, description="Stripe customer ID"
+            "data": openapi.Schema(
+                type=openapi.TYPE_OBJECT, description="Stripe event data"
             ),
         },
-        required=["event_type", "customer_id"],
+        required=["id", "type", "data"],
     ),
     responses={
-        200: openapi.Response(description="Webhook processed successfully"),
-        404: openapi.Response(description="Subscriber not found"),
+        200: openapi.Response(description="Webhook received"),
+        400: openapi.Response(description="Invalid payload or signature"),
     },
 )
 @api_view(["POST"])
@@ -312,81 +403,31 @@ def stripe_webhook(request):
 
     # Verify the payload
     try:
-        payload = request.body
+        payload = request.body.decode("utf-8")
         sig_header = request.META.get("HTTP_STRIPE_SIGNATURE")
-        event = stripe.Webhook.construct_event(
+        stripe.WebhookSignature.verify_header(
             payload, sig_header, settings.STRIPE_WEBHOOK_SECRET
         )
-    except ValueError as e:
+        event = json.loads(payload)
+    except ValueError:
         logger.error("Invalid payload")
         return Response({"error": "Invalid payload"}, status=status.HTTP_400_BAD_REQUEST)
-    except stripe.error.SignatureVerificationError as e:
+    except stripe.error.SignatureVerificationError:
         logger.error("Invalid signature")
         return Response({"error": "Invalid signature"}, status=status.HTTP_400_BAD_REQUEST)
 
-    # Extract event type and customer ID
-    event_type = event["type"]
-    customer_id = event["data"]["object"].get("customer")
-
-    if not event_type or not customer_id:
-        logger.error("Missing event_type or customer_id in webhook payload")
+    event_id = event.get("id") if isinstance(event, dict) else None
+    event_type = event.get("type") if isinstance(event, dict) else None
+    if not event_id or not event_type:
+        logger.error("Missing id or type in webhook payload")
         return Response(
             {"error": "Invalid payload"}, status=status.HTTP_400_BAD_REQUEST
         )
 
-    try:
-        subscriber = Subscriber.objects.get(stripe_customer_id=customer_id)
-    except Subscriber.DoesNotExist:
-        logger.error(f"Subscriber with customer_id {customer_id} not found")
-        return Response(
-            {"error": "Subscriber not found"}, status=status.HTTP_404_NOT_FOUND
-        )
-
-    # Handle different event types
-    if event_type == "customer.subscription.created":
-        logger.info(f"Handling customer.subscription.created for customer {customer_id}")
-        subscriber.is_active = True
-        subscriber.save()
+    # Persist the raw event and acknowledge; process_stripe_events applies it.
+    if not record_event(event_id, event_type, event):
+        logger.info(f"Duplicate Stripe event {event_id} ignored")
+        return Response({"status": "duplicate"})
 
-        # Send email notification asynchronously
-        subject = "Subscription Created"
-        message = f"Dear {subscriber.name},\n\nYour subscription has been successfully created."
-        send_email_task.delay(subject, message, [subscriber.email])
-
-        return Response({"status": "subscription activated"})
-
-    elif event_type == "customer.subscription.updated":
-        logger.info(f"Handling customer.subscription.updated for customer {customer_id}")
-
-        # Send email notification asynchronously
-        subject = "Subscription Updated"
-        message = f"Dear {subscriber.name},\n\nYour subscription has been updated."
-        send_email_task.delay(subject, message, [subscriber.email])
-
-        return Response({"status": "subscription updated"})
-
-    elif event_type == "customer.subscription.deleted":
-        logger.info(f"Handling customer.subscription.deleted for customer {customer_id}")
-        subscriber.is_active = False
-        subscriber.save()
-
-        # Send email notification asynchronously
-        subject = "Subscription Cancelled"
-        message = f"Dear {subscriber.name},\n\nYour subscription has been cancelled."
-        send_email_task.delay(subject, message, [subscriber.email])
-
-        return Response({"status": "subscription deleted"})
-
-    elif event_type == "payment_intent.succeeded":
-        logger.info(f"Handling payment_intent.succeeded for customer {customer_id}")
-
-        # Send email notification asynchronously
-        subject = "Payment Successful"
-        message = f"Dear {subscriber.name},\n\nYour payment was successful. Thank you!"
-        send_email_task.delay(subject, message, [subscriber.email])
-
-        return Response({"status": "payment succeeded"})
-
-    else:
-        logger.warning(f"Unhandled event type: {event_type}")
-        return Response({"status": "event ignored"})
\ No newline at end of file
+    logger.info(f"Stripe event {event_id} ({event_type}) queued")
+    return Response({"status": "received"})
@@ -0,0 +1,170 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from apps.common.outbox import enqueue_many
+
+from .metrics import STRIPE_EVENT_DEDUP
+from .models import StripeEvent, Subscriber
+from .subscribers import set_subscribers_active
+from .tasks import send_email_task
+
+logger = logging.getLogger(__name__)
+
+# Stripe event type -> (new is_active value or None to leave it, email subject, email body)
+EVENT_HANDLERS = {
+    "customer.subscription.created": (
+        True,
+        "Subscription Created",
+        "Dear {name},\n\nYour subscription has been successfully created.",
+    ),
+    "customer.subscription.updated": (
+        None,
+        "Subscription Updated",
+        "Dear {name},\n\nYour subscription has been updated.",
+    ),
+    "customer.subscription.deleted": (
+        False,
+        "Subscription Cancelled",
+        "Dear {name},\n\nYour subscription has been cancelled.",
+    ),
+    "payment_intent.succeeded": (
+        None,
+        "Payment Successful",
+        "Dear {name},\n\nYour payment was successful. Thank you!",
+    ),
+}
+
+
+def record_event(event_id, event_type, payload):
+    """
+    Store a webhook event unless it has been seen before.
+
+    Redeliveries are caught by an atomic ``SET NX`` in the cache first, so
+    they never reach the database; the unique ``event_id`` column catches
+    whatever the cache missed (expired keys, cache outages). Returns
+    ``True`` when the event is new.
+    """
+    key = f"stripe_event:{event_id}"
+    try:
+        is_new = cache.add(key, 1, settings.STRIPE_EVENT_DEDUP_TTL)
+    except Exception as e:
+        logger.warning(f"Stripe event dedup cache unavailable: {str(e)}")
+        is_new = True
+    if not is_new:
+        STRIPE_EVENT_DEDUP.labels(layer="cache", result="hit").inc()
+        return False
+    STRIPE_EVENT_DEDUP.labels(layer="cache", result="miss").inc()
+
+    try:
+        with transaction.atomic():
+            StripeEvent.objects.create(
+                event_id=event_id, type=event_type, payload=payload
+            )
+    except IntegrityError:
+        STRIPE_EVENT_DEDUP.labels(layer="db", result="hit").inc()
+        return False
+    except Exception:
+        # Let Stripe's retry through instead of remembering an event that
+        # was never stored.
+        cache.delete(key)
+        raise
+    STRIPE_EVENT_DEDUP.labels(layer="db", result="miss").inc()
+    return True
+
+
+def get_customer_id(event):
+    return (event.payload.get("data", {}).get("object") or {}).get("customer")
+
+
+def retry_delay(attempts):
+    """
+    Exponential backoff before attempt ``attempts + 1``, capped.
+    """
+    return timedelta(
+        seconds=min(
+            settings.STRIPE_EVENT_RETRY_BACKOFF * 2 ** (attempts - 1),
+            settings.STRIPE_EVENT_RETRY_BACKOFF_MAX,
+        )
+    )
+
+
+def process_events(events):
+    """
+    Apply a batch of stored Stripe events in arrival order.
+
+    Subscribers for the whole batch are loaded with a single query and
+    status changes are written with at most two UPDATE statements, one
+    per target ``is_active`` value, using the last state seen for each
+    subscriber. Notification emails are queued in the outbox with one
+    INSERT, in the caller's transaction.
+    """
+    customer_ids = {get_customer_id(event) for event in events} - {None}
+    subscribers = {
+        subscriber.stripe_customer_id: subscriber
+        for subscriber in Subscriber.objects.filter(
+            stripe_customer_id__in=customer_ids
+        )
+    }
+
+    now = timezone.now()
+    new_states = {}
+    notifications = []
+    for event in events:
+        event.attempts += 1
+        event.processed_at = now
+        event.next_attempt_at = None
+        event.updated_at = now
+        handler = EVENT_HANDLERS.get(event.type)
+        customer_id = get_customer_id(event)
+
+        if handler is None or not customer_id:
+            logger.warning(f"Unhandled event type: {event.type}")
+            event.status = StripeEvent.Status.IGNORED
+            continue
+
+        subscriber = subscribers.get(customer_id)
+        if subscriber is None:
+            event.last_error = "Subscriber not found"
+            if event.attempts >= settings.STRIPE_EVENT_MAX_ATTEMPTS:
+                logger.error(
+                    f"Subscriber with customer_id {customer_id} not found "
+                    f"after {event.attempts} attempts"
+                )
+                event.status = StripeEvent.Status.FAILED
+            else:
+                logger.warning(
+                    f"Subscriber with customer_id {customer_id} not found yet, "
+                    f"retrying {event.event_id}"
+                )
+                event.processed_at = None
+                event.next_attempt_at = now + retry_delay(event.attempts)
+            continue
+
+        logger.info(f"Handling {event.type} for customer {customer_id}")
+        is_active, subject, message = handler
+        if is_active and subscriber.cancelled_at:
+            # Opted out locally; Stripe's cancellation is on its way.
+            is_active = None
+        if is_active is not None:
+            new_states[subscriber.pkid] = is_active
+        notifications.append(
+            (subject, message.format(name=subscriber.name), [subscriber.email])
+        )
+        event.status = StripeEvent.Status.PROCESSED
+
+    for is_active in (True, False):
+        pkids = [pkid for pkid, state in new_states.items() if state is is_active]
+        if pkids:
+            set_subscribers_active(is_active, pkids=pkids)
+
+    StripeEvent.objects.bulk_update(
+        events,
+        ["status", "attempts", "last_error", "processed_at", "next_attempt_at", "updated_at"],
+    )
+
+    enqueue_many(send_email_task, notifications)
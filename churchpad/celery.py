@@ -6,3 +6,5 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "churchpad.settings.development"
 app = Celery("churchpad")
 app.config_from_object("django.conf:settings", namespace="CELERY")
 app.autodiscover_tasks(lambda: settings.INSTALLED_APPS)
+
+import apps.common.task_metrics  # noqa: E402,F401  (connects signal handlers)
@@ -1,6 +1,7 @@
 from pathlib import Path
 
 import environ
+from kombu import Queue
 
 env = environ.Env()
 
@@ -47,6 +48,8 @@ LOCAL_APPS = ["apps.common", "apps.subscriptions"]
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
 MIDDLEWARE = [
+    "apps.common.middleware.RequestMetricsMiddleware",
+    "apps.common.middleware.ReplicaPinningMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -75,6 +78,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "churchpad.wsgi.application"
+ASGI_APPLICATION = "churchpad.asgi.application"
 
 
 # Database
@@ -89,6 +93,57 @@ WSGI_APPLICATION = "churchpad.wsgi.application"
 
 DATABASES = {"default": env.db("DATABASE_URL")}
 
+# Connection reuse. With DATABASE_POOL each process (gunicorn worker, Celery
+# pool process) keeps a psycopg pool; otherwise connections persist for
+# DATABASE_CONN_MAX_AGE seconds and are health-checked before reuse. Size
+# the pool per process type, e.g. a smaller DATABASE_POOL_MAX_SIZE for
+# Celery workers. Prefer the pool under ASGI, where persistent connections
+# are tied to short-lived request threads.
+DATABASE_POOL = env.bool("DATABASE_POOL", default=False)
+DATABASE_POOL_MIN_SIZE = env.int("DATABASE_POOL_MIN_SIZE", default=2)
+DATABASE_POOL_MAX_SIZE = env.int("DATABASE_POOL_MAX_SIZE", default=10)
+# Seconds a request waits for a free connection before failing
+DATABASE_POOL_TIMEOUT = env.float("DATABASE_POOL_TIMEOUT", default=10.0)
+DATABASE_POOL_MAX_IDLE = env.float("DATABASE_POOL_MAX_IDLE", default=300.0)
+DATABASE_POOL_MAX_LIFETIME = env.float("DATABASE_POOL_MAX_LIFETIME", default=1800.0)
+DATABASE_CONN_MAX_AGE = env.int("DATABASE_CONN_MAX_AGE", default=60)
+# Milliseconds, 0 disables
+DATABASE_STATEMENT_TIMEOUT = env.int("DATABASE_STATEMENT_TIMEOUT", default=30_000)
+
+# Read replicas (comma separated URLs), used only by reads that opt in
+# through apps.common.db_router.read_db_for.
+DATABASE_REPLICAS = []
+for index, url in enumerate(env.list("DATABASE_REPLICA_URLS", default=[]), start=1):
+    DATABASES[f"replica{index}"] = {
+        **env.db_url_config(url),
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(f"replica{index}")
+DATABASE_ROUTERS = ["apps.common.db_router.PrimaryReplicaRouter"]
+# Seconds a client reads from the primary after writing
+REPLICA_PIN_SECONDS = env.int("REPLICA_PIN_SECONDS", default=5)
+
+for database in DATABASES.values():
+    if database["ENGINE"] != "django.db.backends.postgresql":
+        continue
+    db_options = database.setdefault("OPTIONS", {})
+    if DATABASE_STATEMENT_TIMEOUT:
+        db_options["options"] = f"-c statement_timeout={DATABASE_STATEMENT_TIMEOUT}"
+    if DATABASE_POOL:
+        from psycopg_pool import ConnectionPool
+
+        db_options["pool"] = {
+            "min_size": DATABASE_POOL_MIN_SIZE,
+            "max_size": DATABASE_POOL_MAX_SIZE,
+            "timeout": DATABASE_POOL_TIMEOUT,
+            "max_idle": DATABASE_POOL_MAX_IDLE,
+            "max_lifetime": DATABASE_POOL_MAX_LIFETIME,
+            "check": ConnectionPool.check_connection,
+        }
+    else:
+        database["CONN_MAX_AGE"] = DATABASE_CONN_MAX_AGE
+        database["CONN_HEALTH_CHECKS"] = True
+
 PASSWORD_HASHERS = [
     "django.contrib.auth.hashers.Argon2PasswordHasher",
     "django.contrib.auth.hashers.PBKDF2PasswordHasher",
@@ -152,6 +207,21 @@ CACHES = {
 
 CACHE_TIMEOUT = 300
 
+# Per-process Plan cache (apps.subscriptions.cache.PlanCache)
+PLAN_CACHE_SIZE = env.int("PLAN_CACHE_SIZE", default=256)
+PLAN_CACHE_TTL = env.int("PLAN_CACHE_TTL", default=300)
+# How often each process checks the shared plan version for changes
+PLAN_CACHE_VERSION_CHECK_INTERVAL = env.float(
+    "PLAN_CACHE_VERSION_CHECK_INTERVAL", default=1.0
+)
+
+# Subscription listing
+SUBSCRIPTIONS_PAGE_SIZE = env.int("SUBSCRIPTIONS_PAGE_SIZE", default=100)
+SUBSCRIPTIONS_MAX_PAGE_SIZE = env.int("SUBSCRIPTIONS_MAX_PAGE_SIZE", default=1000)
+SUBSCRIPTIONS_STREAM_CHUNK_SIZE = env.int(
+    "SUBSCRIPTIONS_STREAM_CHUNK_SIZE", default=2000
+)
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
@@ -174,6 +244,14 @@ LOGGING = {
 
 # Stripe Configuration
 STRIPE_TEST_KEY = env("STRIPE_PRIVATE_KEY", default="")
+STRIPE_POOL_SIZE = env.int("STRIPE_POOL_SIZE", default=10)
+STRIPE_CONNECT_TIMEOUT = env.float("STRIPE_CONNECT_TIMEOUT", default=3.05)
+STRIPE_READ_TIMEOUT = env.float("STRIPE_READ_TIMEOUT", default=20.0)
+STRIPE_MAX_NETWORK_RETRIES = env.int("STRIPE_MAX_NETWORK_RETRIES", default=2)
+# Override to target a local stand-in (see manage.py run_fake_providers)
+STRIPE_API_BASE = env("STRIPE_API_BASE", default="")
+# How long customer snapshots written at signup are kept for confirmation
+STRIPE_CUSTOMER_CACHE_TTL = env.int("STRIPE_CUSTOMER_CACHE_TTL", default=60 * 60)
 
 
 TWILIO_ACCOUNT_SID = env(
@@ -181,9 +259,27 @@ TWILIO_ACCOUNT_SID = env(
 )
 TWILIO_AUTH_TOKEN = env("TWILIO_AUTH_TOKEN", default="b8c4d5e2a7f6b8c4d5e2a7f6b8c4d5e2")
 TWILIO_PHONE_NUMBER = env("TWILIO_PHONE_NUMBER", default="+15042230697")
+TWILIO_POOL_SIZE = env.int("TWILIO_POOL_SIZE", default=10)
+TWILIO_CONNECT_TIMEOUT = env.float("TWILIO_CONNECT_TIMEOUT", default=3.05)
+TWILIO_READ_TIMEOUT = env.float("TWILIO_READ_TIMEOUT", default=10.0)
+TWILIO_MAX_RETRIES = env.int("TWILIO_MAX_RETRIES", default=2)
+TWILIO_API_BASE = env("TWILIO_API_BASE", default="")
+
+# Identifiers per UPDATE ... WHERE ... IN (...) when flipping subscriber status
+SUBSCRIBER_STATUS_BATCH_SIZE = env.int("SUBSCRIBER_STATUS_BATCH_SIZE", default=1000)
+# Recipients per bulk email/SMS task when fanning out announcements
+NOTIFICATION_BATCH_SIZE = env.int("NOTIFICATION_BATCH_SIZE", default=300)
+# Outbox relay (manage.py relay_outbox): messages per transaction and seconds
+# between polls once drained
+OUTBOX_BATCH_SIZE = env.int("OUTBOX_BATCH_SIZE", default=500)
+OUTBOX_POLL_INTERVAL = env.float("OUTBOX_POLL_INTERVAL", default=0.5)
+# Retry policy for send_email_task / send_welcome_sms (seconds)
+NOTIFICATION_MAX_RETRIES = env.int("NOTIFICATION_MAX_RETRIES", default=5)
+NOTIFICATION_RETRY_BACKOFF = env.int("NOTIFICATION_RETRY_BACKOFF", default=5)
+NOTIFICATION_RETRY_BACKOFF_MAX = env.int("NOTIFICATION_RETRY_BACKOFF_MAX", default=600)
 
 # Celery Configuration
-CELERY_BROKER_URL = env("CELERY_BROKER_URL", default="redis://localhost:6379/0")    
+CELERY_BROKER_URL = env("CELERY_BROKER_URL", default="redis://localhost:6379/0")
 CELERY_RESULT_BACKEND = CELERY_BROKER_URL
 CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
@@ -194,7 +290,87 @@ CELERY_TASK_SEND_SENT_EVENT = True
 if USE_TZ:
     CELERY_TIMEZONE = TIME_ZONE
 
-STRIPE_WEBHOOK_SECRET=env(
+# Slow provider calls get their own queues (and workers, see
+# docker/local/django/celery/worker/start) so a burst of emails or SMS never
+# sits in front of webhook processing.
+CELERY_TASK_DEFAULT_QUEUE = "default"
+CELERY_TASK_QUEUES = (
+    Queue("default"),
+    Queue("webhooks"),
+    Queue("notifications.email"),
+    Queue("notifications.sms"),
+)
+CELERY_TASK_ROUTES = {
+    "apps.subscriptions.tasks.process_stripe_events": {"queue": "webhooks"},
+    "apps.subscriptions.tasks.send_email_task": {"queue": "notifications.email"},
+    "apps.subscriptions.tasks.send_bulk_email_task": {"queue": "notifications.email"},
+    "djcelery_email_send_multiple": {"queue": "notifications.email"},
+    "apps.subscriptions.tasks.send_welcome_sms": {"queue": "notifications.sms"},
+    "apps.subscriptions.tasks.send_bulk_sms": {"queue": "notifications.sms"},
+}
+# Notification tasks block on the network for seconds; reserving one message
+# per process keeps idle processes from sitting behind a busy one.
+CELERY_WORKER_PREFETCH_MULTIPLIER = env.int("CELERY_WORKER_PREFETCH_MULTIPLIER", default=1)
+# Port each Celery worker serves its Prometheus metrics on (0 disables it)
+WORKER_METRICS_PORT = env.int("WORKER_METRICS_PORT", default=0)
+# /metrics/ is served to clients in these networks, and to any client sending
+# METRICS_TOKEN as a bearer token when one is set.
+METRICS_ALLOWED_NETWORKS = env.list(
+    "METRICS_ALLOWED_NETWORKS", default=["127.0.0.1/32", "::1/128"]
+)
+METRICS_TOKEN = env("METRICS_TOKEN", default="")
+# Messages per second per worker process, for single and bulk notification
+# tasks alike (bulk tasks pace each message of their batch to it). Size them
+# to the provider quota divided by the total pool processes consuming the
+# queue, e.g. a 4 msg/s Twilio quota with one SMS worker at --concurrency 4
+# gives SMS_TASK_RATE_LIMIT = 4 / 4 = "1/s".
+EMAIL_TASK_RATE_LIMIT = env("EMAIL_TASK_RATE_LIMIT", default="10/s")
+SMS_TASK_RATE_LIMIT = env("SMS_TASK_RATE_LIMIT", default="1/s")
+CELERY_TASK_ANNOTATIONS = {
+    "apps.subscriptions.tasks.send_email_task": {"rate_limit": EMAIL_TASK_RATE_LIMIT},
+    "djcelery_email_send_multiple": {"rate_limit": EMAIL_TASK_RATE_LIMIT},
+    "apps.subscriptions.tasks.send_welcome_sms": {"rate_limit": SMS_TASK_RATE_LIMIT},
+}
+
+STRIPE_WEBHOOK_SECRET = env(
     "STRIPE_WEBHOOK_SECRET",
     default=""
-)
\ No newline at end of file
+)
+
+# Stored webhook events are drained by process_stripe_events in batches.
+STRIPE_EVENT_BATCH_SIZE = env.int("STRIPE_EVENT_BATCH_SIZE", default=200)
+STRIPE_EVENT_POLL_INTERVAL = env.float("STRIPE_EVENT_POLL_INTERVAL", default=2.0)
+# Events whose subscriber is not there yet (e.g. subscription.created racing
+# confirm_subscription) are retried with exponential backoff, then failed.
+STRIPE_EVENT_MAX_ATTEMPTS = env.int("STRIPE_EVENT_MAX_ATTEMPTS", default=8)
+STRIPE_EVENT_RETRY_BACKOFF = env.int("STRIPE_EVENT_RETRY_BACKOFF", default=30)
+STRIPE_EVENT_RETRY_BACKOFF_MAX = env.int("STRIPE_EVENT_RETRY_BACKOFF_MAX", default=60 * 60)
+# Stripe retries deliveries for up to three days.
+STRIPE_EVENT_DEDUP_TTL = env.int("STRIPE_EVENT_DEDUP_TTL", default=60 * 60 * 24 * 3)
+
+# Resync with Stripe in case webhooks were missed. Incremental runs only see
+# subscriptions created since the stored high-water mark; the full sweep
+# catches cancellations of older ones.
+STRIPE_RECONCILE_INTERVAL = env.int("STRIPE_RECONCILE_INTERVAL", default=60 * 15)
+STRIPE_RECONCILE_FULL_INTERVAL = env.int(
+    "STRIPE_RECONCILE_FULL_INTERVAL", default=60 * 60 * 24
+)
+STRIPE_RECONCILE_PAGE_SIZE = env.int("STRIPE_RECONCILE_PAGE_SIZE", default=100)
+# Stripe subscriptions diffed against the database per query
+STRIPE_RECONCILE_CHUNK_SIZE = env.int("STRIPE_RECONCILE_CHUNK_SIZE", default=1000)
+
+CELERY_BEAT_SCHEDULE = {
+    "process-stripe-events": {
+        "task": "apps.subscriptions.tasks.process_stripe_events",
+        "schedule": STRIPE_EVENT_POLL_INTERVAL,
+    },
+    "reconcile-stripe-subscriptions": {
+        "task": "apps.subscriptions.tasks.reconcile_stripe_subscriptions",
+        "schedule": STRIPE_RECONCILE_INTERVAL,
+    },
+    "reconcile-stripe-subscriptions-full": {
+        "task": "apps.subscriptions.tasks.reconcile_stripe_subscriptions",
+        "schedule": STRIPE_RECONCILE_FULL_INTERVAL,
+        "kwargs": {"full": True},
+    },
+}
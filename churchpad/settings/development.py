@@ -10,7 +10,7 @@ SECRET_KEY = env(
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
 
-ALLOWED_HOSTS = ["*","df19-102-89-33-105.ngrok-free.app", "8485-102-88-111-129.ngrok-free.app"]
+ALLOWED_HOSTS = ["*", "df19-102-89-33-105.ngrok-free.app", "8485-102-88-111-129.ngrok-free.app"]
 
 CSRF_TRUSTED_ORIGINS = [
     "http://0.0.0.0:8000",
@@ -7,6 +7,8 @@ from drf_yasg import openapi
 from drf_yasg.views import get_schema_view
 from rest_framework import permissions
 
+from apps.common.views import metrics
+
 # from apps.users.views import CustomTokenCreateView
 
 schema_view = get_schema_view(
@@ -25,6 +27,7 @@ schema_view = get_schema_view(
 urlpatterns = [
     path("", RedirectView.as_view(url="api/v1/redoc/", permanent=False)),
     path("admin/", admin.site.urls),
+    path("metrics/", metrics, name="metrics"),
     path("api/v1/subscribe/", include("apps.subscriptions.urls", namespace="usersauth")),
     path(
         "api/v1/swagger/",
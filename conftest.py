@@ -0,0 +1,24 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def locmem_cache(settings):
+    """
+    Run tests against an in-process cache instead of the Redis server the
+    settings point at, and start each test with an empty plan cache.
+    """
+    from django.core.cache import cache
+
+    from apps.subscriptions.cache import plan_cache
+
+    settings.CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "churchpad-tests",
+        }
+    }
+    cache.clear()
+    plan_cache.clear()
+    yield
+    cache.clear()
+    plan_cache.clear()
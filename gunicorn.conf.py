@@ -0,0 +1,14 @@
+# Gunicorn settings for running churchpad.wsgi (or churchpad.asgi with a
+# uvicorn worker class). Set PROMETHEUS_MULTIPROC_DIR to an empty, writable
+# directory so /metrics aggregates samples from every worker.
+import os
+
+from prometheus_client import multiprocess
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("GUNICORN_WORKERS", "4"))
+
+
+def child_exit(server, worker):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(worker.pid)